@@ -0,0 +1,82 @@
+"""
+Benchmark for vectorized compute functions in parameter sweeps:
+the landing point of a ball with drag and lift (the problem in
+doc/src/pp/src-pp/compute.py, see bench_parallel_sweep.py) over
+an n x n grid of initial velocities and spinrates, computed by
+Sweep.run with a scalar compute function (one call and one
+Runge-Kutta loop per case) and with a vectorized one (one call
+per chunk, integrating all cases in the chunk with NumPy arrays).
+
+Run as ``python bench_batch_sweep.py [n]`` from any directory
+where ``parampool`` is importable.
+"""
+import sys, time
+from math import pi
+from bench_parallel_sweep import landing_point
+
+def compute(case):
+    return landing_point(case.get_value('Initial velocity'), 45.0,
+                         case.get_value('Spinrate'), 0.0, 0.1, 0.11)
+
+def compute_vectorized(case, dt=1E-3):
+    import numpy as np
+    v0 = case.get_value('Initial velocity')
+    spinrate = case.get_value('Spinrate')
+    m, R, w = 0.1, 0.11, 0.0
+    A, rho, g = pi*R**2, 1.1184, 9.81
+    C_D, C_L = 0.47, spinrate/500.0*0.2
+    def rhs(u):
+        x, v_x, y, v_y = u
+        v = np.sqrt((v_x - w)**2 + v_y**2)
+        v_norm = np.sqrt(v_x**2 + v_y**2)
+        a, b = v_x/v_norm, v_y/v_norm
+        i_n_x = np.where(a > 0, -b, b)
+        i_n_y = np.where(a > 0, a, -a)
+        drag = 0.5*C_D*rho*A*v**2
+        lift = 0.5*C_L*rho*A*v**2
+        return np.array([v_x, (-drag*a + lift*i_n_x)/m,
+                         v_y, (-drag*b + lift*i_n_y - m*g)/m])
+    u = np.array([0*v0, v0*np.cos(pi/4), 0*v0, v0*np.sin(pi/4)])
+    landed = np.zeros(len(case), bool)
+    x_landing = np.zeros(len(case))
+    while not landed.all():
+        K1 = rhs(u)
+        K2 = rhs(u + 0.5*dt*K1)
+        K3 = rhs(u + 0.5*dt*K2)
+        K4 = rhs(u + dt*K3)
+        u = u + dt/6.0*(K1 + 2*K2 + 2*K3 + K4)
+        new = ~landed & (u[2] <= 0)
+        x_landing[new] = u[0][new]
+        landed |= new
+    return x_landing
+
+def main(n=20):
+    from parampool.pool.Pool import Pool
+    from parampool.pool.sweep import vectorized
+    pool = Pool()
+    pool.add_data_item(name='Initial velocity', default=5.0)
+    pool.add_data_item(name='Spinrate', default=50.0)
+    pool.update()
+    pool.set_value('Initial velocity',
+                   ' & '.join([str(4 + 0.2*i) for i in range(n)]))
+    pool.set_value('Spinrate', ' & '.join([str(10*i) for i in range(n)]))
+    sweep = pool.sweep()
+    print 'cases:                   %d' % len(sweep)
+    timings = []
+    for name, func in [('scalar', compute),
+                       ('vectorized', vectorized(compute_vectorized))]:
+        t0 = time.time()
+        results = [result for case, result, error in
+                   sweep.run(func, workers=1)]
+        t = time.time() - t0
+        timings.append(t)
+        print '%-24s %.3f s (%.1f us/case)' % \
+              (name + ':', t, t/len(sweep)*1E+6)
+        if name == 'scalar':
+            reference = results
+    print 'max difference:          %.2g' % \
+          max(abs(a - b) for a, b in zip(reference, results))
+    print 'speed-up:                %.1f' % (timings[0]/timings[1])
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,76 @@
+"""
+Memory benchmark for DataItem objects: create many data items
+of typical kinds and report the memory used per data item.
+
+Run as ``python bench_dataitem_memory.py [n]`` from any directory
+where ``parampool`` is importable.
+"""
+import sys, gc, time, resource
+from parampool.pool.DataItem import DataItem  # not in the measurements
+
+def deep_getsizeof(obj, seen):
+    """
+    Return the size in bytes of `obj` and all objects reachable
+    from it that are not in `seen` (shared objects count once).
+    Classes, functions and modules are considered shared.
+    """
+    import types
+    shared = (type, types.ClassType, types.FunctionType,
+              types.BuiltinFunctionType, types.ModuleType)
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, shared):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        if hasattr(obj, '__dict__'):
+            stack.append(obj.__dict__)
+        for cls in type(obj).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                if hasattr(obj, name):
+                    stack.append(getattr(obj, name))
+    return size
+
+def make_data_items(n):
+    items = []
+    for i in range(n):
+        k = i % 4
+        if k == 0:
+            items.append(DataItem(name='velocity %d' % i, default=1.0,
+                                  unit='m/s', help='initial velocity'))
+        elif k == 1:
+            items.append(DataItem(name='n%d' % i, default=10,
+                                  minmax=[0, 100]))
+        elif k == 2:
+            items.append(DataItem(name='method%d' % i, default='RK4',
+                                  options=['RK4', 'RK2']))
+        else:
+            items.append(DataItem(name='plot%d' % i, default=True))
+    return items
+
+def main(n=100000):
+    gc.collect()
+    rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.time()
+    items = make_data_items(n)
+    t1 = time.time()
+    rss1 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    seen = set()
+    # Objects shared by all items are counted once
+    size = sum(deep_getsizeof(item, seen) for item in items)
+    # ru_maxrss is in kilobytes on Linux
+    print 'data items:              %d' % n
+    print 'construction time:       %.2f s (%.1f us/item)' % \
+          (t1 - t0, (t1 - t0)/n*1E+6)
+    print 'deep size per item:      %d bytes' % (size/n)
+    print 'peak RSS growth per item: %d bytes' % ((rss1 - rss0)*1024/n)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
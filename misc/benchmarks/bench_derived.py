@@ -0,0 +1,56 @@
+"""
+Benchmark for derived data items: a pool with n data items in
+subpools of 100 items, where every tenth data item is derived from
+the two preceding data items. One input is changed, and the time
+to get the values of all derived data items (only the two that
+depend on the changed input are computed again) is compared with
+evaluating all expressions (as text).
+
+Run as ``python bench_derived.py [n]`` from any directory
+where ``parampool`` is importable.
+"""
+import sys, time
+
+def main(n=20000, repetitions=10):
+    from parampool.pool.Pool import Pool
+    from parampool.pool.expression import evaluate
+    pool = Pool()
+    derived = []
+    t0 = time.time()
+    for i in range(0, n, 100):
+        pool.subpool('/sub%d' % (i//100))
+        for j in range(i, min(i + 100, n)):
+            if j % 10 == 9:
+                pool.add_data_item(name='p%d' % j, expression='p%d*p%d + 1'
+                                   % (j - 2, j - 1))
+                derived.append('/sub%d/p%d' % (i//100, j))
+            else:
+                pool.add_data_item(name='p%d' % j, default=0.1*j)
+    pool.update()
+    t1 = time.time()
+    for path in derived:
+        pool.get_value(path)
+    t2 = time.time()
+    t_changed = t_all = 0
+    for r in range(repetitions):
+        pool.set_value('p8', str(r))
+        t3 = time.time()
+        for path in derived:
+            pool.get_value(path)
+        t4 = time.time()
+        for path in derived:
+            data_item = pool.paths2data_items[path]
+            evaluate(data_item.data['expression'], dict(
+                (name, pool.paths2data_items[p].get_value())
+                for name, p in data_item._evaluator.inputs))
+        t5 = time.time()
+        t_changed += t4 - t3
+        t_all += t5 - t4
+    print 'data items:              %d (%d derived)' % (n, len(derived))
+    print 'create and update:       %.3f s' % (t1 - t0)
+    print 'first computation:       %.3f s' % (t2 - t1)
+    print 'one input changed:       %.2f ms' % (t_changed/repetitions*1E+3)
+    print 'all expressions:         %.2f ms' % (t_all/repetitions*1E+3)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
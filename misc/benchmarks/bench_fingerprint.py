@@ -0,0 +1,64 @@
+"""
+Benchmark for pool fingerprints: build a pool with n data items in
+subpools of 100 items, change a few values with set_value, and time
+Pool.fingerprint and Pool.diff against a copy of the pool, compared
+with hashing and comparing the values of all data items.
+
+Run as ``python bench_fingerprint.py [n]`` from any directory
+where ``parampool`` is importable.
+"""
+import sys, time, hashlib
+from bench_snapshot import make_list_tree
+
+def full_fingerprint(pool):
+    """Hash the values of all data items (traversal of the pool)."""
+    from parampool.utils import stable_repr
+    parts = []
+    for path in sorted(pool.paths):
+        data_item = pool.paths2data_items[path]
+        parts.append('%s\0%s\0%r' % (path, stable_repr(
+            data_item.get_values()), data_item.data.get('unit')))
+    return hashlib.sha1('\n'.join(parts)).hexdigest()
+
+def full_diff(pool, other):
+    return sorted(path for path in pool.paths
+                  if pool.paths2data_items[path].get_values() !=
+                  other.paths2data_items[path].get_values())
+
+def main(n=20000, changes=5, repetitions=20):
+    import cPickle as pickle
+    from parampool.pool.UI import listtree2Pool
+    pool = listtree2Pool(make_list_tree(n))
+    other = pickle.loads(pickle.dumps(pool, protocol=2))
+    t0 = time.time()
+    pool.fingerprint()  # first call hashes all data items
+    t_first = time.time() - t0
+    other.fingerprint()
+
+    names = ['p%d' % (i*n//changes) for i in range(changes)]
+    t_fingerprint = t_diff = t_full = t_full_diff = 0
+    for r in range(repetitions):
+        for name in names:
+            pool.set_value(name, str(r))
+        t0 = time.time()
+        pool.fingerprint()
+        t1 = time.time()
+        paths = pool.diff(other)
+        t2 = time.time()
+        full_fingerprint(pool)
+        t3 = time.time()
+        assert full_diff(pool, other) == paths
+        t4 = time.time()
+        t_fingerprint += t1 - t0
+        t_diff += t2 - t1
+        t_full += t3 - t2
+        t_full_diff += t4 - t3
+    print 'data items:              %d (%d changed)' % (n, changes)
+    print 'first fingerprint:       %.3f s' % t_first
+    print 'fingerprint:             %.2f ms' % (t_fingerprint/repetitions*1E+3)
+    print 'diff:                    %.2f ms' % (t_diff/repetitions*1E+3)
+    print 'full traversal hash:     %.2f ms' % (t_full/repetitions*1E+3)
+    print 'full traversal diff:     %.2f ms' % (t_full_diff/repetitions*1E+3)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
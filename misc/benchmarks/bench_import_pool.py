@@ -0,0 +1,55 @@
+"""
+Import-time budget for parampool.pool: import each core module in
+a fresh process and report the time, as ``python -X importtime``
+does in Python 3. The benchmark fails (exit status 1) if an import
+exceeds the budget or pulls in a module that is only needed for
+testing or for special data types (nose, numpy).
+
+Run as ``python bench_import_pool.py [budget in ms]`` from any
+directory where ``parampool`` is importable.
+"""
+import os, sys, subprocess
+
+modules = ['parampool.tree.Tree',
+           'parampool.pool.DataItem',
+           'parampool.pool.Pool',
+           'parampool.pool.UI']
+forbidden = ['nose', 'numpy']
+
+code = """
+import time, sys
+t0 = time.time()
+import %s
+t1 = time.time()
+print (t1 - t0)*1E+3, ' '.join([name for name in %r
+                                if name in sys.modules])
+"""
+
+def import_time(module, runs=10):
+    """Return min import time (ms) of `module` and forbidden modules."""
+    times = []
+    for i in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, '-c', code % (module, forbidden)]).split()
+        times.append(float(output[0]))
+    return min(times), output[1:]
+
+def main(budget=20.):
+    # Make sure .pyc files exist so that compilation is not timed
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    subprocess.check_call([sys.executable, '-c',
+                           'import ' + ', '.join(modules)], env=env)
+    failed = False
+    print '%-26s %8s  %s' % ('module', 'ms', 'forbidden imports')
+    for module in modules:
+        t, imported = import_time(module)
+        print '%-26s %8.2f  %s' % (module, t, ' '.join(imported))
+        if t > budget or imported:
+            failed = True
+    if failed:
+        print 'import budget of %g ms exceeded' % budget
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 20.)
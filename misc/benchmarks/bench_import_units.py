@@ -0,0 +1,37 @@
+"""
+Import-time benchmark for parampool.PhysicalQuantities: import the
+module in fresh processes (with numpy already imported, since it is
+imported anyway by the rest of parampool) and report the time spent
+in the import statement and the number of units built at import.
+
+Run as ``python bench_import_units.py [runs]`` from any directory
+where ``parampool`` is importable.
+"""
+import os, sys, subprocess
+
+code = """
+import time, numpy, parampool.utils
+t0 = time.time()
+import parampool.PhysicalQuantities as pq
+t1 = time.time()
+print (t1 - t0)*1E+3, len(pq._unit_table)
+"""
+
+def main(runs=20):
+    # Make sure .pyc files exist so that compilation is not timed
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    subprocess.check_call([sys.executable, '-c',
+                           'import parampool.PhysicalQuantities'], env=env)
+    times = []
+    for i in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', code])
+        t, n = output.split()
+        times.append(float(t))
+    times.sort()
+    print 'units in table at import: %s' % n
+    print 'import time (ms):         min %.2f, median %.2f' % \
+          (times[0], times[len(times)//2])
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
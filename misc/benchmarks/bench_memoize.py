@@ -0,0 +1,56 @@
+"""
+Benchmark for memoized compute functions: a compute function (the
+ball trajectory problem in bench_parallel_sweep.py) is called with
+a pool of n data items, first without a stored result, then with
+the result in memory, and then in a new memoized
+function (as after a restart of a web application) with the result
+on disk. The cost of the key (the pool fingerprint) is also
+reported, for the first call (all values hashed) and after
+one value is changed.
+
+Run as ``python bench_memoize.py [n]`` from the directory of this
+file, where ``parampool`` is importable.
+"""
+import sys, time, tempfile, shutil
+from bench_parallel_sweep import landing_point
+
+def compute(pool):
+    return landing_point(pool.get_value('Initial velocity'), 45.0,
+                         pool.get_value('Spinrate'), 0.0, 0.1, 0.11,
+                         dt=2E-4)
+
+def timed(func, *args):
+    t0 = time.time()
+    func(*args)
+    return time.time() - t0
+
+def main(n=1000):
+    from parampool.pool.Pool import Pool
+    from parampool.pool.memo import memoize, pool_fingerprint
+    pool = Pool()
+    pool.add_data_item(name='Initial velocity', default=5.0)
+    pool.add_data_item(name='Spinrate', default=50.0)
+    for i in range(0, n - 2, 100):
+        pool.subpool('/sub%d' % (i//100))
+        for j in range(i, min(i + 100, n - 2)):
+            pool.add_data_item(name='p%d' % j, default=0.1*j, unit='m')
+    pool.update()
+    tmpdir = tempfile.mkdtemp()
+    try:
+        f = memoize(compute, cache=tmpdir)
+        print 'data items:              %d' % len(pool.paths)
+        print 'key, first call:         %.2f ms' % \
+              (timed(pool_fingerprint, pool)*1E+3)
+        # Change the last data item (p<n-3>, or Spinrate if n < 3)
+        pool.set_value(pool.paths[-1], '1.5')
+        print 'key, one value changed:  %.2f ms' % \
+              (timed(pool_fingerprint, pool)*1E+3)
+        print 'not stored:              %.3f s' % timed(f, pool)
+        print 'in memory:               %.2f ms' % (timed(f, pool)*1E+3)
+        f = memoize(compute, cache=tmpdir)
+        print 'on disk:                 %.2f ms' % (timed(f, pool)*1E+3)
+    finally:
+        shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,93 @@
+"""
+Benchmark for parallel parameter sweeps: the ball trajectory
+problem in doc/src/pp/src-pp/compute.py (a ball with drag and
+lift, here integrated by a pure Python 4th-order Runge-Kutta
+method until it hits the ground, since compute.py also needs
+odespy and matplotlib) is run for a sweep over initial velocity,
+spinrate, mass and wind velocity, serially and with Sweep.run
+for 1, 2, 4, ... worker processes up to the number of CPUs.
+
+Run as ``python bench_parallel_sweep.py [cases per axis]`` from
+any directory where ``parampool`` is importable.
+"""
+import sys, time, multiprocessing
+from math import pi, sqrt, sin, cos
+
+def forces(v_x, v_y, w, rho, A, C_D, C_L, m, g):
+    # As in compute.py
+    v = sqrt((v_x - w)**2 + v_y**2)
+    v_norm = sqrt(v_x**2 + v_y**2)
+    a = v_x/v_norm
+    b = v_y/v_norm
+    i_n_x, i_n_y = (-b, a) if a > 0 else (b, -a)
+    drag = 0.5*C_D*rho*A*v**2
+    lift = 0.5*C_L*rho*A*v**2
+    return -drag*a + lift*i_n_x, -drag*b + lift*i_n_y - m*g
+
+def landing_point(initial_velocity, initial_angle, spinrate, w, m, R,
+                  dt=1E-3):
+    """Return x coordinate where the ball hits the ground."""
+    A, rho, g = pi*R**2, 1.1184, 9.81
+    C_D, C_L = 0.47, spinrate/500.0*0.2
+    def rhs(u):
+        x, v_x, y, v_y = u
+        F_x, F_y = forces(v_x, v_y, w, rho, A, C_D, C_L, m, g)
+        return [v_x, F_x/m, v_y, F_y/m]
+    u = [0, initial_velocity*cos(initial_angle*pi/180),
+         0, initial_velocity*sin(initial_angle*pi/180)]
+    while True:
+        K1 = rhs(u)
+        K2 = rhs([ui + 0.5*dt*k for ui, k in zip(u, K1)])
+        K3 = rhs([ui + 0.5*dt*k for ui, k in zip(u, K2)])
+        K4 = rhs([ui + dt*k for ui, k in zip(u, K3)])
+        u = [ui + dt/6.0*(k1 + 2*k2 + 2*k3 + k4)
+             for ui, k1, k2, k3, k4 in zip(u, K1, K2, K3, K4)]
+        if u[2] <= 0:
+            return u[0]
+
+def compute(case):
+    return landing_point(case.get_value('Initial velocity'),
+                         case.get_value('Initial angle'),
+                         case.get_value('Spinrate'),
+                         case.get_value('Wind velocity'),
+                         case.get_value('Mass'),
+                         case.get_value('Radius'))
+
+def make_pool(n):
+    from parampool.pool.Pool import Pool
+    pool = Pool()
+    for name, default in [('Initial velocity', 5.0),
+                          ('Initial angle', 45.0), ('Spinrate', 50.0),
+                          ('Wind velocity', 0.0), ('Mass', 0.1),
+                          ('Radius', 0.11)]:
+        pool.add_data_item(name=name, default=default)
+    pool.update()
+    for name, start, step in [('Initial velocity', 4, 1),
+                              ('Spinrate', 0, 20), ('Mass', 0.1, 0.05),
+                              ('Wind velocity', -2, 1)]:
+        pool.set_value(name, ' & '.join(
+            [str(start + i*step) for i in range(n)]))
+    return pool
+
+def main(n=3):
+    sweep = make_pool(n).sweep()
+    print 'cases:                   %d' % len(sweep)
+    t0 = time.time()
+    serial = [compute(case) for case in sweep]
+    t_serial = time.time() - t0
+    print 'serial loop:             %.3f s' % t_serial
+    workers = 1
+    while True:
+        t0 = time.time()
+        results = [result for case, result, error in
+                   sweep.run(compute, workers=workers)]
+        t = time.time() - t0
+        assert results == serial
+        print 'run, %3d workers:        %.3f s (speed-up %.2f)' % \
+              (workers, t, t_serial/t)
+        if workers >= multiprocessing.cpu_count():
+            break
+        workers = min(2*workers, multiprocessing.cpu_count())
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,81 @@
+"""
+Benchmark for reading and writing pool files: generate a pool file
+with n data items with typical values (integers, reals, booleans,
+strings, lists, and math expressions) in subpools of 100 items and
+time read_poolfile and write_poolfile, load_from_file with
+a cache of the parsed file, and loading case files that include
+the file and overlay 20 values.
+
+Run as ``python bench_poolfile.py [n]`` from any directory
+where ``parampool`` is importable.
+"""
+import os, sys, time, tempfile, shutil
+from StringIO import StringIO
+
+values = ['10', '0.25', '1E-4', 'on', 'False', 'RK4', 'Forward-Euler',
+          '[1, 2, 3]', '(0.5, 1)', '2*pi', 'sin(pi/4)**2']
+
+def make_poolfile(n):
+    lines = ['subpool main']
+    for i in range(n):
+        if i % 100 == 0:
+            if i > 0:
+                lines.append('    end')
+            lines.append('    subpool sub%d' % (i//100))
+        lines.append('        p%d = %s   # parameter %d' %
+                     (i, values[i % len(values)], i))
+    lines += ['    end', 'end']
+    return '\n'.join(lines) + '\n'
+
+def main(n=20000):
+    from parampool.pool.Pool import Pool
+    from parampool.pool.UI import read_poolfile, write_poolfile, \
+         load_from_file
+    text = make_poolfile(n)
+    t0 = time.time()
+    pool = read_poolfile(StringIO(text), Pool())
+    t1 = time.time()
+    f = StringIO()
+    write_poolfile(pool, f)
+    t2 = time.time()
+    print 'data items:              %d' % n
+    print 'read_poolfile:           %.3f s (%.1f us/item)' % \
+          (t1 - t0, (t1 - t0)/n*1E+6)
+    print 'write_poolfile:          %.3f s (%.1f us/item)' % \
+          (t2 - t1, (t2 - t1)/n*1E+6)
+
+    tmpdir = tempfile.mkdtemp()
+    filename = os.path.join(tmpdir, 'pool.dat')
+    f = open(filename, 'w'); f.write(text); f.close()
+    cache = os.path.join(tmpdir, 'cache')
+    t0 = time.time()
+    load_from_file(filename, cache=cache)  # parse and fill cache
+    t1 = time.time()
+    load_from_file(filename, cache=cache)  # from cache
+    t2 = time.time()
+    print 'load_from_file, parsed:  %.3f s' % (t1 - t0)
+    print 'load_from_file, cached:  %.3f s' % (t2 - t1)
+
+    # Case files: the base file with 20 values changed
+    cases = 10
+    for case in range(cases):
+        f = open(os.path.join(tmpdir, 'over%d.dat' % case), 'w')
+        f.write('subpool main\n')
+        for i in range(0, 20*11, 11):  # 20 integer data items
+            f.write('    subpool sub%d\n        p%d = %d\n    end\n' %
+                    (i//100, i, case))
+        f.write('end\n')
+        f.close()
+        f = open(os.path.join(tmpdir, 'case%d.dat' % case), 'w')
+        f.write('include pool.dat\noverlay over%d.dat\n' % case)
+        f.close()
+    t0 = time.time()
+    for case in range(cases):
+        load_from_file(os.path.join(tmpdir, 'case%d.dat' % case),
+                       cache=False)
+    t1 = time.time()
+    print 'case file (include+overlay): %.3f s/case' % ((t1 - t0)/cases)
+    shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,51 @@
+"""
+Benchmark for the columnar result store of parameter sweeps: add
+n rows with 3 inputs, 2 scalar outputs and the CPU time to a
+ResultStore, save it as an .npz file and as a directory of .npy
+files, load the directory memory-mapped, and post-process all rows
+(mean output per value of one input) with array operations.
+
+Run as ``python bench_result_store.py [n]`` from any directory
+where ``parampool`` is importable.
+"""
+import os, sys, time, tempfile, shutil
+
+def main(n=1000000):
+    import numpy as np
+    from parampool.pool.results import ResultStore
+    store = ResultStore()
+    t0 = time.time()
+    for i in xrange(n):
+        store.append({'Mass': 0.1*(i % 10), 'Radius': 0.01*(i % 7),
+                      'Method': 'RK4' if i % 2 else 'ForwardEuler'},
+                     {'distance': 0.5*i, 'steps': i % 1000}, 1E-3)
+    store.flush()
+    t1 = time.time()
+    print 'rows:                    %d' % n
+    print 'append:                  %.3f s (%.2f us/row)' % \
+          (t1 - t0, (t1 - t0)/n*1E+6)
+
+    tmpdir = tempfile.mkdtemp()
+    npz = os.path.join(tmpdir, 'results.npz')
+    npy = os.path.join(tmpdir, 'results')
+    for filename in npz, npy:
+        t0 = time.time()
+        store.save(filename)
+        t1 = time.time()
+        size = os.path.getsize(filename) if filename == npz else \
+               sum(os.path.getsize(os.path.join(npy, name))
+                   for name in os.listdir(npy))
+        print 'save %-18s  %.3f s (%.1f MB)' % \
+              (os.path.basename(filename) + ':', t1 - t0, size/1E+6)
+    t0 = time.time()
+    store = ResultStore.load(npy)
+    mass, distance = store.input('Mass'), store.output('distance')
+    means = [distance[mass == m].mean() for m in np.unique(mass)]
+    t1 = time.time()
+    print 'load (mmap) and process: %.3f s (%d mean distances)' % \
+          (t1 - t0, len(means))
+    del store, mass, distance
+    shutil.rmtree(tmpdir)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,52 @@
+"""
+Benchmark for pool snapshots: build a pool with n data items in
+subpools of 100 items from a list tree (listtree2Pool) and from a
+pool file (load_from_file), and compare with saving and loading
+a binary snapshot (Pool.save_snapshot/Pool.load_snapshot).
+
+Run as ``python bench_snapshot.py [n]`` from any directory
+where ``parampool`` is importable.
+"""
+import os, sys, time, tempfile
+
+def make_list_tree(n):
+    subpools = []
+    for i in range(0, n, 100):
+        items = [dict(name='p%d' % j, default=0.1*j, unit='m',
+                      help='parameter %d' % j, minmax=[0, n])
+                 for j in range(i, min(i + 100, n))]
+        subpools += ['sub%d' % (i//100), items]
+    return ['main', subpools]
+
+def timed(func, *args):
+    t0 = time.time()
+    result = func(*args)
+    return result, time.time() - t0
+
+def main(n=20000):
+    from parampool.pool.Pool import Pool
+    from parampool.pool.UI import listtree2Pool, load_from_file, \
+         write_poolfile
+    tmpdir = tempfile.mkdtemp()
+    poolfile = os.path.join(tmpdir, 'pool.dat')
+    snapshot = os.path.join(tmpdir, 'pool.snapshot')
+
+    pool, t_listtree = timed(listtree2Pool, make_list_tree(n))
+    write_poolfile(pool, poolfile)
+    pool2, t_poolfile = timed(load_from_file, poolfile)
+    dummy, t_save = timed(pool.save_snapshot, snapshot)
+    pool3, t_load = timed(Pool.load_snapshot, snapshot)
+    assert str(pool3) == str(pool)
+
+    print 'data items:              %d' % n
+    print 'listtree2Pool:           %.3f s' % t_listtree
+    print 'load_from_file:          %.3f s' % t_poolfile
+    print 'save_snapshot:           %.3f s (%d bytes)' % \
+          (t_save, os.path.getsize(snapshot))
+    print 'load_snapshot:           %.3f s' % t_load
+    for filename in poolfile, snapshot:
+        os.remove(filename)
+    os.rmdir(tmpdir)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
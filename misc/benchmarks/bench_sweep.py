@@ -0,0 +1,53 @@
+"""
+Benchmark for parameter sweeps: a pool with 4 data items with
+n values each, run through all n**4 combinations with nested
+loops over DataItem.iterate_values, with itertools.product over
+Pool.get_values, and with Pool.sweep, where the 4 values are
+looked up by name in each case.
+
+Run as ``python bench_sweep.py [n]`` from any directory
+where ``parampool`` is importable.
+"""
+import sys, time, itertools
+
+names = ['a', 'b', 'c', 'd']
+
+def make_pool(n):
+    from parampool.pool.Pool import Pool
+    pool = Pool()
+    for name in names:
+        pool.add_data_item(name=name, default=0.0)
+    pool.update()
+    for name in names:
+        pool.set_value(name, ' & '.join([str(0.1*i) for i in range(n)]))
+    return pool
+
+def loop_iterate_values(pool):
+    a, b, c, d = [pool.get(name) for name in names]
+    for va in a.iterate_values():
+        for vb in b.iterate_values():
+            for vc in c.iterate_values():
+                for vd in d.iterate_values():
+                    pass
+
+def loop_product(pool):
+    values = [pool.get_values(name) for name in names]
+    for va, vb, vc, vd in itertools.product(*values):
+        pass
+
+def loop_sweep(pool):
+    for case in pool.sweep():
+        va, vb, vc, vd = [case.get_value(name) for name in names]
+
+def main(n=10):
+    pool = make_pool(n)
+    print 'cases:                   %d' % n**4
+    for func in loop_iterate_values, loop_product, loop_sweep:
+        t0 = time.time()
+        func(pool)
+        t = time.time() - t0
+        print '%-24s %.3f s (%.1f us/case)' % \
+              (func.__name__ + ':', t, t/n**4*1E+6)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
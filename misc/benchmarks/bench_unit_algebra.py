@@ -0,0 +1,28 @@
+"""
+Micro-benchmark for the unit algebra in PhysicalUnit: time
+multiplication, division, powers and conversion factors of
+typical units, as done when processing parameters with units.
+
+Run as ``python bench_unit_algebra.py [n]`` from any directory
+where ``parampool`` is importable.
+"""
+import sys, timeit
+
+def main(n=100000):
+    from parampool.PhysicalQuantities import _findUnit
+    namespace = {'m': _findUnit('m'), 's': _findUnit('s'),
+                 'kg': _findUnit('kg'), 'kmh': _findUnit('km/h'),
+                 'ms': _findUnit('m/s'), 'N': _findUnit('N')}
+    statements = [('__mul__', 'kg*ms'),
+                  ('__div__', 'N/kg'),
+                  ('__pow__', 'ms**2'),
+                  ('conversionFactorTo', 'kmh.conversionFactorTo(ms)'),
+                  ('mixed', '(kg*m/s**2).conversionFactorTo(N)')]
+    print 'operation                us/call'
+    for name, statement in statements:
+        func = eval('lambda: ' + statement, namespace)
+        t = min(timeit.repeat(func, number=n, repeat=3))
+        print '%-24s %7.3f' % (name, t/n*1E+6)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,30 @@
+"""
+Benchmark for unit conversion of arrays: convert a time series
+of n samples from degF to degC, element by element with scalar
+PhysicalQuantity objects and as one vectorized operation.
+
+Run as ``python bench_unit_arrays.py [n]`` from any directory
+where ``parampool`` is importable.
+"""
+import sys, time
+import numpy as np
+
+def main(n=1000000):
+    from parampool.PhysicalQuantities import PhysicalQuantity as PQ
+    samples = np.linspace(-40, 212, n)
+
+    m = min(n, 20000)  # the loop version is slow, time a part of it
+    t0 = time.time()
+    loop = [PQ(x, 'degF').inUnitsOf('degC').value for x in samples[:m]]
+    t1 = time.time()
+    array = PQ(samples, 'degF').inUnitsOf('degC').value
+    t2 = time.time()
+
+    assert abs(array[:m] - loop).max() < 1E-12
+    print 'samples:                 %d' % n
+    print 'scalar loop:             %.3f s (extrapolated from %d)' % \
+          ((t1 - t0)*n/m, m)
+    print 'vectorized:              %.3f s' % (t2 - t1)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
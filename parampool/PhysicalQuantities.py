@@ -56,43 +56,44 @@ class NumberDict(dict):
             other = NumberDict(other)
         return self, other
 
+    # The arithmetic copies the dict and uses dict.get (both run
+    # in C) instead of the Python-level __getitem__ above
+
     def __add__(self, other):
-        sum_dict = NumberDict()
-        for key in self.keys():
-            sum_dict[key] = self[key]
-        for key in other.keys():
-            sum_dict[key] = sum_dict[key] + other[key]
+        sum_dict = NumberDict(self)
+        get = sum_dict.get
+        for key, value in other.iteritems():
+            sum_dict[key] = get(key, 0) + value
         return sum_dict
 
     def __sub__(self, other):
-        sum_dict = NumberDict()
-        for key in self.keys():
-            sum_dict[key] = self[key]
-        for key in other.keys():
-            sum_dict[key] = sum_dict[key] - other[key]
+        sum_dict = NumberDict(self)
+        get = sum_dict.get
+        for key, value in other.iteritems():
+            sum_dict[key] = get(key, 0) - value
         return sum_dict
 
     def __mul__(self, other):
         new = NumberDict()
-        for key in self.keys():
-            new[key] = other*self[key]
+        for key, value in self.iteritems():
+            new[key] = other*value
         return new
     __rmul__ = __mul__
 
     def __div__(self, other):
         new = NumberDict()
-        for key in self.keys():
-            new[key] = self[key]/other
+        for key, value in self.iteritems():
+            new[key] = value/other
         return new
 
     __truediv__ = __div__
 
 import numpy as N
-import re, string
+import re, string, operator
 
 # Class definitions
 
-class PhysicalQuantity:
+class PhysicalQuantity(object):
 
     """
     Physical quantity with units
@@ -150,8 +151,28 @@ class PhysicalQuantity:
     >>> str(freeze)
     '32.0 degF'
     >>>
+
+    The value can also be a NumPy array (or a list, which is turned
+    into an array). Arithmetic operations, unit conversions, and
+    comparisons are then performed as vectorized operations on the
+    whole array, and indexing gives a quantity with the same unit:
+
+    >>> T = p([0, 100], 'degC')
+    >>> T.inUnitsOf('K')
+    PhysicalQuantity(array([273.15, 373.15]),'K')
+    >>> T[1]
+    PhysicalQuantity(100.0,'degC')
+    >>> v = p('[36, 72] km/h')
+    >>> v.convertToUnit('m/s')
+    >>> v.getValue()
+    array([10., 20.])
     """
 
+    # Make numpy arrays leave arithmetic with PhysicalQuantity
+    # objects to this class (array*quantity calls __rmul__)
+    __array_priority__ = 1000
+    __array_ufunc__ = None
+
     def __init__(self, *args):
         """
         There are two constructor calling patterns:
@@ -169,9 +190,21 @@ class PhysicalQuantity:
         """
         if len(args) == 2:
             self.value = args[0]
+            if isinstance(self.value, (list, tuple)):
+                self.value = N.asarray(self.value, dtype=float)
             self.unit = _findUnit(args[1])
         else:
             s = string.strip(args[0])
+            if s.startswith('['):
+                # Array in list syntax: '[1.5, 2] m/s'
+                end = s.find(']') + 1
+                if end == 0:
+                    raise TypeError('No array found')
+                import ast
+                self.value = N.asarray(ast.literal_eval(s[:end]),
+                                       dtype=float)
+                self.unit = _findUnit(s[end:])
+                return
             match = PhysicalQuantity._number.match(s)
             if match is None:
                 raise TypeError('No number found')
@@ -209,6 +242,44 @@ class PhysicalQuantity:
         diff = self._sum(other, 1, -1)
         return cmp(diff.value, 0)
 
+    # Rich comparisons (elementwise if the value is an array)
+
+    def __eq__(self, other):
+        return self._sum(other, 1, -1).value == 0
+
+    def __ne__(self, other):
+        return self._sum(other, 1, -1).value != 0
+
+    def __lt__(self, other):
+        return self._sum(other, 1, -1).value < 0
+
+    def __le__(self, other):
+        return self._sum(other, 1, -1).value <= 0
+
+    def __gt__(self, other):
+        return self._sum(other, 1, -1).value > 0
+
+    def __ge__(self, other):
+        return self._sum(other, 1, -1).value >= 0
+
+    __hash__ = object.__hash__
+
+    def __nonzero__(self):
+        # Defined since __len__ would otherwise give the truth value
+        # (and fail for scalars). As for NumPy arrays, the truth value
+        # of an array with more than one element is ambiguous.
+        value = N.asarray(self.value)
+        if value.size > 1:
+            raise ValueError('the truth value of a PhysicalQuantity with '
+                             'more than one element is ambiguous')
+        return bool(value != 0)
+
+    def __len__(self):
+        return len(self.value)
+
+    def __getitem__(self, index):
+        return self.__class__(self.value[index], self.unit)
+
     def __mul__(self, other):
         if not isPhysicalQuantity(other):
             return self.__class__(self.value*other, self.unit)
@@ -260,9 +331,6 @@ class PhysicalQuantity:
     def __neg__(self):
         return self.__class__(-self.value, self.unit)
 
-    def __nonzero__(self):
-        return self.value != 0
-
     def convertToUnit(self, unit):
         """
         Change the unit and adjust the value such that
@@ -389,7 +457,15 @@ class PhysicalQuantity:
             raise TypeError('Argument of tan must be an angle')
 
 
-class PhysicalUnit:
+# Powers of the base units are stored as tuples, and equal tuples
+# are shared (interned) between all units through this table
+_powers_table = {}
+
+def _intern_powers(powers):
+    powers = tuple(powers)
+    return _powers_table.setdefault(powers, powers)
+
+class PhysicalUnit(object):
 
     """
     Physical unit
@@ -397,8 +473,14 @@ class PhysicalUnit:
     A physical unit is defined by a name (possibly composite), a scaling
     factor, and the exponentials of each of the SI base units that enter into
     it. Units can be multiplied, divided, and raised to integer powers.
+
+    The powers are stored as a tuple shared by all units with the same
+    powers, and the hash is computed once, from the powers and the
+    factor, so units compare and hash fast.
     """
 
+    __slots__ = ('names', 'factor', 'offset', 'powers', '_hash')
+
     def __init__(self, names, factor, powers, offset=0):
         """
         @param names: a dictionary mapping each name component to its
@@ -409,7 +491,7 @@ class PhysicalUnit:
         @param factor: a scaling factor
         @type factor: C{float}
         @param powers: the integer powers for each of the nine base units
-        @type powers: C{list} of C{int}
+        @type powers: C{tuple} or C{list} of C{int}
         @param offset: an additive offset to the base unit (used only for
                        temperatures)
         @type offset: C{float}
@@ -421,13 +503,36 @@ class PhysicalUnit:
             self.names = names
         self.factor = factor
         self.offset = offset
-        self.powers = powers
+        self.powers = _intern_powers(powers)
+        self._hash = hash((self.powers, factor))
+
+    def __getstate__(self):
+        return (self.names, self.factor, self.offset, self.powers)
+
+    def __setstate__(self, state):
+        names, factor, offset, powers = state
+        self.__init__(names, factor, powers, offset)
 
     def __repr__(self):
         return '<PhysicalUnit ' + self.name() + '>'
 
     __str__ = __repr__
 
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        # Units with different powers are just not equal (__cmp__
+        # raises TypeError, which is appropriate for ordering only)
+        if not isPhysicalUnit(other):
+            return NotImplemented
+        return self.powers == other.powers and \
+               self.factor == other.factor
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
     def __cmp__(self, other):
         if self.powers != other.powers:
             raise TypeError('Incompatible units')
@@ -439,8 +544,7 @@ class PhysicalUnit:
         if isPhysicalUnit(other):
             return PhysicalUnit(self.names+other.names,
                                 self.factor*other.factor,
-                                map(lambda a,b: a+b,
-                                    self.powers, other.powers))
+                                map(operator.add, self.powers, other.powers))
         else:
             return PhysicalUnit(self.names+{str(other): 1},
                                 self.factor*other,
@@ -455,8 +559,7 @@ class PhysicalUnit:
         if isPhysicalUnit(other):
             return PhysicalUnit(self.names-other.names,
                                 self.factor/other.factor,
-                                map(lambda a,b: a-b,
-                                    self.powers, other.powers))
+                                map(operator.sub, self.powers, other.powers))
         else:
             return PhysicalUnit(self.names+{str(other): -1},
                                 self.factor/other, self.powers)
@@ -469,30 +572,28 @@ class PhysicalUnit:
         if isPhysicalUnit(other):
             return PhysicalUnit(other.names-self.names,
                                 other.factor/self.factor,
-                                map(lambda a,b: a-b,
-                                    other.powers, self.powers))
+                                map(operator.sub, other.powers, self.powers))
         else:
-            return PhysicalUnit({str(other): 1}-self.names,
+            return PhysicalUnit(NumberDict({str(other): 1})-self.names,
                                 other/self.factor,
-                                map(lambda x: -x, self.powers))
+                                map(operator.neg, self.powers))
+
+    __rtruediv__ = __rdiv__
 
     def __pow__(self, other):
         if self.offset != 0:
             raise TypeError("cannot exponentiate units with non-zero offset")
         if isinstance(other, int):
             return PhysicalUnit(other*self.names, pow(self.factor, other),
-                                map(lambda x,p=other: x*p, self.powers))
+                                [x*other for x in self.powers])
         if isinstance(other, float):
             inv_exp = 1./other
             rounded = int(N.floor(inv_exp+0.5))
             if abs(inv_exp-rounded) < 1.e-10:
-                if reduce(lambda a, b: a and b,
-                          map(lambda x, e=rounded: x%e == 0, self.powers)):
+                if all(x % rounded == 0 for x in self.powers):
                     f = pow(self.factor, other)
-                    p = map(lambda x,p=rounded: x/p, self.powers)
-                    if reduce(lambda a, b: a and b,
-                              map(lambda x, e=rounded: x%e == 0,
-                                  self.names.values())):
+                    p = [x/rounded for x in self.powers]
+                    if all(x % rounded == 0 for x in self.names.values()):
                         names = self.names/rounded
                     else:
                         names = NumberDict()
@@ -563,11 +664,10 @@ class PhysicalUnit:
         return self.powers == other.powers
 
     def isDimensionless(self):
-        return not reduce(lambda a,b: a or b, self.powers)
+        return not any(self.powers)
 
     def isAngle(self):
-        return self.powers[7] == 1 and \
-               reduce(lambda a,b: a + b, self.powers) == 1
+        return self.powers[7] == 1 and sum(self.powers) == 1
 
     def setName(self, name):
         self.names = NumberDict()
@@ -616,23 +716,51 @@ def isPhysicalQuantity(x):
 
 # Helper functions
 
+# Caches for parsed units (unit string -> PhysicalUnit object) and
+# conversion tuples ((from unit, to unit) -> (factor, offset)),
+# since the same few units are typically used over and over again
+from parampool.utils import LRUCache
+_unit_cache = LRUCache(maxsize=512)
+_conversion_cache = LRUCache(maxsize=1024)
+
 def _findUnit(unit):
     if type(unit) == type(''):
+        cached = _unit_cache.get(unit)
+        if cached is not None:
+            return cached
+        unit_string = unit
         name = string.strip(unit)
-        unit = eval(name, _unit_table)
-        for cruft in ['__builtins__', '__args__']:
-            try: del _unit_table[cruft]
-            except: pass
+        unit = _eval_unit(name)
+        if isPhysicalUnit(unit):
+            _unit_cache[unit_string] = unit
 
     if not isPhysicalUnit(unit):
         raise TypeError(str(unit) + ' is not a unit')
     return unit
 
+def conversionTuple(from_unit, to_unit):
+    """
+    Return (factor, offset) such that a value x in unit `from_unit`
+    becomes (x + offset)*factor in unit `to_unit` (both are strings).
+    Raise TypeError if the units are not compatible.
+    """
+    key = (from_unit, to_unit)
+    conversion = _conversion_cache.get(key)
+    if conversion is None:
+        conversion = _findUnit(from_unit).conversionTupleTo(
+            _findUnit(to_unit))
+        _conversion_cache[key] = conversion
+    return conversion
+
+def cache_info():
+    """Return statistics for the unit and conversion caches."""
+    return {'units': _unit_cache.info(),
+            'conversions': _conversion_cache.info()}
+
 def _round(x):
-    if N.greater(x, 0.):
-        return N.floor(x)
-    else:
-        return N.ceil(x)
+    # Round towards zero (floor for positive, ceil for negative x),
+    # also elementwise for arrays
+    return N.trunc(x)
 
 
 def _convertValue (value, src_unit, target_unit):
@@ -677,33 +805,67 @@ _prefixes = [('Y',  1.e24),
              ('y',  1.e-24),
              ]
 
-_unit_table = {}
+class _UnitTable(dict):
+
+    """
+    Table of units (name -> PhysicalUnit object). Units with an SI
+    prefix (e.g. km, mPa, keV) are not stored on beforehand, but
+    created and stored the first time they are looked up.
+    The table is used as namespace when evaluating unit strings.
+    """
+
+    def __init__(self):
+        dict.__init__(self)
+        self.prefixable = set()   # names of units that get prefixes
+
+    def split_prefix(self, name):
+        """Return (prefix factor, unit name) if name is a prefixed unit."""
+        for prefix, factor in _prefixes:
+            if name.startswith(prefix) and \
+                   name[len(prefix):] in self.prefixable:
+                return factor, name[len(prefix):]
+        return None
+
+    def __missing__(self, name):
+        prefixed = self.split_prefix(name)
+        if prefixed is None:
+            raise KeyError(name)
+        factor, unit = prefixed
+        unit = factor*self[unit]
+        unit.setName(name)
+        self[name] = unit
+        return unit
+
+_unit_table = _UnitTable()
 
 for unit in _base_units:
     _unit_table[unit[0]] = unit[1]
 
 _help = []
+# Unit strings are evaluated with _unit_table as local namespace
+# such that prefixed units are created on demand
+_eval_globals = {}
+
+def _eval_unit(unit):
+    return eval(unit, _eval_globals, _unit_table)
 
 def _addUnit(name, unit, comment=''):
-    if _unit_table.has_key(name):
+    if _unit_table.has_key(name) or _unit_table.split_prefix(name):
         raise KeyError, 'Unit ' + name + ' already defined'
     if comment:
         _help.append((name, comment, unit))
     if type(unit) == type(''):
-        unit = eval(unit, _unit_table)
-        for cruft in ['__builtins__', '__args__']:
-            try: del _unit_table[cruft]
-            except: pass
+        unit = _eval_unit(unit)
     unit.setName(name)
     _unit_table[name] = unit
 
 def _addPrefixed(unit):
     _help.append('Prefixed units for %s:' % unit)
-    _prefixed_names = []
-    for prefix in _prefixes:
-        name = prefix[0] + unit
-        _addUnit(name, prefix[1]*_unit_table[unit])
-        _prefixed_names.append(name)
+    _prefixed_names = [prefix + unit for prefix, factor in _prefixes]
+    for name in _prefixed_names:
+        if _unit_table.has_key(name):
+            raise KeyError, 'Unit ' + name + ' already defined'
+    _unit_table.prefixable.add(unit)
     _help.append(', '.join(_prefixed_names))
 
 
@@ -875,6 +1037,77 @@ def description():
 # add the description of the units to the module's doc string:
 __doc__ += '\n' + description()
 
+def test_conversion_cache():
+    import nose.tools as nt
+    _conversion_cache.clear()
+    for i in range(3):
+        factor, offset = conversionTuple('km/h', 'm/s')
+    nt.assert_almost_equal(factor, 1/3.6, places=14)
+    nt.assert_equal(offset, 0)
+    nt.assert_equal(cache_info()['conversions']['hits'], 2)
+    nt.assert_equal(_findUnit('km/h'), _findUnit('km/h'))
+    factor, offset = conversionTuple('degC', 'K')
+    nt.assert_almost_equal((0 + offset)*factor, 273.15, places=12)
+    nt.assert_raises(TypeError, conversionTuple, 'kg/m', 'm/s')
+
+def test_unit_algebra():
+    import nose.tools as nt
+    import pickle
+    kmh, ms = _findUnit('km/h'), _findUnit('m/s')
+    nt.assert_true(kmh.powers is ms.powers)
+    nt.assert_true((_findUnit('m')/_findUnit('s')).powers is ms.powers)
+    nt.assert_equal(_findUnit('N'), _findUnit('kg*m/s**2'))
+    nt.assert_equal(hash(_findUnit('N')), hash(_findUnit('kg*m/s**2')))
+    nt.assert_not_equal(kmh, ms)
+    nt.assert_not_equal(ms, _findUnit('kg'))  # incompatible: not equal
+    nt.assert_raises(TypeError, cmp, ms, _findUnit('kg'))
+    nt.assert_almost_equal(kmh.conversionFactorTo(ms), 1/3.6, places=14)
+    nt.assert_equal((ms**2).name(), 'm**2/s**2')
+    nt.assert_equal(((ms**2)**0.5).powers, ms.powers)
+    nt.assert_true(_findUnit('deg').isAngle())
+    nt.assert_true((kmh/ms).isDimensionless())
+    u = pickle.loads(pickle.dumps(kmh))
+    nt.assert_true(u.powers is kmh.powers)
+    nt.assert_equal((u.name(), u.factor), (kmh.name(), kmh.factor))
+
+def test_prefixed_units():
+    import nose.tools as nt
+    nt.assert_false('mPa' in _unit_table)
+    nt.assert_almost_equal(_findUnit('mPa').conversionFactorTo(
+        _findUnit('Pa')), 1E-3, places=15)
+    nt.assert_true('mPa' in _unit_table)
+    nt.assert_equal(_findUnit('mPa').name(), 'mPa')
+    nt.assert_equal(_findUnit('keV/mum').name(), 'keV/mum')
+    nt.assert_equal(_findUnit('h').name(), 'h')   # hour, not a prefix
+    nt.assert_raises(NameError, _findUnit, 'kh')
+    nt.assert_raises(KeyError, _addUnit, 'GHz', '1E+9/s')
+    nt.assert_true('Prefixed units for Pa:' in description())
+
+def test_array_quantities():
+    import nose.tools as nt
+    p = PhysicalQuantity
+    v = p(N.linspace(0, 36, 5), 'km/h')
+    v.convertToUnit('m/s')
+    nt.assert_almost_equal(abs(v.getValue() - N.linspace(0, 10, 5)).max(),
+                           0, places=13)
+    T = p('[32, 212] degF').inUnitsOf('degC')
+    nt.assert_almost_equal(abs(T.value - N.array([0, 100])).max(),
+                           0, places=12)
+    # Array times quantity must give a quantity, not an object array
+    d = N.array([1., 2.])*p('2 m')
+    nt.assert_equal((d.getUnitName(), list(d.value)), ('m', [2., 4.]))
+    nt.assert_equal(list(d > p('300 cm')), [False, True])
+    nt.assert_equal(str(d[1]), '4.0 m')
+    t = p([3661., -3661.], 's').inUnitsOf('h', 'min', 's')
+    nt.assert_equal([list(q.value) for q in t[:2]], [[1, -1], [1, -1]])
+    nt.assert_almost_equal(abs(t[2].value - N.array([1, -1])).max(),
+                           0, places=12)
+    # Truth values as for scalars and NumPy arrays
+    nt.assert_true(p('2 m'))
+    nt.assert_false(p('0 m'))
+    nt.assert_true(p([2.], 'm'))
+    nt.assert_raises(ValueError, bool, p([1, 2], 'm'))
+
 # Some demonstration code. Run with "python -i PhysicalQuantities.py"
 # to have this available.
 
@@ -14,6 +14,8 @@ def generate_model_pool(compute_function, parser, outfile, pool):
         parent_id = [-1]
 
     def leaf_func(tree_path, level, item, user_data):
+        if 'expression' in item.data:
+            return  # derived data item, computed by the pool
         # 2DO: Extract data from item and make code for calls to parser.add
         # ...
 
@@ -14,6 +14,8 @@ def generate_models_pool(classname, outfile, pool):
         parent_id = [-1]
 
     def leaf_func(tree_path, level, item, user_data):
+        if 'expression' in item.data:
+            return  # derived data item, computed by the pool
         name = item.name
         field_name = parampool.utils.legal_variable_name(name)
         field_name_quoted = "'%s'" % field_name
@@ -4,7 +4,8 @@ def generate_views(compute_function,
                    filename_template,
                    pool_function,
                    filename_models,
-                   login):
+                   login,
+                   memoize=False):
 
     models_module = filename_models.strip(".py")
     compute_function_name = compute_function.__name__
@@ -55,6 +56,12 @@ pool = set_defaults_from_file(pool)
 from parampool.pool.UI import set_values_from_command_line
 pool = set_values_from_command_line(pool)
 ''' % vars()
+        if memoize:
+            code += '''
+# Return stored results for input data that were computed before
+from parampool.pool.memo import memoize
+compute_function = memoize(compute_function)
+'''
     code += '''
 from django.shortcuts import render_to_response
 from django.template import RequestContext
@@ -112,7 +119,8 @@ def index(request):
                             for chunk in field.data.chunks():
                                 destination.write(chunk)
                     else:
-                        data_item = pool.set_value(name, value)
+                        if 'expression' not in pool.get(name).data:  # not derived
+                            pool.set_value(name, value)
 
                 f = form.save(commit=False)
                 result = compute(pool)
@@ -146,7 +154,8 @@ register a new user and leave the email field blank.""")
                             for chunk in field.data.chunks():
                                 destination.write(chunk)
                     else:
-                        pool.set_value(name, value)
+                        if 'expression' not in pool.get(name).data:  # not derived
+                            pool.set_value(name, value)
 
                 result = compute(pool)
 
@@ -183,7 +192,8 @@ register a new user and leave the email field blank.""")
                     for chunk in field.data.chunks():
                         destination.write(chunk)
             else:
-                pool.set_value(name, value)
+                if 'expression' not in pool.get(name).data:  # not derived
+                    pool.set_value(name, value)
         result = compute(pool)
         form = %(classname)sForm(request.POST, request.FILES)
 ''' % vars()
@@ -293,7 +303,8 @@ register a new user and leave the email field blank.""")
                     if field.name not in ("user", "result", "comments"):
                         name = %(classname)s._meta.get_field(field.name).verbose_name.strip()
                         value = field.data
-                        pool.set_value(name, value)
+                        if 'expression' not in pool.get(name).data:  # not derived
+                            pool.set_value(name, value)
                 f = form.save(commit=False)
                 result = compute(pool)
                 if user.email:
@@ -319,7 +330,8 @@ register a new user and leave the email field blank.""")
                 for field in form:
                     name = %(classname)s._meta.get_field(field.name).verbose_name.strip()
                     value = field.data
-                    pool.set_value(name, value)
+                    if 'expression' not in pool.get(name).data:  # not derived
+                        pool.set_value(name, value)
                 result = compute(pool)
 
         form = %(classname)sForm(request.POST, request.FILES)
@@ -349,7 +361,8 @@ register a new user and leave the email field blank.""")
         for field in form:
             name = %(classname)s._meta.get_field(field.name).verbose_name.strip()
             value = field.data
-            pool.set_value(name, value)
+            if 'expression' not in pool.get(name).data:  # not derived
+                pool.set_value(name, value)
         result = compute(pool)
         form = %(classname)sForm(request.POST)
 ''' % vars()
@@ -16,7 +16,8 @@ def generate(compute_function,
              filename_views="views.py",
              filename_models="models.py",
              doc='',
-             MathJax=False):
+             MathJax=False,
+             memoize=False):
     """
     Given a function `compute_function` that takes a series of
     arguments, generate a Django web form where
@@ -51,6 +52,11 @@ def generate(compute_function,
     keyword argument in `compute_function` can be used to detect the
     argument type and assign a proper web form type. We therefore
     recommend to use keyword arguments only in `compute_function`.
+
+    With `memoize`, the generated code calls a memoized version of
+    `compute_function` (see ``parampool.pool.memo``) that returns
+    stored results when the pool has the same values as in an
+    earlier call (only when a `pool_function` is given).
     """
 
     if compute_function.__name__.startswith('compute_'):
@@ -112,7 +118,7 @@ def generate(compute_function,
                     default_field, pool, enable_login)
     generate_views(compute_function, classname, filename_views_path,
                    filename_template, pool_function,
-                   filename_models, enable_login)
+                   filename_models, enable_login, memoize)
     if enable_login:
         from generate_forms import generate_forms
         generate_forms(output_forms_path)
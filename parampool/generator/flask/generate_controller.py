@@ -6,7 +6,7 @@ def generate_controller(compute_function, classname,
                         pool_function, overwrite,
                         filename_model, filename_forms=None,
                         filename_db_models=None, app_file=None,
-                        login=False):
+                        login=False, memoize=False):
 
     if not overwrite and outfile is not None and os.path.isfile(outfile):
         if not strtobool(raw_input(
@@ -75,6 +75,12 @@ pool = set_defaults_from_file(pool)
 from parampool.pool.UI import set_values_from_command_line
 pool = set_values_from_command_line(pool)
 ''' % vars()
+        if memoize:
+            code += '''
+# Return stored results for input data that were computed before
+from parampool.pool.memo import memoize
+compute_function = memoize(compute_function)
+'''
     code += '''
 from flask import Flask, render_template, request'''
     if file_upload:
@@ -177,7 +183,8 @@ def index():
                 if field.name not in request.files:
                     name = field.description
                     value = field.data
-                    pool.set_value(name, value)
+                    if 'expression' not in pool.get(name).data:  # not derived
+                        pool.set_value(name, value)
 
             result = compute(pool)
             if is_authenticated(user):
@@ -312,7 +319,8 @@ def index():
             if field.name not in request.files:
                 name = field.description
                 value = field.data
-                data_item = pool.set_value(name, value)
+                if 'expression' not in pool.get(name).data:  # not derived
+                    pool.set_value(name, value)
 
         result = compute(pool)
 '''
@@ -79,6 +79,8 @@ class %(classname)s(db.Model):
             pass
 
         def leaf_func(tree_path, level, item, user_data):
+            if 'expression' in item.data:
+                return  # derived data item, computed by the pool
             name = '_'.join(item.name.split())
             widget = item.data.get("widget")
             if 'integer' in widget:
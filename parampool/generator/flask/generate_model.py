@@ -14,6 +14,8 @@ def generate_model_pool(classname, outfile, pool):
         parent_id = [-1]
 
     def leaf_func(tree_path, level, item, user_data):
+        if 'expression' in item.data:
+            return  # derived data item, computed by the pool
         name = '/'.join(tree_path) + '/' + item.name  # full path
         field_name = parampool.utils.legal_variable_name(name)
         if field_name.startswith('__'):
@@ -200,6 +200,8 @@ MathJax.Hub.Config({
 </html>"""
 
     def leaf_func(tree_path, level, item, user_data):
+        if 'expression' in item.data:
+            return  # derived data item, computed by the pool
         id = user_data.id
         parent_id = user_data.parent_id[-1]
         name = '/'.join(tree_path) + '/' + item.name  # full path
@@ -16,7 +16,8 @@ def generate(compute_function,
              doc='',
              MathJax=False,
              enable_login=False,
-             latex_name='text, symbol'):
+             latex_name='text, symbol',
+             memoize=False):
     """
     Given a function `compute_function` that takes a series of
     arguments, generate a Flask web form where
@@ -51,6 +52,11 @@ def generate(compute_function,
     keyword argument in `compute_function` can be used to detect the
     argument type and assign a proper web form type. We therefore
     recommend to use keyword arguments only in `compute_function`.
+
+    With `memoize`, the generated code calls a memoized version of
+    `compute_function` (see ``parampool.pool.memo``) that returns
+    stored results when the pool has the same values as in an
+    earlier call (only when a `pool_function` is given).
     """
     if classname is None:
         # Construct classname from the name of compute_function.
@@ -109,14 +115,15 @@ def generate(compute_function,
                             filename_template, pool_function,
                             overwrite_controller, filename_model,
                             filename_forms, filename_db_models,
-                            app_file, enable_login)
+                            app_file, enable_login, memoize)
     else:
         from generate_model import generate_model
         generate_model(compute_function, classname, filename_model,
                        default_field, pool, overwrite_model)
         generate_controller(compute_function, classname, filename_controller,
                             filename_template, pool_function,
-                            overwrite_controller, filename_model)
+                            overwrite_controller, filename_model,
+                            memoize=memoize)
 
     # Generate clean-up script
     f = open('clean.sh', 'w')
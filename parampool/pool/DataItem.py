@@ -1,8 +1,7 @@
-from collections import OrderedDict
-import re, inspect, numpy
-from math import *  # enable eval to work with math functions (str2type=eval)
+import re, sys, math
+from parampool.pool.expression import evaluate
 
-class DataItem:
+class DataItem(object):
     """
     Represent a data item (parameter) by its name, a default value,
     and an optional set of attributes that describe the data item.
@@ -25,6 +24,8 @@ class DataItem:
     ``user_data``   meta data stored in this object
     ``validate``    callable that can validate the value
     ``symbol``      LaTex code for mathematical symbol
+    ``expression``  expression computing the value from other data
+                    items in a pool (derived data item), see below
     ``widget``      recommended widget in graphical user interfaces;
                     allowed types are: "integer", "float", "range",
                     "integer_range", "textline", "textarea",
@@ -67,8 +68,30 @@ class DataItem:
     A number and a unit can be specified together as value. If unit
     is not given, it is set based on the unit used in the value, otherwise
     (unit specified) a unit conversion of the numerical value takes place.
+
+    A derived data item has an ``expression`` (e.g., ``pi*d**2/4``)
+    instead of a value. The names in the expression are names of
+    other data items in the same pool (or math functions and names
+    in ``namespace``), and the value is computed by the pool when
+    it is needed and recomputed only when one of these data items
+    has changed. The values of the other data items are used as
+    registered (in their registered units). A derived data item
+    cannot be set.
+
+    Pools may contain a very large number of data items, so the
+    representation is compact: the attributes are stored in the
+    plain dict ``data`` holding only what was set, instance
+    variables are declared in ``__slots__``, and tables common to
+    all data items are class attributes.
     """
-    _legal_data = 'name default unit help value str2type minmax options widget validate namespace user_data symbol widget_size range_step number_step'.split()
+    __slots__ = ('name', 'data', '_values', '_assigned_value',
+                 '_converter', '_listeners', '_evaluator')
+
+    _legal_data = frozenset('name default unit help value str2type minmax options widget validate namespace user_data symbol widget_size range_step number_step expression'.split())
+
+    # Names in the math module, used to recognize math expressions
+    math_functions = tuple(name for name in dir(math)
+                           if not name.startswith('_'))
 
     # defaults are used by GUI generating software to get
     # values of attributes that are not set. These defaults can
@@ -99,7 +122,7 @@ class DataItem:
             # AEJ: This overrides e.g. FileField and PasswordField, which normally
             # have None as default, to textline. I added an if-test here to avoid
             # that issue.
-            if not kwargs['widget'] in ('file', 'password'):
+            if not kwargs.get('widget') in ('file', 'password'):
                 kwargs['widget'] = 'textline'
                 if not 'str2type' in kwargs:
                     kwargs['str2type'] = eval
@@ -112,9 +135,9 @@ class DataItem:
                     '%s argument %s=%s is not valid. Valid '
                     'arguments are\n%s' %
                     (self._signature(), arg, kwargs[arg],
-                     ', '.join(self._legal_data)))
+                     ', '.join(sorted(self._legal_data))))
 
-        self.data = OrderedDict(**kwargs)
+        self.data = kwargs
 
         if 'str2type' not in self.data:
             # use widget type if set, otherwise use the type
@@ -141,8 +164,8 @@ class DataItem:
             elif type(self.data['default']) in (
                 type(()), type([]), type({})):
                 self.data['str2type'] = eval
-            elif isinstance(self.data['default'], numpy.ndarray):
-                self.data['str2type'] = lambda s: numpy.asarray(eval(s))
+            elif _is_ndarray(self.data['default']):
+                self.data['str2type'] = str2ndarray
             elif type(self.data['default']) in (
                 type(2.0), type(2), type(2+0j)):
                 self.data['str2type'] = type(self.data['default'])
@@ -185,14 +208,26 @@ class DataItem:
             if 'widget' in self.data:
                 self.data['widget'] = 'textline'
 
-        self._use_str2type = True  # convert data to right type
-
-        self._values = [self.data['default']]
+        # (str2type, namespace, compiled conversion function)
+        self._converter = None
+        self._values = None  # list of values when assigned
         self._assigned_value = False  # True if value from UI
-
-        import math
-        self.math_functions = [name for name in dir(math)
-                               if not name.startswith('_')]
+        self._listeners = ()  # called as listener(self) by set_value
+        self._evaluator = None  # returns the values if derived item
+
+    def __getstate__(self):
+        # The compiled conversion function (closures) is not pickled,
+        # it is compiled again when needed, and the listeners and
+        # evaluators are attached again by their owners
+        # (e.g., Pool.__setstate__)
+        return (self.name, self.data, self._values, self._assigned_value)
+
+    def __setstate__(self, state):
+        # No validation, the state comes from a valid DataItem object
+        self.name, self.data, self._values, self._assigned_value = state
+        self._converter = None
+        self._listeners = ()
+        self._evaluator = None
 
     def _check_validity_of_data(self):
         if 'minmax' in self.data:
@@ -237,79 +272,108 @@ from the following list: %s' % (self._signature(), widget, allowed_widgets))
 
     def _has_math_expression(self, value):
         if isinstance(value, str):
-            for operator in ['*', '+', '-', '/']:
-                if operator in value:
-                    if not value.strip().startswith('-'):
-                        return True
-            for math_function in self.math_functions:
-                if math_function in value:
-                    return True
+            if not value.lstrip().startswith('-') and \
+                   _operator.search(value):
+                return True
+            if _math_function.search(value):
+                return True
         return False
 
-    def _process_value(self, value):
+    def _get_converter(self):
+        """
+        Return function that converts a value to the right type
+        according to str2type. The function is compiled by
+        ``_compile_converter`` the first time it is needed and
+        reused until the str2type or namespace attribute is changed.
         """
-        Perform unit conversion (if relevant), convert to string
-        value to right type according to str2type, and perform
-        validation.
+        str2type = self.data.get('str2type')
+        namespace = self.data.get('namespace')
+        converter = self._converter
+        if converter is None or converter[0] is not str2type or \
+           converter[1] is not namespace:
+            converter = (str2type, namespace,
+                         self._compile_converter(str2type, namespace))
+            self._converter = converter
+        return converter[2]
+
+    def _compile_converter(self, str2type, namespace):
         """
+        Return a function for converting a value with `str2type`
+        (and expressions with names in `namespace`). All decisions
+        that depend on these only are made here, once, and not for
+        every value that is set.
+        """
+        if str2type is None:
+            return _no_conversion  # cannot do any conversion
 
-        if isinstance(value, str):
-            value = self._handle_unit_conversion(value)
+        # No conversion needed if str2type is some string type
+        if isinstance(str2type, type) and issubclass(str2type, basestring):
+            return _no_conversion
 
-        if not self._use_str2type:
-            return value
+        # Expressions are evaluated by parampool.pool.expression.evaluate
+        # (instead of eval), which can handle math expressions like
+        # sin(pi/2) and also names in the user's namespace
+        if str2type is eval:
+            if namespace is not None:
+                return lambda value: evaluate(value, namespace)
 
-        # Convert value to the right type
+            def convert(value):
+                try:
+                    return evaluate(value)
+                except Exception:
+                    return value  # value is a string
+            return convert
 
-        if not 'str2type' in self.data:
-            return value # cannot do any conversion
+        # Otherwise, convert to registered type using str2type,
+        # or evaluate a math expression like 2*pi (which str2type
+        # cannot convert)
+        has_math_expression = self._has_math_expression
 
-        # No conversion needed if str2type is some string type
-        if inspect.isclass(self.data['str2type']) and \
-               issubclass(self.data['str2type'], basestring):
-            return value
-
-        # Otherwise, convert to registered type using str2type
-        if self.data['str2type'] == eval or \
-               self._has_math_expression(value):
-            # Execute in some namespace?
-            if 'namespace' in self.data:
-                value = eval(value, self.data['namespace'])
-            else:
-                try:
-                    value = eval(value)
-                    # Note: this eval can handle math expressions
-                    # like sin(pi/2) since this module imports all of
-                    # the math module
-                except Exception, e:
-                    # value is a string
-                    pass
-        else:
+        def convert(value):
             try:
-                value = self.data['str2type'](value)
+                return str2type(value)
             except Exception, e:
-                # Deal with common error first: default is int by accident,
-                # should have been float
-                msg = ''
-                if self.data['str2type'] == int:
+                if has_math_expression(value):
                     try:
-                        value = float(value)
-                        if type(self.data['default']) == type(1):
-                            msg = 'str2type is int but should have been float, since the input value %s is a float. Either specify str2type=float or set the default value to a real number, not an integer (which makes str2type become int if not explicitly set).' % value
-                            raise TypeError(msg)
-                        value = self.data['str2type'](value)
-                    except:
-                        raise TypeError(
-                            'could not apply str2type=%s to value %s %s\n%s\n'
-                            'Python exception: %s' %
-                            (self.data['str2type'], value, type(value), msg, e))
-                else:
-                    raise TypeError(
-                        'could not apply str2type=%s to value %s %s\n%s\n'
-                        'Python exception: %s' %
-                        (self.data['str2type'], value, type(value), msg, e))
+                        return evaluate(value, namespace)
+                    except Exception:
+                        pass  # not a valid expression
+                return self._str2type_failed(value, e)
+        return convert
+
+    def _str2type_failed(self, value, e):
+        """Raise TypeError since str2type could not convert value."""
+        str2type = self.data['str2type']
+        # Deal with common error first: default is int by accident,
+        # should have been float
+        msg = ''
+        if str2type == int:
+            try:
+                value = float(value)
+                if type(self.data['default']) == type(1):
+                    msg = 'str2type is int but should have been float, since the input value %s is a float. Either specify str2type=float or set the default value to a real number, not an integer (which makes str2type become int if not explicitly set).' % value
+                    raise TypeError(msg)
+                return str2type(value)
+            except:
+                pass
+        raise TypeError(
+            'could not apply str2type=%s to value %s %s\n%s\n'
+            'Python exception: %s' %
+            (str2type, value, type(value), msg, e))
+
+    def _process_value(self, value, use_str2type=True):
+        """
+        Perform unit conversion (if relevant) and convert string
+        value to right type according to str2type.
+        """
+        if isinstance(value, str):
+            value = self._handle_unit_conversion(value)
 
-        return value
+        if not use_str2type:
+            return value
+
+        # Convert value to the right type
+        return self._get_converter()(value)
 
     def _validate(self, value):
         if 'minmax' in self.data:
@@ -327,50 +391,73 @@ from the following list: %s' % (self._signature(), widget, allowed_widgets))
 
     def _handle_unit_conversion(self, value):
         """
-        Return converted value (float) if value with unit,
+        Return converted value (float, or array for array-valued
+        data items) if value with unit,
         otherwise just return value.
         """
+        if ' ' not in value.strip():
+            return value  # a unit must be separated by space
+
+        # Is value an array (list syntax) and a unit?
+        if self.data.get('str2type') is str2ndarray:
+            match = _array_with_unit.search(value)
+            if match:
+                array, unit = match.groups()
+                return self._convert_unit(str2ndarray(array), unit, value)
+
         # Is value an expression and a unit?
         if self._has_math_expression(value):
-            if ' ' in value.strip():
-                # Space indicates that it might have a unit, let's try
-                # eval on first part
-                parts = value.split()
-                if len(parts) == 2:
-                    expression, unit = parts
-                    if self._has_math_expression(expression):
-                        # Evaluate expression and recreate value
-                        expression = eval(expression)
+            # Space indicates that it might have a unit, let's try
+            # eval on first part
+            parts = value.split()
+            if len(parts) == 2:
+                expression, unit = parts
+                if self._has_math_expression(expression):
+                    # Evaluate expression and recreate value
+                    try:
+                        expression = evaluate(expression)
                         value = str(expression) + ' ' + unit
+                    except Exception:
+                        pass  # not an expression with a unit
 
         # Is value a number and a unit?
-        number_with_unit = r'^\s*([Ee.0-9+-]+) +([A-Za-z0-9*/]+)\s*$'
-        if re.search(number_with_unit, value):
-            if not hasattr(self, 'PhysicalQuantity_class'):
-                # Must install the unit conversion tool (the first time
-                # we see the need for units)
-                #from Scientific.Physics.PhysicalQuantities import \
-                from PhysicalQuantities import PhysicalQuantity
-                self.PhysicalQuantity_class = PhysicalQuantity
-            q = self.PhysicalQuantity_class(value)  # quantity with unit
-            if 'unit' in self.data:
-                registered_unit = self.data['unit']
-                if registered_unit != q.getUnitName():
-                    if q.isCompatible(registered_unit):
-                        q.convertToUnit(registered_unit)
-                    else:
-                        raise DataItemValueError(
-                            '%s: value=%s, unit %s is not compatible with '
-                            'registered unit %s' %
-                            (self._signature(), value, q.getUnitName(),
-                            registered_unit))
-            else:
-                # No unit registered, register this one
-                self.data['unit'] = unit
-            value = str(q.getValue())  # ensure str so we can do eval on math
+        match = _number_with_unit.search(value)
+        if match:
+            number, unit = match.groups()
+            try:
+                number = float(number)
+            except ValueError:
+                return value  # not a number with unit
+            number = self._convert_unit(number, unit, value)
+            value = repr(number)  # ensure str so we can do eval on math
         # else: just return value as it came in
         return value
 
+    def _convert_unit(self, number, unit, value):
+        """
+        Return `number` (float or array) given in `unit` converted
+        to the registered unit. If no unit is registered, `unit`
+        is registered and `number` is returned unchanged.
+        """
+        if 'unit' not in self.data:
+            # No unit registered, register this one
+            self.data['unit'] = unit
+            return number
+        registered_unit = self.data['unit']
+        if registered_unit == unit:
+            return number
+        # Import the unit conversion tool the first time
+        # we see the need for units
+        from parampool.PhysicalQuantities import conversionTuple
+        try:
+            factor, offset = conversionTuple(unit, registered_unit)
+        except TypeError:
+            raise DataItemValueError(
+                '%s: value=%s, unit %s is not compatible with '
+                'registered unit %s' %
+                (self._signature(), value, unit, registered_unit))
+        return (number + offset)*factor
+
     def get(self, attribute_name, default=None):
         """
         Return value of attribute name.
@@ -390,22 +477,54 @@ from the following list: %s' % (self._signature(), widget, allowed_widgets))
                 return default
 
     def set_value(self, value):
-        """Set value as a string."""
-
+        """
+        Set value as a string. The functions in ``_listeners``
+        are called with this data item as argument afterwards
+        (also if the value is invalid, since the old value may
+        have been overwritten).
+        """
+        if 'expression' in self.data:
+            raise DataItemValueError(
+                '%s: cannot set value %s, the value is computed from '
+                'the expression %s' %
+                (self._signature(), value, self.data['expression']))
+        try:
+            self._set_value(value)
+        finally:
+            for listener in self._listeners:
+                listener(self)
+
+    def set_default(self, value):
+        """
+        Set the default value (stored as given). The functions in
+        ``_listeners`` are called afterwards, as in ``set_value``,
+        since the default is the value if no value is assigned.
+        """
+        if 'expression' in self.data:
+            raise DataItemValueError(
+                '%s: cannot set default %s, the value is computed from '
+                'the expression %s' %
+                (self._signature(), value, self.data['expression']))
+        self.data['default'] = value
+        for listener in self._listeners:
+            listener(self)
+
+    def _set_value(self, value):
         if isinstance(value, unicode):
             value.encode('ascii', 'replace')
             value = str(value)
 
+        use_str2type = True  # convert data to right type
         if not isinstance(value, str):
             if type(value) == type(False):
-                self._use_str2type = False
+                use_str2type = False
             elif not type(value) == type(self.data["default"]):
                 if not (isinstance(value, float) and isinstance(self.data["default"], int)):
                     raise ValueError('%s: value=%s %s must be a string (or the default type %s)' %
                                  (self._signature(), value, type(value),
                                   type(self.data["default"])))
             else:
-                self._use_str2type = False
+                use_str2type = False
 
         # The item can have a single value or multiple values
         if isinstance(value, str) and '&' in value:
@@ -415,7 +534,7 @@ from the following list: %s' % (self._signature(), widget, allowed_widgets))
 
         validate = self.data.get('validate', DataItem._validate)
         for i in range(len(self._values)):
-            value = self._process_value(self._values[i])
+            value = self._process_value(self._values[i], use_str2type)
 
             # Validate value
             try:
@@ -436,13 +555,14 @@ from the following list: %s' % (self._signature(), widget, allowed_widgets))
 
     def get_values(self):
         """Return (possibly multiple) values set for this data item."""
-        if self._values == [None]:
-            pass
-            #raise ValueError(
-            #    '%s: value not set.\ndefault=None so value must be set.' %
-            #    self._signature())
-        if self._assigned_value:
+        if self._evaluator is not None:
+            return self._evaluator()
+        elif self._assigned_value:
             return self._values
+        elif 'expression' in self.data:
+            raise ValueError('%s: the value of the expression %s is only '
+                             'available in a pool' %
+                             (self._signature(), self.data['expression']))
         elif 'default' in self.data:
             return [self.data['default']]
         else:
@@ -457,46 +577,35 @@ from the following list: %s' % (self._signature(), widget, allowed_widgets))
         given, the value is returned as a string formatted according
         to `fmt`.
         """
-        if fmt:
-            value = fmt % self.get_values()[0]
-        else:
-            value = self.get_values()[0]
+        return self._format_value(self.get_values()[0], with_unit, fmt)
 
-        if with_unit:
-            if 'unit' in self.data:
-                return '%s %s' % (value, self.data['unit'])
-            else:
-                return value
-        else:
-            if fmt:
-                return value
-            else:
-                return self.get_values()[0]
+    def _format_value(self, value, with_unit=False, fmt=None):
+        """Return `value` as in get_value."""
+        if fmt:
+            value = fmt % value
+        if with_unit and 'unit' in self.data:
+            return '%s %s' % (value, self.data['unit'])
+        return value
 
     def has_multiple_values(self):
-        return len(self._values) > 1
+        return self._values is not None and len(self._values) > 1
 
     def iterate_values(self, with_unit=False, fmt=None):
         """
-        Let value no. 1 become no. 0 and displace all other elements
-        correspondingly in case of multiple values.
+        Run through all (possibly multiple) values of this data item,
+        formatted as in get_value.
         With this function, one can run through all combinations of
         all data items::
 
           for prm1 in dataitem1.iterate_values(with_unit, fmt):
               for prm2 in dataitem2.iterate_values(with_unit, fmt):
                   # Run case with prm1 and prm2
+
+        ``Pool.sweep`` runs through all combinations of all data
+        items with multiple values without such nested loops.
         """
-        if self.has_multiple_values():
-            for counter in range(len(self._values)-1):
-                # Displace values to the left
-                tmp = self._values[0]
-                for i in range(len(self._values)-1):
-                    self._values[i] = self._values[i+1]
-                self._values[-1] = tmp
-                yield self.get_value(with_unit, fmt)
-        else:
-            yield self.get_value(with_unit, fmt)
+        for value in self.get_values():
+            yield self._format_value(value, with_unit, fmt)
 
     def __str__(self):
         """Return pretty print of this data item."""
@@ -518,6 +627,30 @@ from the following list: %s' % (self._signature(), widget, allowed_widgets))
                           for attr in self.data])
         return '%s(%s)' % (self.__class__.__name__, args)
 
+def str2ndarray(s):
+    """Turn a string s with list syntax into a numpy array."""
+    import numpy
+    if isinstance(s, str):
+        s = evaluate(s)
+    return numpy.asarray(s)
+
+def _is_ndarray(value):
+    # numpy is not imported by this module (it is slow to import);
+    # if numpy is not imported by anybody, value is no ndarray
+    numpy = sys.modules.get('numpy')
+    return numpy is not None and isinstance(value, numpy.ndarray)
+
+def _no_conversion(value):
+    return value
+
+_number_with_unit = re.compile(r'^\s*([Ee.0-9+-]+) +([A-Za-z0-9*/]+)\s*$')
+_array_with_unit = re.compile(r'^\s*(\[.*\]) +([A-Za-z0-9*/]+)\s*$')
+# Regular expressions for recognizing math expressions
+_operator = re.compile(r'[*+/-]')
+_math_function = re.compile('|'.join(
+    [re.escape(name) for name in
+     sorted(DataItem.math_functions, key=len, reverse=True)]))
+
 def str2bool(s):
     """
     Turn a string s, holding some boolean value
@@ -554,10 +687,8 @@ class DataItemValueError(Exception):
 
     __repr__ = __str__
 
-
-import nose.tools as nt
-
 def test_DataItem_set_value():
+    import nose.tools as nt
     d = DataItem(name='A', default=1.0)  # minimal
 
     # Test that non-strings cannot be assigned with set_value
@@ -577,7 +708,29 @@ def test_DataItem_set_value():
     nt.assert_equal(d.get_value(), 2.0)
     nt.assert_equal(type(d.get_value()), d.data['str2type'])
 
+def test_DataItem_converter():
+    import nose.tools as nt
+    # The conversion function is compiled once per str2type
+    d = DataItem(name='A', default=1.0)
+    d.set_value('2*0.5')
+    nt.assert_equal(d.get_value(), 1.0)
+    converter = d._converter
+    d.set_value('1.5 & 1E-2')
+    nt.assert_equal(d.get_values(), [1.5, 0.01])
+    assert d._converter is converter
+    d.data['str2type'] = int
+    d.set_value('3')
+    nt.assert_equal(type(d.get_value()), int)
+
+    d = DataItem(name='B', default=False)
+    d.set_value('true')
+    nt.assert_equal(d.get_value(), True)
+    d.set_value(False)
+    d.set_value('yes')
+    nt.assert_equal(d.get_value(), True)
+
 def test_DataItem_required_value():
+    import nose.tools as nt
     # A required variable is indicated by missing default or
     # default set to None
 
@@ -596,6 +749,8 @@ def test_DataItem_required_value():
     nt.assert_equal(type(d.get_value()), d.data['str2type'])
 
 def test_DataItem_unit_conversion():
+    import nose.tools as nt
+    import numpy
     d = DataItem(name='V', default=0.2, help='velocity', unit='m/s')
     nt.assert_equal(d.get_values(), [0.2])
     d.set_value('2 km/h')
@@ -610,8 +765,16 @@ def test_DataItem_unit_conversion():
     except:
         pass
 
+    # Array-valued data item: the whole array is converted at once
+    d = DataItem(name='T', default=numpy.zeros(2), unit='degC')
+    d.set_value('[32, 212] degF')
+    nt.assert_almost_equal(abs(d.get_value() - [0, 100]).max(), 0,
+                           places=12)
+    nt.assert_raises(DataItemValueError, d.set_value, '[1, 2] m')
 
 def test_DataItem_str2type():
+    import nose.tools as nt
+    import numpy
     # Test assignments with str2type=eval
     d = DataItem(name='U', default=2, str2type=eval)
     values_str = ['[1, 2, 3, 4]', 'some method', '2.3']
@@ -641,6 +804,7 @@ def test_DataItem_str2type():
     nt.assert_equal(d.get_value(), 4)
 
 def test_DataItem_validate():
+    import nose.tools as nt
     # Should do checking for values in DataItem and also call validator
     legal_values = 'Newton Secant Bisection'.split()
     d = DataItem(name='method', default='Newton',
@@ -671,12 +835,15 @@ def test_DataItem_validate():
     nt.assert_equal(d.get_value(), 'NEWTON')
 
 def test_DataItem_multiple_values():
+    import nose.tools as nt
     legal_values = 'Newton Secant Bisection'.split()
     d = DataItem(name='method', default='Secant',
                  options=legal_values)
     values = 'Newton & Secant & Bisection'
     d.set_value(values)
     nt.assert_equal(d.get_values(), values.split(' & '))
+    nt.assert_equal(list(d.iterate_values()), values.split(' & '))
+    nt.assert_equal(d.get_values(), values.split(' & '))
 
     d = DataItem(name="a", help="piecewise constant function values",
                  default=[1])
@@ -687,12 +854,15 @@ def test_DataItem_multiple_values():
 
 def test_DataItem_str():
     """Test output of __str__."""
+    import nose.tools as nt
     d = DataItem(name='Q', default=1.2, minmax=[0,2],
                  widget='range', help='volume flux')
     answer = """DataItem "Q": value=1.2 default=1.2, help=volume flux, minmax=[0, 2], str2type=<type 'float'>, widget=range"""
     nt.assert_equal(str(d), answer)
 
 def test_DataItem_math():
+    import nose.tools as nt
+    from math import pi
     # Test use of basic functions from math (available in DataItem)
     d = DataItem(name='q', default=0, str2type=eval)
     d.set_value('sin(pi/2)*exp(0) & pi**2')
@@ -700,6 +870,8 @@ def test_DataItem_math():
     nt.assert_almost_equal(d.get_values()[1], pi**2, places=14)
 
 def test_DataItem_namespace():
+    import nose.tools as nt
+    from math import sqrt, pi, exp
     # Define user-specific function and use that when setting values
     # (eval in DataItem will use local namespace)
     def Gaussian(x, mean=0, sigma=1):
@@ -709,8 +881,13 @@ def test_DataItem_namespace():
     d.set_value('Gaussian(2, 2, 3) & Gaussian(3)')
     nt.assert_almost_equal(d.get_values()[0], 0.1329807601338109, places=12)
     nt.assert_almost_equal(d.get_values()[1], 0.0026880519410391462, places=12)
+    # A new namespace is used when the next value is set
+    d.data['namespace'] = {'k': 10}
+    d.set_value('k*3')
+    nt.assert_equal(d.get_value(), 30)
 
 def test_DataItem_dict2DataItem():
+    import nose.tools as nt
     data = dict(name="A", help="area", default=1, str2type=float)
     d = DataItem(**data)
     nt.assert_equal(str(d), """DataItem "A": value=1 default=1, help=area, str2type=<type 'float'>, widget=float""")
@@ -718,6 +895,7 @@ def test_DataItem_dict2DataItem():
 
 if __name__ == '__main__':
     test_DataItem_set_value()
+    test_DataItem_converter()
     test_DataItem_required_value()
     test_DataItem_unit_conversion()
     test_DataItem_str2type()
@@ -5,15 +5,138 @@ for pools by renaming methods and adding functionality.
 """
 from parampool.tree.SubTree import SubTree
 from parampool.pool.DataItem import DataItem
-from parampool.tree.Tree import Tree, hash_all_leaves, get_leaf
-from parampool.PhysicalQuantities import PhysicalQuantity as PQ
+from parampool.utils import stable_repr
+from parampool.tree.Tree import Tree, hash_all_leaves, get_leaf, \
+     short_name_index, get_tree_path, hash_all_subtrees, get_subtree, \
+     LevelNames
+
+# The hash of a subpool is the sum of the hashes of all data items
+# in it (and in its subpools), modulo 2**160, so changing one data
+# item changes the hashes of the subpools above by the same amount
+_hash_modulus = 1 << 160
+
+def _data_item_hash(path, data_item):
+    """
+    Return hash (integer) of path, values and unit of `data_item`,
+    and False if the values have no stable representation (then
+    the hash is based on the identity of the values and is only
+    valid in this process), otherwise True.
+    """
+    from hashlib import sha1
+    stable = True
+    if data_item._evaluator is None and not data_item._assigned_value \
+       and 'default' not in data_item.data:
+        text = 'no value'
+    else:
+        # Errors (e.g., in expressions of derived data items) are
+        # raised, they must not give the same hash as no value
+        values = data_item.get_values()
+        try:
+            text = stable_repr(values)
+        except TypeError:
+            text = 'objects %r' % [id(value) for value in values]
+            stable = False
+    return int(sha1('%s\0%s\0%r' % (path, text,
+                                      data_item.data.get('unit'))
+                    ).hexdigest(), 16), stable
+
+def _subpool_paths(path):
+    """Return paths of all subpools above the data item `path`."""
+    paths = ['/']
+    subpool_path = ''
+    for name in path.split('/')[1:-1]:
+        if name:  # root-level data items have paths //name
+            subpool_path += '/' + name
+            paths.append(subpool_path)
+    return paths
+
+class _ValueListener(object):
+    """Notify a pool when the value of a data item is set."""
+    __slots__ = ('pool', 'path')
+
+    def __init__(self, pool, path):
+        self.pool = pool
+        self.path = path
+
+    def __call__(self, data_item):
+        self.pool._value_changed(self.path, data_item)
+
+class _DerivedValue(object):
+    """
+    Compute the value of a derived data item (with an ``expression``)
+    in a pool, and keep it until a data item in the expression has
+    changed. ``code`` is the compiled expression and ``inputs`` a
+    list of (name in the expression, path of data item), both set
+    by ``Pool._resolve_derived``.
+    """
+    __slots__ = ('pool', 'path', 'code', 'inputs', 'values')
+
+    def __init__(self, pool, path):
+        self.pool = pool
+        self.path = path
+        self.code = None
+        self.inputs = None
+        self.values = None  # [value] when computed
+
+    def __call__(self):
+        # Called by DataItem.get_values
+        if self.values is None:
+            if self.pool._derived_changed:
+                self.pool._resolve_derived()
+            self.values = [self.evaluate(self.pool)]
+        return self.values
+
+    def evaluate(self, view):
+        """
+        Return value of the expression with the values of the input
+        data items from `view` (a pool, ``SweepCase``, or anything
+        with a ``get_value`` method for full paths).
+        """
+        if self.pool._derived_changed:
+            self.pool._resolve_derived()
+        data_item = self.pool.paths2data_items[self.path]
+        namespace = dict(data_item.data.get('namespace') or {})
+        for name, path in self.inputs:
+            namespace[name] = view.get_value(path)
+        from parampool.pool.expression import evaluate
+        try:
+            return evaluate(self.code, namespace)
+        except Exception, e:
+            raise ValueError('%s: could not compute %s = %s\n%s: %s' %
+                             (self.path, data_item.name,
+                              data_item.data['expression'],
+                              e.__class__.__name__, e))
 
 class Pool(Tree):
     def __init__(self, root=None, root_name='main'):
         Tree.__init__(self, root, root_name)
-        for level in self.level_name:
-            self.level_name[level] = \
-            self.level_name[level].replace('tree', 'pool')
+        self.level_name = LevelNames('pool')
+        # The look-up structures for data items are kept up to date
+        # as data items and subpools are added, see update()
+        self.paths2data_items = {}
+        self.paths = []
+        self.short_names2paths = {}
+        self.paths2subpools = {'/': self.root}
+        self.subpool_short_names2paths = short_name_index(
+            self.paths2subpools)
+        self.index_version = 0   # incremented when the index changes
+        self._locator_prefix = (None, None)  # cache: (subpool, path)
+        # Hashes of data items (by path) and subpools, and data items
+        # whose hashes must be computed again, see fingerprint()
+        self._data_item_hashes = {}
+        self._subpool_hashes = {}
+        self._changed_data_items = {}
+        self._unstable_data_items = set()  # paths, see _data_item_hash
+        self._clear_change_log()
+        # Paths of derived data items, the derived data items that
+        # use each data item (path: list of paths), and the derived
+        # data items in the order they can be computed
+        self._derived_paths = set()
+        self._dependents = {}
+        self._derived_order = []
+        self._derived_changed = False  # _resolve_derived must be run
+        if root is not None:
+            self.update(rehash=True)
 
     def add_data_item(self, **data_item_attributes):
         """
@@ -24,28 +147,477 @@ class Pool(Tree):
         """
         self.add_leaf(DataItem(**data_item_attributes))
 
-    subpool = Tree.subtree
+    def add_leaf(self, leaf):
+        """Add `leaf` at the current location and index it."""
+        Tree.add_leaf(self, leaf)
+        self._index_data_item(self._current_path_prefix() + leaf.name,
+                              leaf)
+
+    def subtree(self, path, subtree=None):
+        """
+        Go to subpool with relative path `path`. Add `subtree`
+        (``Pool`` or ``SubTree``) here, or create a new subpool
+        if no subpool `path` exists.
+        """
+        if isinstance(subtree, Tree):
+            subtree = subtree.root
+        Tree.subtree(self, path, subtree)
+        self._locator_prefix = (None, None)
+        prefix = self._current_path_prefix()
+        if prefix[:-1] not in self.paths2subpools:
+            self._index_subpool(prefix[:-1], self.locator)
+        if subtree is not None and self.locator is subtree:
+            # An existing subtree was attached, index its content
+            for tree_path, level, node in self.walk(subtree):
+                if isinstance(node, SubTree):
+                    self._index_subpool(prefix + '/'.join(tree_path), node)
+                else:
+                    path = '/'.join(tree_path + (node.name,))
+                    self._index_data_item(prefix + path, node)
+
+    subpool = subtree
     change_subpool = Tree.change_subtree
     get_current_subpool = Tree.get_current_subtree
 
-    def update(self):
-        self.paths2data_items = hash_all_leaves(self)
-        self.paths = list(self.paths2data_items.keys())
+    def _current_path_prefix(self):
+        """Return '/path/to/current/subpool/' as used in paths2data_items."""
+        subpool, prefix = self._locator_prefix
+        if subpool is not self.locator:
+            prefix = '/' + '/'.join(get_tree_path(self.locator)) + '/'
+            self._locator_prefix = (self.locator, prefix)
+        return prefix
+
+    def _index_data_item(self, path, data_item):
+        """Register `data_item` with full path `path` in the index."""
+        old = self.paths2data_items.get(path)
+        if old is not None and old is not data_item:
+            self._detach(old)
+            self._derived_paths.discard(path)
+        if old is not data_item:
+            self._attach(path, data_item)
+            self._value_changed(path, data_item)
+        if path not in self.paths2data_items:
+            self.paths.append(path)
+            short_name = path.split('/')[-1]
+            if short_name in self.short_names2paths:
+                self.short_names2paths[short_name].append(path)
+            else:
+                self.short_names2paths[short_name] = [path]
+        self.paths2data_items[path] = data_item
+        self.index_version += 1
+
+    def _attach(self, path, data_item):
+        """Add listener (and evaluator) of this pool to `data_item`."""
+        data_item._listeners += (_ValueListener(self, path),)
+        if 'expression' in data_item.data:
+            data_item._evaluator = _DerivedValue(self, path)
+            self._derived_paths.add(path)
+        if self._derived_paths:
+            # New expression, or data item names may have changed
+            self._derived_changed = True
+
+    def _detach(self, data_item):
+        """Remove the listeners of this pool from `data_item`."""
+        data_item._listeners = tuple(
+            listener for listener in data_item._listeners
+            if getattr(listener, 'pool', None) is not self)
+        if getattr(data_item._evaluator, 'pool', None) is self:
+            data_item._evaluator = None
+
+    def _resolve_derived(self):
+        """
+        Find the data items used in the expressions of the derived
+        data items and the order in which they can be computed.
+        Raise ValueError if an expression is invalid or uses
+        an ambiguous name, or if expressions depend on each
+        other in a cycle.
+        """
+        from parampool.pool.expression import names, compile_expression
+        inputs = {}
+        codes = {}
+        for path in self._derived_paths:
+            data_item = self.paths2data_items[path]
+            expression = data_item.data['expression']
+            prefix = path.rsplit('/', 1)[0] + '/'
+            codes[path] = compile_expression(expression)
+            inputs[path] = []
+            for name in sorted(names(expression)):
+                # A data item in the same subpool, or a unique
+                # data item name in the pool
+                input_path = prefix + name
+                if input_path not in self.paths2data_items:
+                    input_paths = self.short_names2paths.get(name, [])
+                    if len(input_paths) > 1:
+                        raise ValueError(
+                            '%s: %s in %s = %s is not a unique data '
+                            'item name, it matches %s' %
+                            (path, name, data_item.name, expression,
+                             ', '.join(input_paths)))
+                    elif not input_paths:
+                        continue  # math function or in namespace
+                    input_path = input_paths[0]
+                inputs[path].append((name, input_path))
+
+        # Topological sort of the derived data items
+        dependents = {}
+        missing = {}  # number of derived inputs not in order yet
+        for path in inputs:
+            missing[path] = 0
+            for name, input_path in inputs[path]:
+                dependents.setdefault(input_path, []).append(path)
+                if input_path in inputs:
+                    missing[path] += 1
+        order = [path for path in sorted(inputs) if missing[path] == 0]
+        for path in order:  # order grows in the loop
+            for dependent in dependents.get(path, []):
+                missing[dependent] -= 1
+                if missing[dependent] == 0:
+                    order.append(dependent)
+        if len(order) < len(inputs):
+            cycle = sorted(path for path in inputs if missing[path] > 0)
+            raise ValueError('expressions of derived data items depend '
+                             'on each other in a cycle: %s' %
+                             ', '.join(['%s = %s' % (path,
+                             self.paths2data_items[path].data['expression'])
+                             for path in cycle]))
+        for path in inputs:
+            evaluator = self.paths2data_items[path]._evaluator
+            evaluator.code = codes[path]
+            evaluator.inputs = inputs[path]
+            evaluator.values = None
+        self._dependents = dependents
+        self._derived_order = order
+        self._derived_changed = False
+
+    def _value_changed(self, path, data_item):
+        """Called when the value of `data_item` (at `path`) is set."""
+        self._record_change(path, data_item)
+        if path in self._dependents:
+            # Derived data items must be computed again, and
+            # are recorded as changed too
+            paths = list(self._dependents[path])
+            seen = set()
+            while paths:
+                path = paths.pop()
+                if path not in seen:
+                    seen.add(path)
+                    data_item = self.paths2data_items[path]
+                    data_item._evaluator.values = None
+                    self._record_change(path, data_item)
+                    paths.extend(self._dependents.get(path, []))
+
+    def _record_change(self, path, data_item):
+        self._changed_data_items[path] = data_item
+        self._change_version += 1
+        version = self._change_version
+        self._change_versions[path] = version
+        self._change_log.append((version, path))
+        for subpool_path in _subpool_paths(path):
+            self._subpool_change_versions[subpool_path] = version
+        if len(self._change_log) > 2*len(self._change_versions) + 100:
+            # Keep only the last change of each data item
+            self._change_log = sorted(
+                (v, p) for p, v in self._change_versions.iteritems())
+
+    def _clear_change_log(self):
+        # Version of the last change, the data items changed after
+        # the last clear_changes() (path: version), and the
+        # changes in the order they were made
+        self._change_version = getattr(self, '_change_version', 0)
+        self._cleared_version = self._change_version
+        self._change_versions = {}
+        self._change_log = []
+        # Version of the last change of a data item in each subpool
+        self._subpool_change_versions = {}
+
+    def clear_changes(self):
+        """
+        Forget the data items changed so far and return a token
+        for ``changed_since``.
+        """
+        self._clear_change_log()
+        return self._change_version
+
+    def change_token(self):
+        """Return a token for the changes made so far."""
+        return self._change_version
+
+    def _check_change_token(self, token):
+        if not self._cleared_version <= token <= self._change_version:
+            raise ValueError('change token %s is not valid (changes '
+                             'before %d are cleared, last change is %d)' %
+                             (token, self._cleared_version,
+                              self._change_version))
+
+    def changed_since(self, token):
+        """
+        Return sorted list of the paths of data items whose values
+        have been set (or which have been added) after `token` was
+        obtained from ``change_token`` or ``clear_changes``. The cost
+        is proportional to the number of changes since `token`.
+        """
+        self._check_change_token(token)
+        paths = set()
+        log = self._change_log
+        i = len(log) - 1
+        while i >= 0 and log[i][0] > token:
+            paths.add(log[i][1])
+            i -= 1
+        return sorted(paths)
+
+    def subpool_changed_since(self, path, token):
+        """
+        Return True if a data item in subpool `path` ('/' for the
+        whole pool) or its subpools has changed after `token`.
+        """
+        self._check_change_token(token)
+        return self._subpool_change_versions.get(path, token) > token
+
+    def _update_hashes(self):
+        """Compute hashes of changed data items and their subpools."""
+        changed = self._changed_data_items
+        data_item_hashes = self._data_item_hashes
+        subpool_hashes = self._subpool_hashes
+        for path in list(changed):
+            # A data item stays in changed until it is hashed, so
+            # it is hashed again after an exception
+            new, stable = _data_item_hash(path, changed[path])
+            del changed[path]
+            if stable:
+                self._unstable_data_items.discard(path)
+            else:
+                self._unstable_data_items.add(path)
+            delta = new - data_item_hashes.get(path, 0)
+            if delta:
+                data_item_hashes[path] = new
+                for subpool_path in _subpool_paths(path):
+                    subpool_hashes[subpool_path] = \
+                        (subpool_hashes.get(subpool_path, 0) + delta) % \
+                        _hash_modulus
+
+    def fingerprint(self):
+        """
+        Return a hash (hex string) of the paths, values, and units of
+        all data items in the pool. Hashes of data items and subpools
+        are kept up to date as values are set, so only the data items
+        changed since the last call are hashed. Values and defaults
+        must be changed with ``set_value`` and ``set_default``;
+        changes made directly in ``data`` (e.g., ``data['default']``)
+        are only seen after ``update(rehash=True)``.
+        """
+        self._update_hashes()
+        return '%040x' % self._subpool_hashes.get('/', 0)
+
+    def has_stable_fingerprint(self):
+        """
+        Return True if the fingerprint is the same in all processes
+        with the same values, i.e., if all values have a stable
+        representation (see ``parampool.utils.stable_repr``).
+        Otherwise, the fingerprint depends on the identity of some
+        value objects and is only valid in this process.
+        """
+        self._update_hashes()
+        return not self._unstable_data_items
+
+    def diff(self, other):
+        """
+        Return sorted list of the paths of data items whose values or
+        units differ in this pool and the pool `other`, or that exist
+        in only one of them. Only subpools with different hashes
+        are searched.
+        """
+        self._update_hashes()
+        other._update_hashes()
+        paths = []
+        self._diff('/', other, paths)
+        return sorted(paths)
+
+    def _diff(self, path, other, paths):
+        if self._subpool_hashes.get(path, 0) == \
+           other._subpool_hashes.get(path, 0):
+            return
+        prefix = '/' if path == '/' else path + '/'
+        data_item_paths = set()
+        subpool_paths = set()
+        for subpool in (self.paths2subpools.get(path),
+                        other.paths2subpools.get(path)):
+            if subpool is None:
+                continue
+            for node in subpool.tree:
+                if isinstance(node, SubTree):
+                    subpool_paths.add(prefix + node.name)
+                else:
+                    data_item_paths.add(path + '/' + node.name)
+        for data_item_path in data_item_paths:
+            if self._data_item_hashes.get(data_item_path) != \
+               other._data_item_hashes.get(data_item_path):
+                paths.append(data_item_path)
+        for subpool_path in subpool_paths:
+            self._diff(subpool_path, other, paths)
+
+    def __getstate__(self):
+        # Hashes are computed again after loading (snapshots)
+        state = self.__dict__.copy()
+        for name in '_data_item_hashes', '_subpool_hashes', \
+                '_changed_data_items', '_unstable_data_items', \
+                '_change_versions', '_change_log', '_subpool_change_versions':
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        # Data items are pickled without listeners
+        self.__dict__.update(state)
+        self._data_item_hashes = {}
+        self._subpool_hashes = {}
+        self._changed_data_items = dict(self.paths2data_items)
+        self._unstable_data_items = set()
+        self._clear_change_log()  # a loaded snapshot has no changes
+        self._derived_paths = set()
+        for path, data_item in self.paths2data_items.iteritems():
+            self._attach(path, data_item)
+
+    def _index_subpool(self, path, subpool):
+        """Register `subpool` with full path `path` in the index."""
+        if path not in self.paths2subpools:
+            short_name = path.split('/')[-1]
+            if short_name in self.subpool_short_names2paths:
+                self.subpool_short_names2paths[short_name].append(path)
+            else:
+                self.subpool_short_names2paths[short_name] = [path]
+            self.paths2subpools[path] = subpool
+
+    def update(self, rehash=False):
+        """
+        Finalize pool construction. The dict ``paths2data_items``
+        from full paths to data items, the list ``paths``, and the
+        index ``short_names2paths`` from short names to full paths
+        are updated as data items and subpools are added, so this
+        call costs nothing unless `rehash` is True. Use `rehash`
+        after modifying ``SubTree`` objects directly, which bypasses
+        the index.
+
+        The expressions of derived data items are also checked here:
+        ValueError is raised if they depend on each other in a cycle
+        or use ambiguous names.
+        """
+        if rehash:
+            for data_item in self.paths2data_items.itervalues():
+                self._detach(data_item)
+            self.paths2data_items = hash_all_leaves(self)
+            self.paths = list(self.paths2data_items.keys())
+            self.short_names2paths = short_name_index(self.paths)
+            self.paths2subpools = hash_all_subtrees(self)
+            self.subpool_short_names2paths = short_name_index(
+                self.paths2subpools)
+            self.index_version += 1
+            self._data_item_hashes = {}
+            self._subpool_hashes = {}
+            self._unstable_data_items = set()
+            self._derived_paths = set()
+            self._dependents = {}
+            for path, data_item in self.paths2data_items.iteritems():
+                self._attach(path, data_item)
+                self._value_changed(path, data_item)
+        if self._derived_changed:
+            self._resolve_derived()
+
+    # Binary snapshots start with this line (format name and version)
+    _snapshot_header = 'parampool snapshot 1\n'
+
+    def save_snapshot(self, filename):
+        """
+        Save the complete pool (tree structure, data items with
+        all attributes and values, and the index) in binary form
+        in the file `filename` (name or file object opened for
+        binary writing). Load with ``Pool.load_snapshot``.
+        All attributes of the data items must be possible to pickle
+        (e.g., str2type and validate must not be lambda functions).
+        """
+        import cPickle as pickle
+        f = open(filename, 'wb') if isinstance(filename, basestring) \
+            else filename
+        try:
+            f.write(self._snapshot_header)
+            f.write(pickle.dumps(self, protocol=2))
+        finally:
+            if f is not filename:
+                f.close()
+
+    @classmethod
+    def load_snapshot(cls, filename):
+        """
+        Return the pool saved by ``save_snapshot`` in the file
+        `filename` (name or file object). The data items are
+        restored without validating their attributes again, and
+        the index is restored as is, so no ``update`` is needed.
+        """
+        import cPickle as pickle
+        f = open(filename, 'rb') if isinstance(filename, basestring) \
+            else filename
+        try:
+            header = f.readline()
+            if header != cls._snapshot_header:
+                raise ValueError('%s is not a pool snapshot (header %r)' %
+                                 (getattr(f, 'name', filename), header))
+            data = f.read()
+        finally:
+            if f is not filename:
+                f.close()
+        # Unpickling creates many container objects, which triggers
+        # the cyclic garbage collector over and over again
+        import gc
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            pool = pickle.loads(data)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        if not isinstance(pool, cls):
+            raise TypeError('snapshot contains %s, not %s' %
+                            (type(pool).__name__, cls.__name__))
+        return pool
+
+    def sweep(self, names=None, zip=None):
+        """
+        Return a ``Sweep`` object with all combinations of values of
+        the data items with multiple values (or the data items in the
+        list `names`). Data items in the same group (list of names)
+        in the list `zip` run through their values together. Iterating
+        over the sweep gives a ``SweepCase`` object, with methods
+        ``get_value`` etc. as in ``Pool``, for each combination.
+        The pool is not modified. See ``parampool.pool.sweep``.
+        """
+        from parampool.pool.sweep import Sweep
+        return Sweep(self, names, zip)
 
     def get(self, data_item_name):
         """
         Return ``DataItem`` object corresponding to `data_item_name`,
         which can be a unique valid abbreviation of the full name.
         """
-        if not hasattr(self, 'paths2data_items'):
-            raise ValueError('pool.get("%s") does not work because pool construction is not finalized with pool.update()' % data_item_name)
         try:
-            return get_leaf(data_item_name, self.paths2data_items)
+            return get_leaf(data_item_name, self.paths2data_items,
+                            self.short_names2paths)
         except ValueError:
             raise ValueError('%s is not a unique data item name '
                   'among\n%s' % (data_item_name,
                   ', '.join(self.paths2data_items.keys())))
 
+    def get_subpool(self, subpool_name):
+        """
+        Return ``SubTree`` object corresponding to `subpool_name`,
+        which can be a full path '/path/to/subpool' or a unique
+        name of a subpool.
+        """
+        try:
+            return get_subtree(subpool_name, self.paths2subpools,
+                               self.subpool_short_names2paths)
+        except ValueError:
+            raise ValueError('%s is not a unique subpool name '
+                  'among\n%s' % (subpool_name,
+                  ', '.join(self.paths2subpools.keys())))
+
     def get_value(self, data_item_name, default=None):
         """
         Return value set in ``DataItem`` object with name `data_item_name`.
@@ -85,6 +657,23 @@ class Pool(Tree):
         data_item.set_value(value)
         return data_item  # for convenience
 
+    def set_expression(self, data_item_name, expression):
+        """
+        Make the ``DataItem`` object corresponding to `data_item_name`
+        a derived data item computed from `expression`, or change its
+        expression. ``update`` checks the new expression.
+        """
+        data_item = self.get(data_item_name)
+        path = [listener.path for listener in data_item._listeners
+                if getattr(listener, 'pool', None) is self][0]
+        data_item.data['expression'] = expression
+        if data_item._evaluator is None:
+            data_item._evaluator = _DerivedValue(self, path)
+            self._derived_paths.add(path)
+        self._derived_changed = True
+        self._value_changed(path, data_item)
+        return data_item
+
     def get_unit(self, data_item_name):
         """
         Return unit set in ``DataItem`` object with name `data_item_name`,
@@ -114,12 +703,12 @@ class Pool(Tree):
                             data_item_name)
         if unit is None:
             raise ValueError('Pool.get_value_unit: unit is not registered for "%s"' % data_item_name)
+        from parampool.PhysicalQuantities import PhysicalQuantity as PQ
         return PQ('%g %s' % (value, unit))
 
-import nose.tools as nt
-from parampool.utils import assert_equal_text
-
 def test_Pool():
+    import nose.tools as nt
+    from parampool.utils import assert_equal_text
     p = Pool()
     p.add_data_item(name='item1', default=1.0)
     nt.assert_equal(p.locator.name, 'main')
@@ -178,8 +767,164 @@ sub pool "sub2" (level=0)
         item11"""
     assert_equal_text(str(p), reference)
 
+    nt.assert_equal(sorted(p.paths),
+                    sorted(hash_all_leaves(p).keys()))
+
+    # Attach a separately constructed pool as a subpool
+    q = Pool(root_name='extra')
+    q.add_data_item(name='item13', default=13)
+    q.subpool('sub6')
+    q.add_data_item(name='item14', default=14)
+    p.subpool('/sub1')
+    p.subpool('extra', q)
+    nt.assert_equal(p.get('item14').get_value(), 14)
+    nt.assert_equal(p.get('/sub1/extra/item13').get_value(), 13)
+    nt.assert_equal(sorted(p.paths),
+                    sorted(hash_all_leaves(p).keys()))
+    nt.assert_equal(p.paths2subpools, hash_all_subtrees(p))
+    nt.assert_equal(p.get_subpool('sub6').name, 'sub6')
+    nt.assert_equal(p.get_subpool('/sub2/sub3').name, 'sub3')
+
+    # Test look-up by full and short names
+    nt.assert_equal(p.get('item7').name, 'item7')
+    nt.assert_equal(p.get('/sub2/sub3/sub4/item12').name, 'item12')
+    nt.assert_equal(p.get('//item1').name, 'item1')
+
+    # Ambiguous short names must be rejected
+    p.subtree('/sub1')
+    p.add_data_item(name='item4', default=4)
+    p.update()
+    nt.assert_raises(ValueError, p.get, 'item4')
+    nt.assert_equal(p.get('/sub1/item4').get_value(), 4)
+
+    # Test snapshot of the pool
+    import StringIO
+    p.set_value('item7', '2*3.5')
+    f = StringIO.StringIO()
+    p.save_snapshot(f)
+    f.seek(0)
+    q = Pool.load_snapshot(f)
+    nt.assert_equal(str(q), str(p))
+    nt.assert_equal(sorted(q.paths), sorted(p.paths))
+    nt.assert_true(q.get('item7') is q.paths2data_items[
+        '/sub2/sub3/sub4/item7'])
+    nt.assert_equal(q.get_value('item7'), 7.0)
+    nt.assert_equal(q.set_value('item7', '8').get_value(), 8)
+    nt.assert_equal(p.get_value('item7'), 7.0)
+    nt.assert_raises(ValueError, Pool.load_snapshot,
+                     StringIO.StringIO('subpool main\n'))
+
+    # Test fingerprints and diff (q has the snapshot, item7 set to 8)
+    nt.assert_equal(q.diff(p), ['/sub2/sub3/sub4/item7'])
+    fingerprint = q.fingerprint()
+    q.set_value('item7', '2*3.5')
+    nt.assert_equal(q.fingerprint(), p.fingerprint())
+    nt.assert_equal(q.diff(p), [])
+    q.set_value('item7', '8')
+    nt.assert_equal(q.fingerprint(), fingerprint)
+    q.set_value('//item1', '2')
+    nt.assert_equal(p.diff(q), ['//item1', '/sub2/sub3/sub4/item7'])
+    q.subtree('/sub1')
+    q.add_data_item(name='item13', default=0)
+    nt.assert_equal(q.diff(p), ['//item1', '/sub1/item13',
+                                '/sub2/sub3/sub4/item7'])
+    q.update(rehash=True)
+    nt.assert_equal(len(q.get('item1')._listeners), 1)
+    nt.assert_equal(q.diff(p), ['//item1', '/sub1/item13',
+                                '/sub2/sub3/sub4/item7'])
+
+    # Test change tracking
+    token = q.change_token()
+    nt.assert_equal(q.changed_since(token), [])
+    q.set_value('item7', '1')
+    q.set_value('item7', '2')
+    q.set_value('//item1', '3')
+    nt.assert_equal(q.changed_since(token),
+                    ['//item1', '/sub2/sub3/sub4/item7'])
+    nt.assert_true(q.subpool_changed_since('/sub2/sub3', token))
+    nt.assert_false(q.subpool_changed_since('/sub1', token))
+    token2 = q.change_token()
+    q.set_value('item12', '0')
+    nt.assert_equal(q.changed_since(token2), ['/sub2/sub3/sub4/item12'])
+    nt.assert_equal(len(q.changed_since(token)), 3)
+    token3 = q.clear_changes()
+    nt.assert_equal(q.changed_since(token3), [])
+    nt.assert_raises(ValueError, q.changed_since, token)
+    for i in range(200):  # the change log is compacted
+        q.set_value('item2', str(i))
+    nt.assert_equal(q.changed_since(token3), ['//item2'])
+    nt.assert_true(len(q._change_log) < 200)
+    nt.assert_true(q.subpool_changed_since('/', token3))
+
     # Test setting values
     return p
 
+def test_derived_data_items():
+    import nose.tools as nt
+    from math import pi
+    p = Pool()
+    p.subpool('body')
+    p.add_data_item(name='d', default=0.22, unit='m')
+    p.add_data_item(name='A', expression='pi*d**2/4', unit='m**2')
+    p.subpool('/fluid')
+    p.add_data_item(name='rho', default=1.2)
+    p.add_data_item(name='C_D', default=0.2)
+    p.add_data_item(name='k', expression='0.5*rho*C_D*A')
+    p.update()
+    nt.assert_almost_equal(p.get_value('A'), pi*0.22**2/4, places=14)
+    nt.assert_almost_equal(p.get_value('k'), 0.12*pi*0.22**2/4,
+                           places=14)
+    nt.assert_equal(p._derived_order, ['/body/A', '/fluid/k'])
+
+    # Values are kept until an input changes
+    A, k = p.get('A')._evaluator, p.get('k')._evaluator
+    nt.assert_true(A.values is not None and k.values is not None)
+    p.set_value('rho', '1.0')
+    nt.assert_true(A.values is not None and k.values is None)
+    token = p.change_token()
+    p.set_value('d', '0.11')
+    nt.assert_true(A.values is None and k.values is None)
+    nt.assert_equal(p.changed_since(token),
+                    ['/body/A', '/body/d', '/fluid/k'])
+    nt.assert_almost_equal(p.get_value('k'), 0.1*pi*0.11**2/4,
+                           places=14)
+    nt.assert_true(A.values is not None)
+    from parampool.pool.DataItem import DataItemValueError
+    nt.assert_raises(DataItemValueError, p.set_value, 'A', '1')
+
+    # Snapshots compute the values again
+    import StringIO
+    f = StringIO.StringIO()
+    p.save_snapshot(f)
+    f.seek(0)
+    q = Pool.load_snapshot(f)
+    q.set_value('C_D', '0.4')
+    nt.assert_almost_equal(q.get_value('k'), 2*p.get_value('k'),
+                           places=14)
+
+    # Cycles and ambiguous names are detected by update
+    p.subpool('/other')
+    p.add_data_item(name='a', expression='2*b')
+    p.add_data_item(name='b', expression='c + a')
+    p.add_data_item(name='c', default=1)
+    nt.assert_raises(ValueError, p.update)
+    p.get('/other/a').data['expression'] = '3*c'
+    p.update(rehash=True)
+    nt.assert_equal(p.get_value('/other/b'), 4)
+
+    # Errors in expressions are not hidden in fingerprints
+    p.subpool('/other')
+    p.add_data_item(name='e', expression='1.0/c')
+    p.set_value('/other/c', '0')
+    nt.assert_raises(ValueError, p.fingerprint)
+    nt.assert_raises(ValueError, p.fingerprint)
+    p.set_value('/other/c', '2')
+    nt.assert_equal(p.get_value('e'), 0.5)
+    nt.assert_equal(p.fingerprint(), p.fingerprint())
+    p.subpool('/other2')
+    p.add_data_item(name='d', default=1)
+    p.get('/other/a').data['expression'] = '2*d'
+    nt.assert_raises(ValueError, p.update, rehash=True)
+
 if __name__ == '__main__':
     test_Pool()
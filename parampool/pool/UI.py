@@ -1,22 +1,31 @@
 """User interfaces for Pool."""
 from parampool.pool.Pool import Pool
-from parampool.tree.Tree import TreePath
+from parampool.tree.Tree import TreePath, short_name_index
+from parampool.pool.DataItem import str2bool
+from parampool.pool.expression import evaluate
+from parampool.utils import LRUCache
 import sys, os, re
 
 class CommandLineOptions:
     def __init__(self, pool):
         self.pool = pool
+        self._index_version = None
         self.update()
 
     def update(self):
         """Update the names of all command-line options."""
         self.pool.update()
+        if self._index_version == self.pool.index_version:
+            return  # no new data items since last update
+        self._index_version = self.pool.index_version
         # Make a version of self.pool.paths2data_items where
         # the paths have underscores for blanks (need to
         # search in this for short versions of options).
         self.options2data_items = {
             path.replace(' ', '_'): self.pool.paths2data_items[path]
             for path in self.pool.paths2data_items}
+        self.options_short_names2paths = \
+             short_name_index(self.options2data_items)
 
     def set_values(self, args=sys.argv[1:], set_default=False):
         """
@@ -28,7 +37,8 @@ class CommandLineOptions:
             if arg.startswith('--'):
                 arg = arg[2:]  # strip off leading --
                 try:
-                    data_item = get_leaf(arg, self.options2data_items)
+                    data_item = get_leaf(arg, self.options2data_items,
+                                         self.options_short_names2paths)
                 except ValueError:
                     raise ValueError('%s is not a unique data item name '
                           'among\n%s' % ('--' + arg,
@@ -40,7 +50,7 @@ class CommandLineOptions:
                                      % arg)
                 value = args[i+1]
                 if set_default:
-                    data_item.data['default'] = value
+                    data_item.set_default(value)
                 else:
                     data_item.set_value(value)
 
@@ -57,8 +67,12 @@ def set_values_from_command_line(pool):
     clo.set_values(set_default=False, args=sys.argv)
     return pool
 
-def set_defaults_from_file(pool, command_line_option='--poolfile'):
-    """Set default values in pool based on a file."""
+def set_defaults_from_file(pool, command_line_option='--poolfile',
+                           cache=None):
+    """
+    Set default values in pool based on a file.
+    The parsed file may be cached, see ``read_poolfile``.
+    """
     if command_line_option not in sys.argv:
         return pool
     else:
@@ -71,7 +85,8 @@ def set_defaults_from_file(pool, command_line_option='--poolfile'):
         del sys.argv[i]
 
         if os.path.isfile(filename):
-            return read_poolfile(filename, pool, task='set defaults')
+            return read_poolfile(filename, pool, task='set defaults',
+                                 cache=cache)
         else:
             raise IOError('file %s not found' % filename)
 
@@ -101,51 +116,44 @@ def set_defaults_in_model_file(model_filename, pool):
             generate_models_pool(classname, model_filename, pool)
 
 
+# Regular expressions for classifying values in pool files
+_int_literal = re.compile(r'^[+-]?\d+$')
+_float_literal = re.compile(
+    r'^[+-]?((\d+\.?\d*|\.\d+)([eE][+-]?\d+)?|inf|infinity|nan)$',
+    re.IGNORECASE)
+# Values that may be expressions: operators or brackets are present
+_maybe_expression = re.compile(r'[-+*/%()\[\]{}]')
+_bool_literals = frozenset(['on', 'off', 'true', 'false', 'yes', 'no'])
+
 def _interpret_value(value):
     """
-    Given the string `value`, try to convert it to bool, int,
-    float, or keep it as string. Used to guess right str2type
-    when initializing a pool from file.
+    Given the string `value`, classify it as int, float, bool
+    (str2bool), an expression or list/tuple/dict (eval), or
+    else keep it as string, and return str2type and the
+    converted value. Used to guess right str2type when
+    initializing a pool from file.
+    Expressions are evaluated with the math functions available
+    (as in DataItem), e.g., 2*pi gives float and (0, 1) gives eval.
     """
-    # Do from math import * to local namespace
-    # since DataItem has all math functions available
-    # to eval
-    import math
-    from_math_import = 'from math import ' + \
-       ', '.join([name for name in dir(math)
-                  if not name.startswith('__')])
-    exec(from_math_import)
-
-    str2type = None
-    try:
-        value = int(value)
-        str2type = int
-        return str2type, str2type(value)
-    except:
-        pass
-    try:
-        value = float(value)
-        str2type = float
-        return str2type, str2type(value)
-    except:
-        pass
-    from DataItem import str2bool
-    try:
-        value = str2bool(value)
-        str2type = str2bool
-        return str2type, str2type(value)
-    except:
-        pass
-    try:
-        value = eval(value, locals())
-        str2type = eval
-        return str2type, str2type(value)
-    except:
-        # Giving up - let it be a string
-        str2type = str
-        return str2type, str2type(value)
-
-def load_from_file(filename):
+    value = value.strip()
+    if _int_literal.match(value):
+        return int, int(value)
+    if _float_literal.match(value):
+        return float, float(value)
+    if value.lower() in _bool_literals:
+        return str2bool, str2bool(value)
+    if _maybe_expression.search(value):
+        try:
+            result = evaluate(value)
+        except Exception:
+            pass  # not an expression, e.g. Forward-Euler or a path
+        else:
+            if type(result) in (int, float, complex):
+                return type(result), result
+            return eval, result
+    return str, value
+
+def load_from_file(filename, cache=None):
     """
     Create a new Pool object from a file definition. A typical
     definition of a data item is::
@@ -160,43 +168,98 @@ def load_from_file(filename):
               dt = 0.1 ! s # Time step (None: automatically set, otherwise float value). widget=textline
           end
       end
+
+    The resulting pool can be cached on disk, see `cache` in
+    ``read_poolfile``, such that loading the same file again
+    only costs a hash of the file and loading a pool snapshot.
     """
-    pool = Pool()
-    return read_poolfile(filename, pool, task='create')
+    return _cached(filename, 'pool', cache,
+                   lambda: read_poolfile(filename, Pool(), task='create',
+                                         cache=False))
 
-def read_poolfile(filename, pool, task='create'):
-    """Read pool file and initialize a pool or set default values."""
+def read_poolfile(filename, pool, task='create', cache=None):
+    """
+    Read pool file and initialize a pool or set default values.
+    `filename` is the name of the file or a file object. The file
+    is read line by line, so a large file is never kept in memory.
+
+    The parsed file can be cached on disk: `cache` is a directory
+    name, True for the directory ~/.cache/parampool, False for
+    no caching, or None for the directory in the environment
+    variable PARAMPOOL_CACHE_DIR (no caching if not set).
+    A cached result is used only if the SHA-1 hash of the file
+    content is unchanged.
+
+    A line ``include FILE`` inserts the contents of the pool file
+    FILE, while ``overlay FILE`` sets new default values of data
+    items from FILE (as the 'set defaults' task). Relative names
+    are relative to the directory of the including file. The
+    parsed contents of included files are kept in memory (and on
+    disk if caching is on), so many case files including the same
+    large base file parse it only once.
+    """
     if isinstance(filename, basestring):
+        if _cache_directory(cache) is not None:
+            records = _cached(filename, 'records', cache,
+                              lambda: _read_poolfile_records(filename))
+            return _apply_poolfile_records(records, pool, task, cache)
         f = open(filename, 'r')
-        data = f.read()
-        f.close()
+        try:
+            return _apply_poolfile_records(
+                _parse_poolfile(f, filename), pool, task, cache)
+        finally:
+            f.close()
     elif hasattr(filename, 'read'):
-        data = filename.read()
+        return _apply_poolfile_records(
+            _parse_poolfile(filename, filename), pool, task, cache)
+    else:
+        raise TypeError('filename must be a string or a file object, '
+                        'not %s' % type(filename))
 
-    levels = []
-    for line_no, line in enumerate(data.splitlines()):
-        #print line_no, line
-        #print pool
+def _read_poolfile_records(filename):
+    """Return list of all records in the pool file `filename`."""
+    f = open(filename, 'r')
+    try:
+        return list(_parse_poolfile(f, filename))
+    finally:
+        f.close()
 
-        if line.startswith('subpool'):
-            name = ' '.join(line.split()[1:])
-            pool.subpool(name)
-            levels.append(name)
-        elif line.startswith('end'):
-            pool.subpool('..')
-            levels.pop()
-        elif line.strip() == '':
+def _parse_poolfile(lines, filename):
+    """
+    Parse the lines (an iterable, e.g. a file) of a pool file and
+    yield one record (tuple) for each line with content:
+    ('subpool', name), ('end',), ('include', path),
+    ('overlay', path), ('item', name, value, unit, help, line), or
+    ('derived', name, expression, unit, help, line),
+    where value, unit, and help are strings or None (value is None
+    if the line contains just the name of a data item).
+    """
+    for line_no, line in enumerate(lines):
+        line = line.rstrip('\r\n')
+        keyword = line.lstrip()  # write_poolfile indents subpools
+        words = keyword.split()
+        if not words:
             continue
-        elif '=' in line:
+        # Data items may have names like subpool_size or end_time
+        elif words[0] == 'subpool' and '=' not in line:
+            yield ('subpool', ' '.join(words[1:]))
+        elif words == ['end']:
+            yield ('end',)
+        elif _directive(keyword):
+            directive, path = keyword.split(None, 1)
+            yield (directive, _included_path(path, filename))
+        elif '=' in line.split('#')[0]:
             for char in '=', '!', '#':
-                if line.count(char) > 1:
+                # The help text may contain widget=...
+                text = line.split('#')[0] if char == '=' else line
+                if text.count(char) > 1:
                     raise ValueError(
                     'wrong syntax in %s, line %d: more than '
                     'one "%s"\n%s' %
                     (filename, line_no+1, char, line))
 
             value = unit = help = None
-            name, rest = line.split('=')
+            name, rest = line.split('=', 1)
             if '!' in rest:
                 value, rest = rest.split('!')
                 if '#' in rest:
@@ -207,10 +270,50 @@ def read_poolfile(filename, pool, task='create'):
                 value, help = rest.split('#')
             else:
                 value = rest
+            if name.rstrip().endswith(':'):
+                # name := expression is a derived data item
+                yield ('derived', name.rstrip()[:-1].strip(), value.strip(),
+                       unit, help, line)
+            else:
+                yield ('item', name.strip(), value, unit, help, line)
+        else:
+            # line contains just the name of a data item
+            yield ('item', line.strip(), None, None, None, line)
 
-            data = {'name': name.strip()}
+def _apply_poolfile_records(records, pool, task, cache=None,
+                            levels=None, included=()):
+    """
+    Create data items in, or set default values of, `pool`.
+    Records of included files are applied with the same task,
+    while overlay files set default values. `levels` is the
+    list of names of the current subpools and `included` the
+    files that are being included (to detect recursion).
+    """
+    if levels is None:
+        levels = []
+    for record in records:
+        if record[0] == 'subpool':
+            name = record[1]
+            pool.subpool(name)
+            levels.append(name)
+        elif record[0] == 'end':
+            pool.subpool('..')
+            levels.pop()
+        elif record[0] in ('include', 'overlay'):
+            directive, path = record
+            if path in included:
+                raise ValueError('recursive %s of %s' % (directive, path))
+            _apply_poolfile_records(
+                _poolfile_records(path, cache), pool,
+                task if directive == 'include' else 'set defaults',
+                cache, levels, included + (path,))
+        else:
+            kind, name, value, unit, help, line = record
+            data = {'name': name}
             if task == 'create':
-                if value:
+                if kind == 'derived':
+                    data['expression'] = value
+                elif value:
                     str2type, value = _interpret_value(value)
                     data['default'] = value
                     data['str2type'] = str2type
@@ -224,75 +327,235 @@ def read_poolfile(filename, pool, task='create'):
                     data['help'] = help
                 pool.add_data_item(**data)
             elif task == 'set defaults':
-                data_item = pool.get(TreePath(levels + [data['name']]).to_str())
+                if value is None:
+                    raise SyntaxError(
+                        'Wrong syntax in pool file: no value\n%s' % line)
+                path = TreePath(levels + [data['name']]).to_str()
+                if kind == 'derived':
+                    pool.set_expression(path, value)
+                    continue
+                data_item = pool.get(path)
                 if unit:
-                    data_item.set_value('%s %s' % (value, unit))
+                    data_item.set_value('%s %s' % (value.strip(),
+                                                   unit.strip()))
                 else:
-                    data_item.set_value(value)
+                    data_item.set_value(value.strip())
                 value = data_item.get_value()
-                data_item.data['default'] = value # without unit
-        else:
-            # line contains just the name of a data item
-            data = {'name': line.strip()}
-            if task == 'create':
-                pool.add_data_item(**data)
-            else:
-                raise SyntaxError('Wrong syntax in pool file: no value\n%s' %
-                                  line)
+                data_item.set_default(value)  # without unit
     return pool
 
+def _directive(line):
+    """Return True if `line` is an include or overlay directive."""
+    return line.startswith(('include ', 'overlay ')) and '=' not in line
+
+def _included_path(path, filename):
+    """
+    Return absolute path of a file included in pool file `filename`
+    (relative paths are relative to the directory of `filename`).
+    """
+    path = os.path.expanduser(path.strip())
+    if not os.path.isabs(path) and isinstance(filename, basestring):
+        path = os.path.join(os.path.dirname(os.path.abspath(filename)),
+                            path)
+    return os.path.abspath(path)
+
+# Parsed included files: absolute path -> (content SHA-1, records),
+# since many case files typically include the same base file
+_records_cache = LRUCache(maxsize=64)
+
+def _poolfile_records(filename, cache=None):
+    """
+    Return list of the records in the pool file `filename`.
+    The records are kept in memory as long as the SHA-1 hash of
+    the file content is unchanged (the modification time may not
+    change when a file is edited quickly), and they are also cached
+    on disk if `cache` says so (see ``read_poolfile``).
+    """
+    key = _file_sha1(filename)
+    entry = _records_cache.get(filename)
+    if entry is not None and entry[0] == key:
+        return entry[1]
+    records = _cached(filename, 'records', cache,
+                      lambda: _read_poolfile_records(filename))
+    _records_cache[filename] = (key, records)
+    return records
+
+def _cache_directory(cache):
+    """
+    Return the directory for cached pool files, or None if no
+    caching (see `cache` in ``read_poolfile``).
+    """
+    if cache is None:
+        cache = os.environ.get('PARAMPOOL_CACHE_DIR') or False
+    if cache is True:
+        cache = os.path.join(os.path.expanduser('~'), '.cache', 'parampool')
+    return cache or None
+
+def _file_sha1(filename, includes=False, _hashed=None):
+    """
+    Return the SHA-1 hash (hex string) of the content of a file.
+    With `includes`, the hash also covers pool files included
+    (or overlaid) in the file, recursively.
+    """
+    if _hashed is None:
+        _hashed = set()  # guard against recursive includes
+    _hashed.add(filename)
+    import hashlib
+    sha1 = hashlib.sha1()
+    included = []
+    f = open(filename, 'rb')
+    try:
+        if includes:
+            for line in f:
+                sha1.update(line)
+                keyword = line.strip()
+                if _directive(keyword):
+                    included.append(_included_path(
+                        keyword.split(None, 1)[1], filename))
+        else:
+            for chunk in iter(lambda: f.read(1 << 16), ''):
+                sha1.update(chunk)
+    finally:
+        f.close()
+    for path in included:
+        if path not in _hashed:
+            sha1.update(_file_sha1(path, True, _hashed))
+    return sha1.hexdigest()
+
+def _dump_records(records, f):
+    import cPickle as pickle
+    f.write(pickle.dumps(records, protocol=2))
+
+def _load_records(f):
+    import cPickle as pickle
+    return pickle.loads(f.read())
+
+# How to store the results of parsing pool files in the cache:
+# kind -> (function(result, file), function(file) returning result)
+_cache_formats = {
+    'records': (_dump_records, _load_records),
+    'pool': (lambda pool, f: pool.save_snapshot(f), Pool.load_snapshot),
+    }
+
+# Version of the cache files, increase when the parsing of pool
+# files changes so that old cached results are not used
+_cache_version = 2
+
+def _cached(filename, kind, cache, parse):
+    """
+    Return the result of ``parse()`` for the pool file `filename`.
+    The result is stored in the cache directory (if caching is on,
+    see ``read_poolfile``) in a file named after the absolute
+    path of `filename` and `kind`, together with the SHA-1 hash of
+    the pool file. A stored result is only used if the pool file
+    still has the same hash.
+    """
+    directory = _cache_directory(cache)
+    if directory is None or not isinstance(filename, basestring):
+        return parse()
+    import hashlib
+    dump, load = _cache_formats[kind]
+    path = os.path.abspath(filename)
+    cachefile = os.path.join(
+        directory, '%s.%s' % (hashlib.sha1(path).hexdigest(), kind))
+    # A cached pool depends on the included files as well
+    header = 'parampool cache %d %s %s\n' % \
+             (_cache_version, kind,
+              _file_sha1(path, includes=(kind == 'pool')))
+    if os.path.isfile(cachefile):
+        f = open(cachefile, 'rb')
+        try:
+            if f.readline() == header:
+                return load(f)
+        except Exception:
+            pass  # damaged cache file, parse the pool file again
+        finally:
+            f.close()
+
+    result = parse()
+    # Write to a temporary file and rename it, since many
+    # processes may read or write the same cache file
+    tmpfile = '%s.%d.tmp' % (cachefile, os.getpid())
+    try:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        f = open(tmpfile, 'wb')
+        try:
+            f.write(header)
+            dump(result, f)
+        finally:
+            f.close()
+        os.rename(tmpfile, cachefile)
+    except Exception:
+        # The cache is just an optimization (and e.g. pools with
+        # lambda functions as attributes cannot be stored)
+        if os.path.isfile(tmpfile):
+            os.remove(tmpfile)
+    return result
+
 def write_poolfile(pool, filename=None):
     """
     Return pool as a string which can be dumped to file
-    if filename is None, otherwise write the string to file.
+    if filename is None, otherwise write the pool to file
+    (`filename` is the name of the file or a file object).
+    Lines are written to the file as the pool is traversed,
+    so no copy of the whole file is made in memory.
     """
-
-    def data_item_output(pool_path, level, data_item, outlines):
-        indentation = '    '*level
-        s = data_item.name
-        if data_item.get_value() is not None:
-            s += ' = ' + ' & '.join(
-                ['%s' % v for v in data_item.get_values()])
+    if filename is None:
+        from StringIO import StringIO
+        f = StringIO()
+        _write_poolfile_lines(pool, f)
+        return f.getvalue()
+    elif isinstance(filename, basestring):
+        f = open(filename, 'w')
         try:
-            unit = data_item.get('unit')
+            _write_poolfile_lines(pool, f)
+        finally:
+            f.close()
+    else:
+        _write_poolfile_lines(pool, filename)
+
+def _write_poolfile_lines(pool, f):
+    """Write the lines of the pool file for `pool` to file object `f`."""
+    separator = ['']  # no newline before the first line
+
+    def write(line):
+        f.write(separator[0])
+        f.write(line)
+        separator[0] = '\n'
+
+    def data_item_output(pool_path, level, data_item, f):
+        data = data_item.data
+        s = '    '*level + data_item.name
+        if 'expression' in data:
+            s += ' := ' + data['expression']
+        elif data_item.get_value() is not None:
+            s += ' = ' + ' & '.join(
+                ['%s' % (v,) for v in data_item.get_values()])
+        unit = data.get('unit')
+        if unit is not None:
             s += '   ! ' + unit
-        except ValueError:
-            pass
-        try:
-            help = data_item.get('help')
+        help = data.get('help')
+        if help is not None:
             s += '   # ' + help
-            has_help = True
-        except ValueError:
-            has_help = False
-        try:
-            widget = data_item.get('widget')
-            if not has_help:
+        widget = data.get('widget')
+        if widget is not None:
+            if help is None:
                 s += '   #'
             s += ' widget=' + widget
-        except ValueError:
-            pass
-        outlines.append('%s%s' % (indentation, s))
+        write(s)
 
-    def subpool_start_output(pool_path, level, subpool, outlines):
-        indentation = '    '*level
-        outlines.append('%ssubpool %s' % (indentation, pool_path[-1]))
+    def subpool_start_output(pool_path, level, subpool, f):
+        write('%ssubpool %s' % ('    '*level, pool_path[-1]))
 
-    def subpool_end_output(pool_path, level, subpool, outlines):
-        indentation = '    '*level
-        outlines.append('%send\n' % indentation)
+    def subpool_end_output(pool_path, level, subpool, f):
+        write('%send\n' % ('    '*level))
 
-    outlines = []   # list of strings (to be printed)
     pool.traverse(
         callback_leaf=data_item_output,
         callback_subtree_start=subpool_start_output,
         callback_subtree_end=subpool_end_output,
-        user_data=outlines)
-    text = '\n'.join(outlines)
-    if filename is not None:
-        f = open(filename, 'w')
-        f.write(text)
-        f.close()
-    return text
+        user_data=f)
 
 def set_data_item_attribute(pool, attribute_name, value):
     """Set an attribute for all data items in the pool."""
@@ -355,11 +618,8 @@ def listtree2Pool(pool_tree):
     pool.update()
     return pool
 
-import nose.tools as nt
-from parampool.tree.Tree import dump
-from parampool.utils import assert_equal_text
-
 def test_listtree2Pool():
+    from parampool.utils import assert_equal_text
     from math import pi
     tree = [
         'main', [
@@ -401,6 +661,7 @@ sub pool "main" (level=0)
     return m
 
 def test_load_pool_from_file():
+    from parampool.utils import assert_equal_text
     import StringIO
     file_content = """
 subpool main
@@ -458,7 +719,213 @@ end
 """
     assert_equal_text(write_poolfile(m), reference)
 
+def test_interpret_value():
+    import nose.tools as nt
+    from math import pi
+    for value, expected in [
+        ('3', (int, 3)), (' -12  ', (int, -12)),
+        ('1.5', (float, 1.5)), ('1E-4 ', (float, 1E-4)),
+        ('.5', (float, 0.5)), ('on', (str2bool, True)),
+        (' False', (str2bool, False)), ('2*pi', (float, 2*pi)),
+        ('2**10', (int, 1024)), ('1+2j', (complex, 1+2j)),
+        ('[1, 2.5]', (eval, [1, 2.5])), ('(0, 1)', (eval, (0, 1))),
+        ('{"a": 1}', (eval, {'a': 1})), (' RK4 ', (str, 'RK4')),
+        ('Forward-Euler', (str, 'Forward-Euler')),
+        ('/tmp/data.dat', (str, '/tmp/data.dat')),
+        ('e', (str, 'e')), ('some method', (str, 'some method'))]:
+        nt.assert_equal(_interpret_value(value), expected)
+
+def test_poolfile_streaming():
+    import nose.tools as nt
+    import StringIO
+    pool = Pool()
+    pool.subpool('main')
+    pool.add_data_item(name='U', default=1.0, unit='m/s', help='velocity')
+    pool.subpool('body')
+    pool.add_data_item(name='m', default=3, widget='integer')
+    pool.add_data_item(name='method', default='RK4')
+    pool.update()
+
+    # Writing to a file object gives the same text as the return value
+    f = StringIO.StringIO()
+    nt.assert_equal(write_poolfile(pool, f), None)
+    text = write_poolfile(pool)
+    nt.assert_equal(f.getvalue(), text)
+    nt.assert_equal(text, """\
+subpool main
+    U = 1.0   ! m/s   # velocity widget=textline
+    subpool body
+        m = 3   # widget=integer
+        method = RK4   # widget=textline
+    end
+
+end
+""")
+
+    # Read the pool back from a file object, line by line
+    pool2 = read_poolfile(StringIO.StringIO(text.replace('1.0', '2.5')),
+                          Pool())
+    nt.assert_equal(pool2.get_value('U'), 2.5)
+    nt.assert_equal(pool2.get_value('m'), 3)
+    nt.assert_equal(pool2.get_value('method'), 'RK4')
+    f = StringIO.StringIO(text.replace('3', '5'))
+    read_poolfile(f, pool, task='set defaults')
+    nt.assert_equal(pool.get_value('m'), 5)
+
+    # Names starting with subpool or end are data items
+    pool = read_poolfile(StringIO.StringIO("""\
+subpool main
+    dt = 0.1
+    end_time = 10
+    subpool_size = 3
+    subpool sub
+        endpoint = 1
+    end
+end
+"""), Pool())
+    nt.assert_equal(sorted(pool.paths),
+                    ['/main/dt', '/main/end_time', '/main/sub/endpoint',
+                     '/main/subpool_size'])
+    nt.assert_equal(pool.get_value('subpool_size'), 3)
+
+    # Derived data items are written and read with their expressions
+    pool = Pool()
+    pool.subpool('main')
+    pool.add_data_item(name='d', default=0.2, unit='m')
+    pool.add_data_item(name='A', expression='pi*d**2/4', help='area')
+    pool.update()
+    text = write_poolfile(pool)
+    nt.assert_true('    A := pi*d**2/4   # area' in text)
+    pool2 = read_poolfile(StringIO.StringIO(text), Pool())
+    pool2.update()
+    nt.assert_equal(pool2.get('A').data['expression'], 'pi*d**2/4')
+    nt.assert_equal(pool2.get_value('A'), pool.get_value('A'))
+    nt.assert_true('    A := pi*d**2/4   # area' in write_poolfile(pool2))
+    read_poolfile(StringIO.StringIO(
+        text.replace('0.2', '0.4').replace('pi*d**2/4', 'd**2')),
+                  pool2, task='set defaults')
+    pool2.update()
+    nt.assert_almost_equal(pool2.get_value('A'), 0.16, places=14)
+
+def test_poolfile_cache():
+    import nose.tools as nt
+    import tempfile, shutil
+    tmpdir = tempfile.mkdtemp()
+    cachedir = os.path.join(tmpdir, 'cache')
+    filename = os.path.join(tmpdir, 'pool.dat')
+    text = """\
+subpool main
+    U = 2.5   ! m/s   # velocity
+    method = RK4
+end
+"""
+    f = open(filename, 'w'); f.write(text); f.close()
+    global read_poolfile
+    _read_poolfile = read_poolfile
+
+    def read_poolfile_fails(*args, **kwargs):
+        raise AssertionError('file should not be parsed')
+
+    try:
+        pool = load_from_file(filename, cache=cachedir)
+        nt.assert_equal(pool.get_value('U'), 2.5)
+        nt.assert_equal(len(os.listdir(cachedir)), 1)
+        # Second load must come from the cache
+        read_poolfile = read_poolfile_fails
+        pool = load_from_file(filename, cache=cachedir)
+        nt.assert_equal(pool.get_value('method'), 'RK4')
+        read_poolfile = _read_poolfile
+
+        # A changed file invalidates the cache
+        f = open(filename, 'w'); f.write(text.replace('2.5', '3.5'))
+        f.close()
+        pool = load_from_file(filename, cache=cachedir)
+        nt.assert_equal(pool.get_value('U'), 3.5)
+
+        # Setting defaults from a cached file
+        read_poolfile(filename, pool, task='set defaults', cache=cachedir)
+        f = open(filename, 'w'); f.write(text); f.close()
+        read_poolfile(filename, pool, task='set defaults', cache=cachedir)
+        nt.assert_equal(pool.get_value('U'), 2.5)
+        nt.assert_equal(len(os.listdir(cachedir)), 2)
+    finally:
+        read_poolfile = _read_poolfile
+        shutil.rmtree(tmpdir)
+
+def test_poolfile_include():
+    import nose.tools as nt
+    import tempfile, shutil
+    tmpdir = tempfile.mkdtemp()
+
+    def write(name, text):
+        f = open(os.path.join(tmpdir, name), 'w'); f.write(text); f.close()
+        return os.path.join(tmpdir, name)
+
+    write('base.dat', """\
+subpool main
+    U = 2.5   ! m/s   # velocity
+    subpool body
+        m = 3
+        method = RK4
+    end
+end
+""")
+    write('over.dat', """\
+subpool main
+    U = 10 ! km/h
+    subpool body
+        method = RK2
+    end
+end
+""")
+    case = write('case.dat', "include base.dat\noverlay over.dat\n")
+    flat = write('flat.dat', """\
+subpool main
+    U = 2.7777777777777777   ! m/s   # velocity
+    subpool body
+        m = 3
+        method = RK2
+    end
+end
+""")
+    try:
+        pool = load_from_file(case, cache=False)
+        nt.assert_almost_equal(pool.get_value('U'), 10/3.6, places=14)
+        nt.assert_equal(pool.get_value('method'), 'RK2')
+        nt.assert_equal(write_poolfile(pool),
+                        write_poolfile(load_from_file(flat, cache=False)))
+
+        # Included files are parsed once
+        nt.assert_equal(_records_cache.get(os.path.join(tmpdir, 'base.dat'))
+                        [1][0], ('subpool', 'main'))
+
+        # An edit with the same size and modification time is seen
+        base = os.path.join(tmpdir, 'base.dat')
+        os.utime(base, (1E+9, 1E+9))
+        load_from_file(case, cache=False)
+        f = open(base); text = f.read(); f.close()
+        write('base.dat', text.replace('m = 3', 'm = 7'))
+        os.utime(base, (1E+9, 1E+9))
+        pool = load_from_file(case, cache=False)
+        nt.assert_equal(pool.get_value('m'), 7)
+        write('base.dat', text)
+
+        # Cached pools are invalidated when an included file changes
+        cachedir = os.path.join(tmpdir, 'cache')
+        load_from_file(case, cache=cachedir)
+        write('over.dat', "subpool main\nU = 1.5\nend\n")
+        pool = load_from_file(case, cache=cachedir)
+        nt.assert_equal(pool.get_value('U'), 1.5)
+        nt.assert_equal(pool.get_value('method'), 'RK4')
+
+        write('loop.dat', "include loop.dat\n")
+        nt.assert_raises(ValueError, load_from_file,
+                         os.path.join(tmpdir, 'loop.dat'), False)
+    finally:
+        shutil.rmtree(tmpdir)
+
 def test_CommandLineOptions():
+    from parampool.tree.Tree import dump
     import parampool.pool.Pool as Pool
     pool = Pool.make_test_pool_drag()
     clo = CommandLineOptions(pool)
@@ -467,8 +934,25 @@ def test_CommandLineOptions():
     clo.set_values(clargs)
     print dump(pool)
 
+def test_defaults_from_command_line():
+    import nose.tools as nt
+    import sys
+    pool = listtree2Pool(['main', [dict(name='a', default=1.0),
+                                   dict(name='b', default=2.0)]])
+    fingerprint = pool.fingerprint()
+    token = pool.change_token()
+    argv = sys.argv
+    sys.argv = ['x', '--a', '5']
+    try:
+        set_defaults_from_command_line(pool)
+    finally:
+        sys.argv = argv
+    nt.assert_equal(pool.get_value('a'), '5')
+    nt.assert_not_equal(pool.fingerprint(), fingerprint)
+    nt.assert_equal(pool.changed_since(token), ['/main/a'])
 
 if __name__ == '__main__':
     test_load_pool_from_file()
     test_listtree2Pool()
     test_CommandLineOptions()
+    test_defaults_from_command_line()
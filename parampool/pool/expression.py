@@ -0,0 +1,144 @@
+"""
+Evaluation of Python expressions given as values of data items,
+e.g., ``sin(pi/2)``, ``2*0.11``, ``[1, 5, 0.1]``.
+
+The expression is parsed and the syntax tree is checked to
+contain only literals, names, operators, comparisons, indexing,
+attribute look-up of public attributes, and function calls.
+Statements, lambda functions, comprehensions, and names or
+attributes starting with underscore are rejected, so only
+functions that are explicitly available in the namespace can
+be run. The namespace contains the math module and a few safe
+built-in functions, plus the user's namespace if given.
+
+The compiled code objects are cached (with least recently used
+replacement) since the same expressions are frequently given
+over and over again, e.g., in parameter sweeps and web forms.
+"""
+import ast, math, types
+from parampool.utils import LRUCache
+
+class ExpressionError(ValueError):
+    """Raised if a string is not a valid (or allowed) expression."""
+    pass
+
+_safe_builtins = dict(
+    (name, __builtins__[name] if isinstance(__builtins__, dict)
+           else getattr(__builtins__, name))
+    for name in ['abs', 'all', 'any', 'bool', 'complex', 'dict',
+                 'divmod', 'float', 'int', 'len', 'list', 'long',
+                 'max', 'min', 'pow', 'range', 'round', 'set',
+                 'sorted', 'str', 'sum', 'tuple', 'zip',
+                 'True', 'False', 'None'])
+
+# Namespace for evaluation: the math module and safe built-ins
+_namespace = dict((name, getattr(math, name)) for name in dir(math)
+                  if not name.startswith('_'))
+_namespace['__builtins__'] = _safe_builtins
+
+_allowed_nodes = (
+    ast.Expression, ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.IfExp,
+    ast.Dict, ast.Set, ast.Compare, ast.Call, ast.Num, ast.Str,
+    ast.Attribute, ast.Subscript, ast.Name, ast.List, ast.Tuple,
+    ast.Index, ast.Slice, ast.ExtSlice, ast.Ellipsis, ast.keyword,
+    ast.expr_context, ast.boolop, ast.operator, ast.unaryop, ast.cmpop)
+
+def _check(tree, text):
+    """Raise ExpressionError if `tree` contains disallowed constructs."""
+    for node in ast.walk(tree):
+        if not isinstance(node, _allowed_nodes):
+            raise ExpressionError(
+                '%s is not allowed in expression "%s"' %
+                (node.__class__.__name__, text))
+        if isinstance(node, ast.Name) and node.id.startswith('_') or \
+           isinstance(node, ast.Attribute) and node.attr.startswith('_'):
+            raise ExpressionError(
+                'names starting with underscore are not allowed in '
+                'expression "%s"' % text)
+
+# Compiled code objects (or ExpressionError objects), with the
+# expression text as key
+cache = LRUCache(maxsize=1024)
+
+def compile_expression(text):
+    """
+    Return code object for the expression `text` (str).
+    Raise ExpressionError if `text` is not a valid expression,
+    and TypeError if `text` is not a string.
+    """
+    if not isinstance(text, basestring):
+        raise TypeError('expression must be a string, not %s' %
+                        type(text).__name__)
+    code = cache.get(text)
+    if code is None:
+        try:
+            tree = ast.parse(text.strip(), mode='eval')
+            _check(tree, text)
+            code = compile(tree, '<expression>', 'eval')
+        except ExpressionError, e:
+            code = e
+        except (SyntaxError, TypeError, ValueError), e:
+            code = ExpressionError('"%s" is not a valid expression: %s' %
+                                   (text, e))
+        cache[text] = code
+    if isinstance(code, ExpressionError):
+        raise code
+    return code
+
+def evaluate(text, namespace=None):
+    """
+    Evaluate the expression `text` and return the result.
+    Names are looked up in `namespace` (a dict) first, if given,
+    then in the math module, and then among a few built-in
+    functions. Raise ExpressionError if `text` is not a valid
+    expression, otherwise the exception from the evaluation is
+    raised (e.g., NameError for unknown names). `text` can also
+    be a code object from ``compile_expression``, other objects
+    give TypeError.
+    """
+    code = text if isinstance(text, types.CodeType) \
+           else compile_expression(text)
+    if namespace is None:
+        return eval(code, _namespace)
+    else:
+        return eval(code, _namespace, namespace)
+
+def names(text):
+    """
+    Return set of the names in the expression `text` (variables
+    and functions, not attributes). Raise ExpressionError if
+    `text` is not a valid expression.
+    """
+    compile_expression(text)
+    return set(node.id for node in ast.walk(ast.parse(text.strip(),
+                                                      mode='eval'))
+               if isinstance(node, ast.Name))
+
+def cache_info():
+    """Return dict with statistics of the expression cache."""
+    return cache.info()
+
+def test_evaluate():
+    import nose.tools as nt
+    nt.assert_almost_equal(evaluate('sin(pi/2)*exp(0)'), 1, places=14)
+    nt.assert_equal(evaluate(' [1, 5, 0.1] '), [1, 5, 0.1])
+    nt.assert_equal(evaluate('dict(a=1, b=[2])'), {'a': 1, 'b': [2]})
+    nt.assert_equal(evaluate('2*a', namespace={'a': 4}), 8)
+    nt.assert_raises(NameError, evaluate, 'some_name')
+    for text in ['some method', '__import__("os")', 'lambda: 0',
+                 '(1).__class__', '[x for x in range(3)]', '_x+1']:
+        nt.assert_raises(ExpressionError, evaluate, text, {'_x': 2})
+    nt.assert_raises(TypeError, evaluate, 5)
+    nt.assert_raises(TypeError, compile_expression, None)
+    nt.assert_equal(names('pi*d**2/4 + np.sin(t)'),
+                    set(['pi', 'd', 'np', 't']))
+
+    # Repeated expressions are compiled once
+    cache.clear()
+    for i in range(3):
+        evaluate('2*0.11')
+        nt.assert_raises(ExpressionError, evaluate, 'open file')
+    nt.assert_equal((cache.hits, cache.misses), (4, 2))
+
+if __name__ == '__main__':
+    test_evaluate()
@@ -0,0 +1,250 @@
+"""
+Memoization of compute functions that take a pool as argument,
+as ``compute_function(pool)`` in the generated Flask and Django
+applications.
+
+The result of a call is stored under a key made from the
+fingerprint of the pool (a hash of the values and units of all
+data items, which is kept up to date as values are set) and
+a hash of the byte code, constants and default arguments of the
+compute function. A later call with the same values returns the
+stored result without calling the compute function. The results
+are kept in memory (a cache with least recently used replacement)
+and optionally in files in a cache directory, so that they survive
+restarts of the application and are shared between processes::
+
+  from parampool.pool.memo import memoize
+
+  @memoize(maxsize=64, cache=True)
+  def compute_motion(pool):
+      ...
+
+The hash of the compute function does not cover other functions
+that it calls, files that it reads (e.g., uploaded files, whose
+names are the values of data items), or global variables, so
+functions that depend on such data or have side effects that
+must be repeated (e.g., plotting in a figure that is kept between
+calls) should not be memoized. Results are not stored if the
+function (default arguments, closures) or the values in the pool
+contain objects that have no representation that is the same in
+all runs (see ``parampool.utils.stable_repr``); the function is
+then just called.
+"""
+import os, hashlib, functools
+from parampool.utils import LRUCache, stable_repr
+
+def pool_fingerprint(pool):
+    """
+    Return SHA-1 based hash (hex string) of the values and units of
+    all data items in `pool` (see ``Pool.fingerprint``).
+    """
+    return pool.fingerprint()
+
+def code_fingerprint(function):
+    """
+    Return SHA-1 hash (hex string) of the byte code, constants,
+    names, default argument values, and closure contents of
+    `function`. Raise TypeError if some of these objects have
+    no stable representation (see ``stable_repr``).
+    """
+    return hashlib.sha1(stable_repr(function)).hexdigest()
+
+def _cache_file(directory, key):
+    return os.path.join(directory, 'results', key + '.result')
+
+def _load_result(directory, key):
+    """Return (True, result) stored for `key`, or (False, None)."""
+    import cPickle as pickle
+    try:
+        f = open(_cache_file(directory, key), 'rb')
+    except IOError:
+        return False, None
+    try:
+        if f.readline() == 'parampool result %s\n' % key:
+            return True, pickle.loads(f.read())
+    except Exception:
+        pass  # damaged cache file, compute again
+    finally:
+        f.close()
+    return False, None
+
+def _save_result(directory, key, result):
+    import cPickle as pickle
+    cachefile = _cache_file(directory, key)
+    # Write to a temporary file and rename it, since many
+    # processes may read or write the same cache file
+    tmpfile = '%s.%d.tmp' % (cachefile, os.getpid())
+    try:
+        if not os.path.isdir(os.path.dirname(cachefile)):
+            os.makedirs(os.path.dirname(cachefile))
+        f = open(tmpfile, 'wb')
+        try:
+            f.write('parampool result %s\n' % key)
+            f.write(pickle.dumps(result, protocol=2))
+        finally:
+            f.close()
+        os.rename(tmpfile, cachefile)
+    except Exception:
+        # Results that cannot be pickled are only kept in memory
+        if os.path.isfile(tmpfile):
+            os.remove(tmpfile)
+
+def memoize(compute_function=None, maxsize=128, cache=None):
+    """
+    Return a memoized version of ``compute_function(pool)`` (can
+    be used as a decorator, with or without arguments). At most
+    `maxsize` results are kept in memory. `cache` is the directory
+    for storing results on disk, True for ~/.cache/parampool,
+    False for no storage on disk, and None for the directory in
+    the environment variable ``PARAMPOOL_CACHE_DIR`` if it is set
+    (as for cached pool files, see ``read_poolfile``).
+
+    The returned function has the same name and signature as
+    `compute_function`, and the attributes ``cache`` (the in-memory
+    ``LRUCache``, with hit and miss counts) and ``key`` (function
+    returning the key for a pool, or None if no stable key exists).
+    """
+    if compute_function is None:
+        return lambda function: memoize(function, maxsize, cache)
+    try:
+        code_key = code_fingerprint(compute_function)
+    except TypeError:
+        code_key = None  # results cannot be stored
+    memory = LRUCache(maxsize)
+    _missing = object()
+
+    def key(pool):
+        if code_key is None or not pool.has_stable_fingerprint():
+            return None
+        return hashlib.sha1(code_key + pool_fingerprint(pool)).hexdigest()
+
+    @functools.wraps(compute_function)
+    def memoized(pool):
+        k = key(pool)
+        if k is None:
+            return compute_function(pool)
+        result = memory.get(k, _missing)
+        if result is not _missing:
+            return result
+        from parampool.pool.UI import _cache_directory
+        directory = _cache_directory(cache)
+        if directory is not None:
+            found, result = _load_result(directory, k)
+            if found:
+                memory[k] = result
+                return result
+        result = compute_function(pool)
+        memory[k] = result
+        if directory is not None:
+            _save_result(directory, k, result)
+        return result
+
+    memoized.cache = memory
+    memoized.key = key
+    return memoized
+
+# Calls of the compute functions in test_memoize (a global variable
+# since closure contents are part of the key)
+_calls = []
+
+def test_memoize():
+    import nose.tools as nt
+    import tempfile, shutil, inspect
+    from parampool.pool.Pool import Pool
+    pool = Pool()
+    pool.add_data_item(name='a', default=1.0, unit='m')
+    pool.subpool('sub')
+    pool.add_data_item(name='b', default=[1, 2])
+    pool.update()
+    del _calls[:]
+
+    def compute(pool):
+        _calls.append(1)
+        return pool.get_value('a')*len(pool.get_value('b'))
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        f = memoize(compute, maxsize=2, cache=tmpdir)
+        nt.assert_equal(f.__name__, 'compute')
+        nt.assert_equal(inspect.getargspec(f).args, ['pool'])
+        nt.assert_equal(f(pool), 2.0)
+        nt.assert_equal(f(pool), 2.0)
+        nt.assert_equal(len(_calls), 1)
+        key = f.key(pool)
+        pool.set_value('a', '2')
+        nt.assert_equal(f(pool), 4.0)
+        nt.assert_equal(len(_calls), 2)
+        nt.assert_true(f.key(pool) != key)
+        pool.set_value('b', '[1, 2, 3]')
+        f(pool)
+        nt.assert_equal(len(_calls), 3)
+        nt.assert_equal(f.cache.info()['size'], 2)
+
+        # A new process (here: a new memoized function) finds the
+        # results on disk, unless the code has changed
+        pool.set_value('a', '1')
+        pool.set_value('b', '[1, 2]')
+        f = memoize(compute, cache=tmpdir)
+        nt.assert_equal(f(pool), 2.0)
+        nt.assert_equal(len(_calls), 3)
+
+        def compute(pool):
+            _calls.append(1)
+            return 10*pool.get_value('a')
+        f = memoize(compute, cache=tmpdir)
+        nt.assert_equal(f(pool), 10.0)
+        nt.assert_equal(len(_calls), 4)
+    finally:
+        shutil.rmtree(tmpdir)
+
+    # As decorator, in memory only
+    @memoize(maxsize=4, cache=False)
+    def compute2(pool):
+        _calls.append(1)
+        return pool.get_value('a')
+    compute2(pool); compute2(pool)
+    nt.assert_equal(len(_calls), 5)
+    nt.assert_equal(pool_fingerprint(pool), pool_fingerprint(pool))
+
+    # Defaults set from the command line give new keys
+    import sys
+    from parampool.pool.UI import listtree2Pool, \
+         set_defaults_from_command_line
+    pool2 = listtree2Pool(['main', [dict(name='a', default=1.0)]])
+    compute2(pool2); compute2(pool2)
+    nt.assert_equal(len(_calls), 6)
+    argv = sys.argv
+    sys.argv = ['x', '--a', '5']
+    try:
+        set_defaults_from_command_line(pool2)
+    finally:
+        sys.argv = argv
+    nt.assert_equal(compute2(pool2), '5')
+    nt.assert_equal(len(_calls), 7)
+
+    # Closures from the same function differ in their cell contents
+    def make(factor):
+        def compute(pool):
+            _calls.append(1)
+            return factor*pool.get_value('a')
+        return compute
+    f2, f1000 = memoize(make(2), cache=False), memoize(make(1000),
+                                                      cache=False)
+    nt.assert_equal((f2(pool), f1000(pool)), (2.0, 1000.0))
+    nt.assert_true(code_fingerprint(make(2)) != code_fingerprint(make(3)))
+    nt.assert_true(code_fingerprint(compute) != code_fingerprint(make(2)))
+
+    # Objects without a stable representation are never stored
+    class Factor(object):
+        pass
+    factor = Factor()
+    factor.value = 5
+    f = memoize(make(factor), cache=False)
+    nt.assert_equal(f.key(pool), None)
+    nt.assert_raises(TypeError, code_fingerprint, make(factor))
+    pool.add_data_item(name='c', default=factor)
+    nt.assert_false(pool.has_stable_fingerprint())
+    nt.assert_equal(compute2.key(pool), None)
+    n = len(_calls)
+    compute2(pool); compute2(pool)
+    nt.assert_equal(len(_calls), n + 2)
@@ -0,0 +1,426 @@
+"""
+Columnar storage of results from parameter sweeps.
+
+A ``ResultStore`` has one row per case and one column per input
+(swept data item), per output of the compute function, and for the
+CPU time of the case. Each column is a NumPy array, so a sweep over
+millions of cases is stored without Python objects for each case
+and can be post-processed with array operations::
+
+  store = ResultStore()
+  store.run(pool.sweep(), compute, workers=8)
+  store.save('results.npz')
+  ...
+  store = ResultStore.load('results.npz')
+  best = store.input('Mass')[store.output('distance').argmax()]
+
+The compute function returns a dict of outputs (or a single output,
+named ``result``). An output can be a number, a string, or an array.
+Arrays with varying length from case to case (e.g., a trajectory)
+are stored as one long array of all values plus an array of offsets.
+
+Rows are collected in lists and copied to the arrays in chunks, and
+the arrays grow by doubling their capacity. Missing values (an
+output that is not computed in some cases) are NaN in float columns,
+0 in integer columns, and empty in string and varying-length columns.
+
+``save`` writes a ``.npz`` file, or a directory with one ``.npy``
+file per column, which ``load`` can memory-map.
+"""
+import os, time, urllib
+import numpy as np
+from parampool.pool.sweep import _split_batch, vectorized
+
+def _fill_value(dtype):
+    """Return the value used for missing values in arrays of `dtype`."""
+    return np.nan if dtype.kind in 'fc' else \
+           '' if dtype.kind in 'SU' else 0
+
+def _grow(array, used, needed, dtype):
+    """Return `array` or a larger copy with `needed` rows and `dtype`."""
+    if array is not None and needed <= len(array) and \
+       dtype == array.dtype:
+        return array
+    capacity = max(len(array) if array is not None else 0, 1)
+    while capacity < needed:
+        capacity *= 2
+    new = np.empty((capacity,) + (array.shape[1:] if array is not None
+                                  else ()), dtype)
+    if used:
+        new[:used] = array[:used]
+    return new
+
+
+class _Column(object):
+    """
+    Array with one row per case. In a varying-length column the
+    rows are stored after each other in ``values``, and the values
+    of row i are ``values[offsets[i]:offsets[i+1]]``.
+    """
+    def __init__(self, missing=0):
+        self.pending = [None]*missing  # rows not copied to arrays yet
+        self.size = 0                  # rows in the arrays
+        self.data = None
+        self.ragged = False
+        self.values = self.offsets = None  # varying-length column
+        self.nvalues = 0
+
+    @classmethod
+    def from_arrays(cls, data, offsets=None):
+        column = cls()
+        if offsets is None:
+            column.data = data
+            column.size = len(data)
+        else:
+            column.ragged = True
+            column.values, column.offsets = data, offsets
+            column.size = len(offsets) - 1
+            column.nvalues = offsets[-1]
+        return column
+
+    def flush(self):
+        """Copy the pending rows to the arrays."""
+        if not self.pending:
+            return
+        rows, self.pending = self.pending, []
+        if not self.ragged:
+            # Fast path: no missing values and rows of the same shape
+            try:
+                block = np.array(rows)
+            except ValueError:
+                block = None
+            if block is not None and block.dtype != object and \
+               (self.data is None or
+                block.shape[1:] == self.data.shape[1:]):
+                self._append_block(block)
+                return
+        present = [np.asarray(row) for row in rows if row is not None]
+        if not present and self.data is None and self.values is None:
+            self.pending = rows  # no type known yet
+            return
+        shapes = set(a.shape for a in present)
+        if self.data is not None:
+            shapes.add(self.data.shape[1:])
+        if not self.ragged and len(shapes) > 1:
+            self._make_ragged()
+        if self.ragged:
+            self._flush_ragged(rows, present)
+            return
+
+        if present:
+            block = np.array(present)
+        else:
+            block = np.empty((0,) + self.data.shape[1:], self.data.dtype)
+        if len(present) < len(rows):
+            dtype = block.dtype if self.data is None else \
+                    np.promote_types(self.data.dtype, block.dtype)
+            full = np.empty((len(rows),) + block.shape[1:], dtype)
+            full.fill(_fill_value(dtype))
+            full[np.array([row is not None for row in rows])] = block
+            block = full
+        self._append_block(block)
+
+    def _append_block(self, block):
+        """Append the rows in the array `block`."""
+        if self.data is None:
+            self.data = np.empty((0,) + block.shape[1:], block.dtype)
+        dtype = np.promote_types(self.data.dtype, block.dtype)
+        self.data = _grow(self.data, self.size, self.size + len(block),
+                          dtype)
+        self.data[self.size:self.size + len(block)] = block
+        self.size += len(block)
+
+    def _make_ragged(self):
+        """Convert rows of equal length to a varying-length column."""
+        self.ragged = True
+        if self.data is None:
+            self.offsets = np.zeros(1, int)
+            return
+        if self.data.ndim < 2:
+            raise ValueError('cannot store both numbers and arrays '
+                             'in the same column')
+        length = self.data.shape[1]
+        self.values = self.data[:self.size].reshape(
+            (self.size*length,) + self.data.shape[2:])
+        self.nvalues = len(self.values)
+        self.offsets = np.arange(self.size + 1)*length
+        self.data = None
+
+    def _flush_ragged(self, rows, present):
+        if any(a.ndim == 0 for a in present):
+            raise ValueError('cannot store both numbers and arrays '
+                             'in the same column')
+        if len(present) < len(rows):
+            like = present[0] if present else self.values
+            empty = np.empty((0,) + like.shape[1:], like.dtype)
+            present = [np.asarray(row) if row is not None else empty
+                       for row in rows]
+        block = np.concatenate(present)
+        lengths = np.cumsum([len(a) for a in present])
+        dtype = block.dtype if self.values is None else \
+                np.promote_types(self.values.dtype, block.dtype)
+        if self.values is None:
+            self.values = np.empty((0,) + block.shape[1:], dtype)
+        self.values = _grow(self.values, self.nvalues,
+                            self.nvalues + len(block), dtype)
+        self.values[self.nvalues:self.nvalues + len(block)] = block
+        self.offsets = _grow(self.offsets, self.size + 1,
+                             self.size + 1 + len(rows), self.offsets.dtype)
+        self.offsets[self.size + 1:self.size + 1 + len(rows)] = \
+            self.nvalues + lengths
+        self.nvalues += len(block)
+        self.size += len(rows)
+
+    def array(self):
+        """Return the rows (array, or list of arrays if ragged)."""
+        self.flush()
+        if self.pending:  # only missing values
+            return np.zeros(len(self.pending)) + np.nan
+        if self.ragged:
+            values, offsets = self.values, self.offsets
+            return [values[offsets[i]:offsets[i+1]]
+                    for i in range(self.size)]
+        return self.data[:self.size]
+
+    def arrays(self):
+        """Return (data, offsets) for storage, offsets None if not ragged."""
+        self.flush()
+        if self.pending:
+            return np.zeros(len(self.pending)) + np.nan, None
+        if self.ragged:
+            return self.values[:self.nvalues], self.offsets[:self.size+1]
+        return self.data[:self.size], None
+
+
+class _Timed(object):
+    """
+    Compute function that also returns its CPU time (for vectorized
+    compute functions: the results and times per case).
+    """
+    def __init__(self, compute_function):
+        self.compute_function = compute_function
+        self.vectorized = getattr(compute_function, 'vectorized', False)
+
+    def __call__(self, case):
+        t0 = time.clock()
+        result = self.compute_function(case)
+        t = time.clock() - t0
+        if self.vectorized:
+            n = len(case)
+            return [(r, t/n) for r in _split_batch(result, n)]
+        return result, t
+
+
+class ResultStore(object):
+    """
+    Results from a parameter sweep in columns, stored as NumPy
+    arrays: ``input/<name>`` for the swept data items,
+    ``output/<name>`` for the outputs of the compute function, and
+    ``time`` for the CPU time of each case. Rows are copied to the
+    arrays in chunks of `chunksize` rows.
+    """
+    def __init__(self, chunksize=1024):
+        self.chunksize = chunksize
+        self.columns = {}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def keys(self):
+        return sorted(self.columns)
+
+    def append(self, inputs=None, outputs=None, time=None):
+        """
+        Add a row with input values `inputs` (dict), outputs
+        `outputs` (dict, or a single output named ``result``),
+        and CPU time `time`.
+        """
+        row = {}
+        for name in (inputs or {}):
+            row['input/' + name] = inputs[name]
+        if outputs is not None:
+            if not isinstance(outputs, dict):
+                outputs = {'result': outputs}
+            for name in outputs:
+                row['output/' + name] = outputs[name]
+        if time is not None:
+            row['time'] = time
+        for key, column in self.columns.iteritems():
+            column.pending.append(row.pop(key, None))
+        for key in row:  # new columns
+            column = self.columns[key] = _Column(self.size)
+            column.pending.append(row[key])
+        self.size += 1
+        if self.size % self.chunksize == 0:
+            self.flush()
+
+    def add_case(self, case, outputs, time=None):
+        """Add a row for a ``SweepCase`` `case` (swept values as inputs)."""
+        self.append(dict(zip(case.sweep.names,
+                             [value for data_item, value in case.values])),
+                    outputs, time)
+
+    def run(self, sweep, compute_function, **kwargs):
+        """
+        Run `compute_function` for all cases in `sweep` and store
+        the inputs, outputs, and CPU time of each case. The keyword
+        arguments are passed on to ``Sweep.run`` (workers etc.).
+        With ``capture_errors=True``, failed cases are not stored,
+        and the list of (case, traceback) for these is returned.
+        """
+        errors = []
+        for case, result, error in sweep.run(_Timed(compute_function),
+                                             **kwargs):
+            if error is None:
+                self.add_case(case, *result)
+            else:
+                errors.append((case, error))
+        return errors
+
+    def flush(self):
+        """Copy all rows to the arrays."""
+        for column in self.columns.itervalues():
+            column.flush()
+
+    def __getitem__(self, key):
+        """
+        Return column `key` as an array, or as a list of arrays
+        (views) if the rows have varying length.
+        """
+        return self.columns[key].array()
+
+    def input(self, name):
+        return self['input/' + name]
+
+    def output(self, name='result'):
+        return self['output/' + name]
+
+    @property
+    def time(self):
+        return self['time']
+
+    def save(self, filename, compressed=False):
+        """
+        Save all columns to `filename`: an ``.npz`` file if the name
+        ends with ``.npz`` (`compressed` for ``numpy.savez_compressed``),
+        otherwise a directory with an ``.npy`` file for each array.
+        """
+        arrays = {}
+        for key, column in self.columns.iteritems():
+            data, offsets = column.arrays()
+            arrays[key] = data
+            if offsets is not None:
+                arrays[key + '#offsets'] = offsets
+        if filename.endswith('.npz'):
+            (np.savez_compressed if compressed else np.savez)(
+                filename, **arrays)
+        else:
+            if not os.path.isdir(filename):
+                os.makedirs(filename)
+            for key in arrays:
+                np.save(os.path.join(filename,
+                                     urllib.quote(key, safe='') + '.npy'),
+                        arrays[key])
+
+    @classmethod
+    def load(cls, filename, mmap_mode='r'):
+        """
+        Return the store saved in `filename` by ``save``. The arrays
+        in a directory are memory-mapped with `mmap_mode` (None reads
+        them into memory). New rows can be added as usual.
+        """
+        if os.path.isdir(filename):
+            arrays = dict(
+                (urllib.unquote(name[:-4]),
+                 np.load(os.path.join(filename, name), mmap_mode=mmap_mode))
+                for name in os.listdir(filename) if name.endswith('.npy'))
+        else:
+            npz = np.load(filename)
+            arrays = dict((key, npz[key]) for key in npz.files)
+            npz.close()
+        store = cls()
+        for key in arrays:
+            if not key.endswith('#offsets'):
+                store.columns[key] = _Column.from_arrays(
+                    arrays[key], arrays.get(key + '#offsets'))
+                store.size = store.columns[key].size
+        return store
+
+    def __repr__(self):
+        return 'ResultStore(%d rows, columns: %s)' % \
+               (self.size, ', '.join(self.keys()))
+
+def _trajectory(case):
+    """Compute function for test_ResultStore (must be picklable)."""
+    n = case.get_value('n')
+    return {'x': np.linspace(0, 1, n), 'max': float(n),
+            'method': case.get_value('method')}
+
+@vectorized
+def _trajectory_vectorized(case):
+    """Vectorized compute function for test_ResultStore."""
+    return {'max': case.get_value('n')*1.0,
+            'method': case.get_value('method')}
+
+def test_ResultStore():
+    import nose.tools as nt
+    import tempfile, shutil
+    from parampool.pool.Pool import Pool
+    store = ResultStore(chunksize=4)
+    store.append({'a': 1}, {'y': 2.5}, time=0.1)
+    store.append({'a': 2}, {'y': 3.5, 'z': 'RK4'}, time=0.1)
+    store.append({'a': 3.5}, None, time=0.2)
+    for i in range(10):
+        store.append({'a': i}, {'y': i, 'z': 'ForwardEuler'})
+    nt.assert_equal(len(store), 13)
+    nt.assert_equal(store.keys(), ['input/a', 'output/y', 'output/z',
+                                   'time'])
+    nt.assert_equal(list(store.input('a')[:4]), [1, 2, 3.5, 0])
+    nt.assert_equal(list(store.output('z')[:4]),
+                    ['', 'RK4', '', 'ForwardEuler'])
+    nt.assert_true(np.isnan(store.output('y')[2]))
+    nt.assert_true(np.isnan(store.time[-1]))
+
+    # Sweep with array outputs of varying length
+    pool = Pool()
+    pool.add_data_item(name='n', default=1)
+    pool.add_data_item(name='method', default='RK4')
+    pool.update()
+    pool.set_value('n', '3 & 3 & 5')
+    pool.set_value('method', 'RK2 & RK4')
+    store = ResultStore(chunksize=2)
+    store.run(pool.sweep(), _trajectory, workers=1)
+    nt.assert_equal(len(store), 6)
+    nt.assert_equal(list(store.input('n')), [3, 3, 3, 3, 5, 5])
+    nt.assert_equal(list(store.input('method')), ['RK2', 'RK4']*3)
+    nt.assert_equal(list(store.output('max')), [3.]*4 + [5.]*2)
+    nt.assert_equal([len(x) for x in store.output('x')],
+                    [3, 3, 3, 3, 5, 5])
+    nt.assert_equal(list(store.output('x')[5]), [0, 0.25, 0.5, 0.75, 1])
+    nt.assert_true((store.time >= 0).all())
+    batch_store = ResultStore()
+    batch_store.run(pool.sweep(), _trajectory_vectorized, workers=1)
+    for key in 'input/n', 'input/method', 'output/max':
+        nt.assert_equal(batch_store[key].tolist(), store[key].tolist())
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for filename in 'results.npz', 'results':
+            filename = os.path.join(tmpdir, filename)
+            store.save(filename)
+            loaded = ResultStore.load(filename)
+            nt.assert_equal(loaded.keys(), store.keys())
+            nt.assert_equal(len(loaded), 6)
+            for key in store.keys():
+                nt.assert_equal([np.asarray(row).tolist()
+                                 for row in loaded[key]],
+                                [np.asarray(row).tolist()
+                                 for row in store[key]])
+            # Rows can be added to a loaded store
+            loaded.append({'n': 2, 'method': 'RK4'},
+                          {'x': [0, 1], 'max': 2.})
+            nt.assert_equal(list(loaded.output('x')[-1]), [0, 1])
+            nt.assert_equal(list(loaded.input('n')), [3]*4 + [5]*2 + [2])
+    finally:
+        shutil.rmtree(tmpdir)
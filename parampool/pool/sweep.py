@@ -0,0 +1,611 @@
+"""
+Parameter sweeps over data items with multiple values.
+
+A data item given the value ``1 & 5 & 10`` has three values, and
+a sweep runs through all combinations of the values of all such
+data items. ``Sweep`` enumerates the cases lazily, by decoding a
+case number into one value index per axis, so neither the list of
+combinations nor copies of the pool are made. Each case is a
+``SweepCase``: a light-weight view of the pool that returns the
+case's value for the swept data items and the ordinary value for
+all other data items. Derived data items (with an ``expression``)
+are computed from the case's values. The pool itself is never
+modified.
+
+An axis is either a single data item or a group of data items
+that are zipped, i.e., run through their values in parallel (the
+first value of all items, then the second value of all, and so on).
+The cases form the cartesian product of the axes::
+
+  pool.set_value('Mass', '0.1 & 0.2 & 0.5')
+  pool.set_value('Radius', '0.11 & 0.12 & 0.15')
+  pool.set_value('Time step', '0.01 & 0.001')
+  for case in pool.sweep(zip=[('Mass', 'Radius')]):
+      m, R, dt = [case.get_value(name)
+                  for name in ('Mass', 'Radius', 'Time step')]
+
+gives 3*2 = 6 cases.
+
+``Sweep.run`` runs a compute function for all cases, in parallel
+in a number of worker processes (``multiprocessing``)::
+
+  for case, result, error in pool.sweep().run(compute, workers=8):
+      print case, result
+
+The cases are sent to the workers as chunks of case numbers, and
+each worker builds its cases from its own copy of the sweep.
+
+A compute function written with NumPy can be declared ``vectorized``.
+It is then called once per chunk with a ``BatchCase``, where
+``get_value`` returns an array with the value in each case of the
+chunk for the swept data items, and its result is split into one
+result per case::
+
+  @vectorized
+  def compute(case):
+      m, R = case.get_value('Mass'), case.get_value('Radius')
+      return {'density': m/(4*pi/3*R**3)}
+"""
+import itertools, traceback
+zip_ = zip  # Sweep has an argument zip
+
+class Sweep(object):
+    """
+    Sequence of all cases in a parameter sweep over the data items
+    in `pool` that have multiple values. `names` is a list of the
+    data items to sweep over (default: all data items with multiple
+    values). `zip` is a list of groups (lists) of data item names
+    that are zipped (the items in a group must have the same number
+    of values). A data item with multiple values that is not swept
+    over has its first value in all cases.
+    """
+    def __init__(self, pool, names=None, zip=None):
+        self.pool = pool
+        pool.update()
+        if names is None:
+            data_items = [pool.paths2data_items[path]
+                          for path in pool.paths
+                          if pool.paths2data_items[path].
+                          has_multiple_values()]
+        else:
+            data_items = [pool.get(name) for name in names]
+        # Build the axes: a list of lists of data items
+        zipped = {}  # data item -> its zip group
+        self.axes = []
+        for group in (zip or []):
+            axis = [pool.get(name) for name in group]
+            for data_item in axis:
+                if data_item in zipped:
+                    raise ValueError('data item "%s" is in more than '
+                                     'one zip group' % data_item.name)
+                zipped[data_item] = axis
+            self.axes.append(axis)
+        for data_item in data_items:
+            if data_item not in zipped:
+                self.axes.append([data_item])
+        # Values are computed once (the data items are not touched).
+        # A choice is a tuple of (data item, value) pairs for an axis.
+        self._choices = []
+        for axis in self.axes:
+            values = [data_item.get_values() for data_item in axis]
+            n = len(values[0])
+            if any(len(v) != n for v in values):
+                raise ValueError(
+                    'zipped data items must have the same number of '
+                    'values: %s' % ', '.join(
+                    ['%s (%d)' % (data_item.name, len(v))
+                     for data_item, v in zip_(axis, values)]))
+            self._choices.append([tuple(zip_(axis, item_values))
+                                  for item_values in zip_(*values)])
+        self.shape = tuple(len(choices) for choices in self._choices)
+        self.size = 1
+        for length in self.shape:
+            self.size *= length
+        # Position of each swept data item in SweepCase.values
+        swept = [data_item for axis in self.axes for data_item in axis]
+        self._positions = dict(
+            (data_item, i) for i, data_item in enumerate(swept))
+        # Names of the swept data items in the same order (full path
+        # if the name is not unique in the pool)
+        self.names = []
+        paths = None
+        for data_item in swept:
+            if len(pool.short_names2paths.get(data_item.name, ())) > 1:
+                if paths is None:
+                    paths = dict((id(d), path) for path, d in
+                                 pool.paths2data_items.iteritems())
+                self.names.append(paths[id(data_item)])
+            else:
+                self.names.append(data_item.name)
+        self._data_items = {}  # cache: name -> (data item, position)
+        # Axis no. and no. in the axis for each position
+        self._axis_of = [(k, j) for k, axis in enumerate(self.axes)
+                         for j in range(len(axis))]
+        self._arrays = {}  # cache: position -> array of values
+
+    def _locate(self, data_item_name):
+        """Return data item `data_item_name` and its position in cases."""
+        try:
+            return self._data_items[data_item_name]
+        except KeyError:
+            data_item = self.pool.get(data_item_name)
+            located = data_item, self._positions.get(data_item)
+            self._data_items[data_item_name] = located
+            return located
+
+    def __len__(self):
+        return self.size
+
+    def indices(self, case):
+        """Return the value index for each axis in case no. `case`."""
+        indices = []
+        for length in reversed(self.shape):
+            case, i = divmod(case, length)
+            indices.append(i)
+        indices.reverse()
+        return tuple(indices)
+
+    def __getitem__(self, case):
+        """Return ``SweepCase`` no. `case` (negative counts from the end)."""
+        n = len(self)
+        if case < 0:
+            case += n
+        if not 0 <= case < n:
+            raise IndexError('sweep case %d out of range (%d cases)' %
+                             (case, n))
+        values = [pair for choices, i in
+                  zip_(self._choices, self.indices(case))
+                  for pair in choices[i]]
+        return SweepCase(self, tuple(values), case)
+
+    def __iter__(self):
+        # The last axis runs fastest, as in nested loops
+        chain = itertools.chain.from_iterable
+        for case, choice in enumerate(itertools.product(*self._choices)):
+            yield SweepCase(self, tuple(chain(choice)), case)
+
+    def cases(self, start=0, stop=None):
+        """Iterate over the ``SweepCase`` objects no. start:stop."""
+        stop = self.size if stop is None else min(stop, self.size)
+        if start >= stop:
+            return
+        # Count the value indices up as an odometer
+        indices = list(self.indices(start))
+        choices, shape = self._choices, self.shape
+        last = len(shape) - 1
+        chain = itertools.chain.from_iterable
+        for number in xrange(start, stop):
+            yield SweepCase(self, tuple(chain(
+                [c[i] for c, i in zip_(choices, indices)])), number)
+            k = last
+            while k >= 0:
+                indices[k] += 1
+                if indices[k] < shape[k]:
+                    break
+                indices[k] = 0
+                k -= 1
+
+    def batch(self, start=0, stop=None):
+        """Return cases start:stop as one ``BatchCase``."""
+        return BatchCase(self, start, len(self) if stop is None else stop)
+
+    def _values_in_cases(self, position, numbers):
+        """Return array with values of swept data item no. `position`."""
+        import numpy as np
+        k, j = self._axis_of[position]
+        if position not in self._arrays:
+            self._arrays[position] = np.array(
+                [choice[j][1] for choice in self._choices[k]])
+        stride = 1
+        for length in self.shape[k+1:]:
+            stride *= length
+        return self._arrays[position][(numbers//stride) % self.shape[k]]
+
+    def run(self, compute_function, workers=None, chunksize=None,
+            ordered=True, capture_errors=False):
+        """
+        Call ``compute_function(case)`` for all cases in this sweep
+        and yield ``(case, result, error)`` for each case, see
+        ``run_sweep``.
+        """
+        return run_sweep(self, compute_function, workers, chunksize,
+                         ordered, capture_errors)
+
+    def __repr__(self):
+        return 'Sweep(%d cases over %s)' % (len(self), ' x '.join(
+            ['(%s)' % ', '.join([data_item.name for data_item in axis])
+             if len(axis) > 1 else axis[0].name for axis in self.axes]))
+
+
+class SweepCase(object):
+    """
+    One case in a parameter sweep: a view of the pool in `sweep`
+    where the swept data items have the values in `values`, a tuple
+    of (data item, value) pairs. `number` is the case number in the
+    sweep. The methods for looking up values have the same names and
+    arguments as in class ``Pool``.
+    """
+    __slots__ = ('sweep', 'values', 'number')
+
+    def __init__(self, sweep, values, number=0):
+        self.sweep = sweep
+        self.values = values
+        self.number = number
+
+    @property
+    def pool(self):
+        return self.sweep.pool
+
+    def get(self, data_item_name):
+        """Return the ``DataItem`` object with name `data_item_name`."""
+        return self.sweep._locate(data_item_name)[0]
+
+    def get_value(self, data_item_name, default=None):
+        """
+        Return the value of the data item with name `data_item_name`
+        in this case. If the name is not found, an exception is raised
+        if `default` is None, otherwise `default` is returned.
+        """
+        try:
+            data_item, i = self.sweep._locate(data_item_name)
+        except ValueError, e:
+            if default is None:
+                raise e
+            return default
+        if i is None:
+            if data_item._evaluator is not None:
+                # Derived data item, computed from the values here
+                return data_item._evaluator.evaluate(self)
+            return data_item.get_value()
+        return self.values[i][1]
+
+    def get_values(self, data_item_name, default=None):
+        """Return the value in this case as a list (as in ``Pool``)."""
+        return [self.get_value(data_item_name, default)]
+
+    def get_unit(self, data_item_name):
+        return self.pool.get_unit(data_item_name)
+
+    def get_value_unit(self, data_item_name, default=None):
+        """
+        Return PhysicalQuantity object with value and unit for
+        the data item with name `data_item_name` in this case.
+        """
+        unit = self.pool.get_unit(data_item_name)
+        if unit is None:
+            raise ValueError('SweepCase.get_value_unit: unit is not '
+                             'registered for "%s"' % data_item_name)
+        from parampool.PhysicalQuantities import PhysicalQuantity as PQ
+        return PQ('%g %s' % (self.get_value(data_item_name, default),
+                             unit))
+
+    def __str__(self):
+        return ', '.join(['%s=%s' % (data_item.name, value)
+                          for data_item, value in self.values])
+
+    def __repr__(self):
+        return 'SweepCase(%d: %s)' % (self.number, self)
+
+class BatchCase(object):
+    """
+    Cases no. `start` to `stop` (not included) in `sweep` as one
+    view of the pool, for vectorized compute functions. ``get_value``
+    returns an array with the value in each case for a swept data
+    item and the ordinary value for all other data items, so the
+    values broadcast in NumPy expressions.
+    """
+    __slots__ = ('sweep', 'start', 'stop')
+
+    def __init__(self, sweep, start, stop):
+        self.sweep = sweep
+        self.start = start
+        self.stop = stop
+
+    @property
+    def pool(self):
+        return self.sweep.pool
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def get(self, data_item_name):
+        """Return the ``DataItem`` object with name `data_item_name`."""
+        return self.sweep._locate(data_item_name)[0]
+
+    def get_value(self, data_item_name, default=None):
+        """
+        Return the values of the data item with name `data_item_name`
+        in these cases (array if swept, otherwise the single value).
+        If the name is not found, an exception is raised if `default`
+        is None, otherwise `default` is returned.
+        """
+        try:
+            data_item, i = self.sweep._locate(data_item_name)
+        except ValueError, e:
+            if default is None:
+                raise e
+            return default
+        if i is None:
+            if data_item._evaluator is not None:
+                # Derived data item, computed from the values here
+                return data_item._evaluator.evaluate(self)
+            return data_item.get_value()
+        import numpy as np
+        return self.sweep._values_in_cases(
+            i, np.arange(self.start, self.stop))
+
+    def get_values(self, data_item_name, default=None):
+        return [self.get_value(data_item_name, default)]
+
+    def get_unit(self, data_item_name):
+        return self.pool.get_unit(data_item_name)
+
+    def __repr__(self):
+        return 'BatchCase(%d:%d)' % (self.start, self.stop)
+
+def vectorized(compute_function):
+    """
+    Declare `compute_function` as vectorized (can be used as a
+    decorator): ``run_sweep`` calls it with a ``BatchCase`` for a
+    chunk of cases instead of once per case.
+    """
+    compute_function.vectorized = True
+    return compute_function
+
+def _split_batch(result, n):
+    """
+    Split `result` from a vectorized compute function into `n`
+    results: arrays, lists and tuples of length `n` are split
+    along the first dimension, dicts are split value by value,
+    and other values are the same in all cases.
+    """
+    if isinstance(result, dict):
+        values = [_split_batch(result[name], n) for name in result]
+        return [dict(zip_(result, case_values))
+                for case_values in zip_(*values)]
+    if isinstance(result, (list, tuple)) or getattr(result, 'ndim', 0):
+        if len(result) != n:
+            raise ValueError('vectorized compute function returned '
+                             '%d results for %d cases' % (len(result), n))
+        return list(result)
+    return [result]*n
+
+class SweepError(Exception):
+    """Raised when the compute function fails for a case in a sweep."""
+    def __init__(self, number, traceback):
+        Exception.__init__(self, 'sweep case %d failed:\n%s' %
+                           (number, traceback))
+        self.number = number
+        self.traceback = traceback
+
+def _run_cases(sweep, compute_function, start, stop):
+    """Return [(case, result, error), ...] for cases start:stop."""
+    if getattr(compute_function, 'vectorized', False):
+        try:
+            results = _split_batch(
+                compute_function(sweep.batch(start, stop)), stop - start)
+            errors = itertools.repeat(None)
+        except Exception:
+            results = itertools.repeat(None)
+            errors = itertools.repeat(traceback.format_exc())
+        return zip_(sweep.cases(start, stop), results, errors)
+    results = []
+    for case in sweep.cases(start, stop):
+        try:
+            results.append((case, compute_function(case), None))
+        except Exception:
+            results.append((case, None, traceback.format_exc()))
+    return results
+
+_worker_sweep = None  # (sweep, compute_function) in a worker process
+
+def _init_worker(sweep, compute_function):
+    global _worker_sweep
+    _worker_sweep = sweep, compute_function
+
+def _run_chunk(chunk):
+    sweep, compute_function = _worker_sweep
+    # Send case numbers, not cases, back (the pool is not pickled)
+    results = _run_cases(sweep, compute_function, *chunk)
+    return chunk[0], [(result, error) for case, result, error in results]
+
+def run_sweep(sweep, compute_function, workers=None, chunksize=None,
+              ordered=True, capture_errors=False):
+    """
+    Call ``compute_function(case)`` for all cases in `sweep` (a
+    ``Sweep`` object) and yield ``(case, result, error)`` for each
+    case, where `case` is the ``SweepCase`` object.
+
+    The cases are run in `workers` processes (default: the number
+    of CPUs), or in this process if `workers` is 1. The case numbers
+    are split into chunks of `chunksize` cases (default: about 4
+    chunks per worker), and each chunk is a task for a worker.
+    With `ordered` the results come in case order, otherwise in
+    the order the chunks are completed.
+
+    A vectorized compute function (see ``vectorized``) is called
+    once per chunk, with a ``BatchCase``, and its result is split
+    into one result per case.
+
+    If the compute function raises an exception, `error` is the
+    traceback (string) and `result` is None when `capture_errors`
+    is True, otherwise ``SweepError`` is raised (and the remaining
+    cases are not run). The results must be possible to pickle.
+    The sweep and the compute function are inherited by the
+    worker processes where ``fork`` is available, and must be
+    possible to pickle elsewhere (Windows).
+    """
+    n = len(sweep)
+    if workers is None:
+        import multiprocessing
+        workers = multiprocessing.cpu_count()
+    if chunksize is None:
+        chunksize = max(1, n//(4*workers))
+    chunks = [(start, min(start + chunksize, n))
+              for start in xrange(0, n, chunksize)]
+    if workers == 1:
+        processes = None
+        results = (_run_cases(sweep, compute_function, *chunk)
+                   for chunk in chunks)
+    else:
+        import multiprocessing
+        processes = multiprocessing.Pool(min(workers, len(chunks)),
+                                         _init_worker,
+                                         (sweep, compute_function))
+        imap = processes.imap if ordered else processes.imap_unordered
+        results = imap(_run_chunk, chunks)
+    try:
+        for chunk_results in results:
+            if processes is not None:
+                start, chunk_results = chunk_results
+                chunk_results = itertools.izip(
+                    sweep.cases(start, start + len(chunk_results)),
+                    *zip_(*chunk_results))
+            for case, result, error in chunk_results:
+                if error is not None and not capture_errors:
+                    raise SweepError(case.number, error)
+                yield case, result, error
+    finally:
+        if processes is not None:
+            processes.terminate()
+            processes.join()
+
+def _compute_area(case):
+    """Compute function for test_run_sweep (must be picklable)."""
+    if case.get_value('a') < 0:
+        raise ValueError('negative a')
+    return case.get_value('a')*case.get_value('b')
+
+@vectorized
+def _compute_area_vectorized(case):
+    """Vectorized compute function for test_vectorized."""
+    a, b = case.get_value('a'), case.get_value('b')
+    if (a < 0).any():
+        raise ValueError('negative a')
+    return {'area': a*b, 'b': b, 'n': len(case)}
+
+def test_sweep():
+    import nose.tools as nt
+    from parampool.pool.Pool import Pool
+    pool = Pool()
+    pool.add_data_item(name='m', default=1.0)
+    pool.add_data_item(name='R', default=0.1)
+    pool.subpool('numerics')
+    pool.add_data_item(name='dt', default=0.1)
+    pool.add_data_item(name='method', default='RK4')
+    pool.add_data_item(name='steps', expression='int(round(1/dt))')
+    pool.update()
+    pool.set_value('m', '0.1 & 0.2 & 0.5')
+    pool.set_value('R', '0.11 & 0.12 & 0.15')
+    pool.set_value('dt', '0.01 & 0.001')
+
+    # Cartesian product over all data items with multiple values
+    sweep = pool.sweep()
+    nt.assert_equal(len(sweep), 18)
+    nt.assert_equal(sweep.shape, (3, 3, 2))
+    cases = [(case.get_value('m'), case.get_value('R'),
+              case.get_value('dt'), case.get_value('method'))
+             for case in sweep]
+    import itertools
+    nt.assert_equal(cases, list(itertools.product(
+        [0.1, 0.2, 0.5], [0.11, 0.12, 0.15], [0.01, 0.001], ['RK4'])))
+    nt.assert_equal(sweep[-1].get_value('/numerics/dt'), 0.001)
+    # Derived data items are computed from the values in each case
+    nt.assert_equal([sweep[i].get_value('steps') for i in range(2)],
+                    [100, 1000])
+    nt.assert_equal(pool.get_value('steps'), 100)
+    nt.assert_equal(str(sweep[1]), 'm=0.1, R=0.11, dt=0.001')
+    nt.assert_equal(sweep.names, ['m', 'R', 'dt'])
+    nt.assert_raises(IndexError, sweep.__getitem__, 18)
+    nt.assert_equal([str(case) for case in sweep.cases(3, 11)],
+                    [str(sweep[i]) for i in range(3, 11)])
+    # The pool is not changed
+    nt.assert_equal(pool.get_values('m'), [0.1, 0.2, 0.5])
+    nt.assert_equal(pool.get_value('dt'), 0.01)
+
+    # Zipped axes
+    sweep = pool.sweep(zip=[('m', 'R')])
+    nt.assert_equal(len(sweep), 6)
+    nt.assert_equal([(case.get_value('m'), case.get_value('R'))
+                     for case in sweep][::2],
+                    [(0.1, 0.11), (0.2, 0.12), (0.5, 0.15)])
+    pool.set_value('R', '0.11 & 0.12')
+    nt.assert_raises(ValueError, pool.sweep, zip=[('m', 'R')])
+
+    # Sweep over a subset of the data items
+    sweep = pool.sweep(names=['dt'])
+    nt.assert_equal([case.get_value('dt') for case in sweep],
+                    [0.01, 0.001])
+    nt.assert_equal(sweep[1].get_value('m'), 0.1)
+
+def test_run_sweep():
+    import nose.tools as nt
+    from parampool.pool.Pool import Pool
+    pool = Pool()
+    pool.add_data_item(name='a', default=1)
+    pool.add_data_item(name='b', default=1)
+    pool.update()
+    pool.set_value('a', ' & '.join([str(i) for i in range(10)]))
+    pool.set_value('b', '1 & 10')
+    sweep = pool.sweep()
+    expected = [(a, a*b) for a in range(10) for b in (1, 10)]
+    for workers in 1, 3:
+        for ordered in True, False:
+            results = [(case.get_value('a'), result) for case, result, error
+                       in sweep.run(_compute_area, workers=workers,
+                                    chunksize=3, ordered=ordered)]
+            if not ordered:
+                results.sort()
+            nt.assert_equal(results, expected)
+
+    # Errors in the compute function
+    pool.set_value('a', '1 & -1 & 2')
+    sweep = pool.sweep()
+    for workers in 1, 2:
+        results = list(sweep.run(_compute_area, workers=workers,
+                                 chunksize=1, capture_errors=True))
+        nt.assert_equal([result for case, result, error in results],
+                        [1, 10, None, None, 2, 20])
+        nt.assert_true('negative a' in results[2][2])
+        try:
+            list(sweep.run(_compute_area, workers=workers))
+            nt.assert_true(False)
+        except SweepError, e:
+            nt.assert_equal(e.number, 2)
+
+def test_vectorized():
+    import nose.tools as nt
+    import numpy as np
+    from parampool.pool.Pool import Pool
+    pool = Pool()
+    pool.add_data_item(name='a', default=1)
+    pool.add_data_item(name='b', default=1)
+    pool.add_data_item(name='c', default=2)
+    pool.update()
+    pool.set_value('a', ' & '.join([str(i) for i in range(10)]))
+    pool.set_value('b', '1 & 10 & 100')
+    sweep = pool.sweep()
+    batch = sweep.batch(2, 8)
+    nt.assert_equal(len(batch), 6)
+    nt.assert_equal(batch.get_value('a').tolist(), [0, 1, 1, 1, 2, 2])
+    nt.assert_equal(batch.get_value('b').tolist(), [100, 1, 10, 100, 1, 10])
+    nt.assert_equal(batch.get_value('c'), 2)
+    expected = [case.get_value('a')*case.get_value('b') for case in sweep]
+    for workers in 1, 2:
+        results = list(sweep.run(_compute_area_vectorized,
+                                 workers=workers, chunksize=7))
+        nt.assert_equal([result['area'] for case, result, error in results],
+                        expected)
+        nt.assert_equal([case.get_value('b') for case, result, error
+                         in results],
+                        [result['b'] for case, result, error in results])
+        nt.assert_equal([result['n'] for case, result, error in results],
+                        [7]*28 + [2]*2)
+
+    # An error fails all cases in the chunk
+    pool.set_value('a', '1 & -1 & 2')
+    results = list(pool.sweep().run(_compute_area_vectorized, workers=1,
+                                    chunksize=4, capture_errors=True))
+    nt.assert_equal([error is None for case, result, error in results],
+                    [False]*8 + [True])
+    nt.assert_raises(ValueError, _split_batch, np.zeros(3), 4)
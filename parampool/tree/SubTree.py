@@ -7,6 +7,7 @@ class SubTree:
     def __init__(self, name, parent=None, level=0):
         self.name = name
         self.tree = []        # list of SubTree or Leaf objects
+        self.subtrees = {}    # name -> (first) SubTree object in self.tree
         self.parent = parent  # parent tree (like .. in a directory)
 
     def add(self, item):
@@ -14,6 +15,12 @@ class SubTree:
         assert (isinstance(item, SubTree) or hasattr(item, 'name')), \
                item.__class__.__name__
         self.tree.append(item)
+        if isinstance(item, SubTree) and item.name not in self.subtrees:
+            self.subtrees[item.name] = item
+
+    def get_subtree(self, name):
+        """Return SubTree object `name` in this tree (None if not found)."""
+        return self.subtrees.get(name)
 
     def get_parent(self):
         if self.parent is None:
@@ -32,9 +39,8 @@ class SubTree:
             s.append('%s "%s"' % (item.__class__.__name__, item.name))
         return '[' + ', '.join(s) + ']'
 
-import nose.tools as nt
-
 def test_SubTree():
+    import nose.tools as nt
     class Leaf:
         def __init__(self, name, default):
             self.name = name
@@ -54,6 +60,8 @@ def test_SubTree():
     nt.assert_equal(str(m1), '[Leaf "A", Leaf "B", SubTree "sub1"]')
     nt.assert_equal(str(m2), '[Leaf "C"]')
     nt.assert_equal(m2.get_parent(), m1)
+    nt.assert_equal(m1.get_subtree('sub1'), m2)
+    nt.assert_equal(m1.get_subtree('A'), None)
     item_names = [m.name for m in m1]
     nt.assert_equal(item_names,['A', 'B', 'sub1'])
 
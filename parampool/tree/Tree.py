@@ -11,9 +11,7 @@ class Tree:
         self.locator = self.root
 
         # map integer tree level to name (main, sub, subsub, etc.)
-        self.level_name = {0: 'sub tree'}
-        for i in range(1, 6):
-            self.level_name[i] = 'sub'*(i+1) + ' tree'
+        self.level_name = LevelNames('tree')
 
     def subtree(self, path, subtree=None):
         """
@@ -32,13 +30,14 @@ class Tree:
                 new_subtree = SubTree(path.basename(),
                                       parent=self.locator)
             else:
-                if isinstance(subtree, Pool):
+                if isinstance(subtree, Tree):
                     subtree = subtree.root  # extract subtree
-                if not isinstance(subtree, tree.SubTree):
+                if not isinstance(subtree, SubTree):
                     raise TypeError(
                         'subtree must be Pool or subpool/SubTree, not %s'
                         % type(subtree))
                 new_subtree = subtree
+                new_subtree.parent = self.locator
             self.locator.add(new_subtree)
             self.locator = new_subtree
 
@@ -70,12 +69,10 @@ class Tree:
                     self.locator = self.locator.parent
                     found = True
             else:
-                for item in self.locator:
-                    if isinstance(item, SubTree):
-                        if item.name == subtree_name:
-                            self.locator = item
-                            found = True
-                            break
+                subtree = self.locator.get_subtree(subtree_name)
+                if subtree is not None:
+                    self.locator = subtree
+                    found = True
         if not found:
             raise NonExistingSubtreeError(
                 'change_subtree: path=%s was not found' % path)
@@ -100,41 +97,83 @@ class Tree:
         level (the depth in the tree), item (the SubTree or Leaf object),
         and user_data which is some mutable data structure provided by
         the user and that can be filled in callback functions.
+        The traversal uses an explicit stack (no recursion), see
+        also ``walk`` for a generator-based alternative.
         """
         if subtree is None:
             subtree = self.root
         if tree_path is None:
             tree_path = []
 
-        for item in subtree:
-            if verbose:
-                print 'traverse: %s (%s)' % \
-                      (item.name, item.__class__.__name__)
-            if isinstance(item, SubTree):
-                tree_path.append(item.name)
-
-                if callable(callback_subtree_start):
-                    callback_subtree_start(
-                        tree_path, level, item, user_data)
-
-                self.traverse(callback_leaf,
-                              callback_subtree_start,
-                              callback_subtree_end,
-                              level+1,
-                              tree_path,
-                              item,
-                              user_data,
-                              verbose)
-
-                if callable(callback_subtree_end):
-                    callback_subtree_end(
-                        tree_path, level, item, user_data)
-
-                del tree_path[-1]
-            else:  # assume leaf
-                if callable(callback_leaf):
-                    callback_leaf(
-                        tree_path, level, item, user_data)
+        stack = [(subtree, iter(subtree.tree))]
+        while stack:
+            for item in stack[-1][1]:
+                if verbose:
+                    print 'traverse: %s (%s)' % \
+                          (item.name, item.__class__.__name__)
+                if isinstance(item, SubTree):
+                    tree_path.append(item.name)
+
+                    if callable(callback_subtree_start):
+                        callback_subtree_start(
+                            tree_path, level, item, user_data)
+
+                    # Continue with the items in this subtree
+                    stack.append((item, iter(item.tree)))
+                    level += 1
+                    break
+                else:  # assume leaf
+                    if callable(callback_leaf):
+                        callback_leaf(
+                            tree_path, level, item, user_data)
+            else:
+                # All items in the subtree on top of the stack are processed
+                item = stack.pop()[0]
+                if stack:
+                    level -= 1
+                    if callable(callback_subtree_end):
+                        callback_subtree_end(
+                            tree_path, level, item, user_data)
+
+                    del tree_path[-1]
+
+    def walk(self, subtree=None):
+        """
+        Iterate over all SubTree and leaf objects in the tree,
+        starting from subtree (the root if None), in the same order
+        as ``traverse``. Each iteration yields a tuple
+        (tree_path, level, node), where tree_path is a tuple of
+        subtree names (for a SubTree node it ends with the node's
+        own name, for a leaf it is the path of the enclosing subtree),
+        and level is the depth as in ``traverse``.
+        The iteration is lazy and does not use recursion.
+        """
+        if subtree is None:
+            subtree = self.root
+
+        stack = [((), 0, iter(subtree.tree))]
+        while stack:
+            tree_path, level, items = stack[-1]
+            for item in items:
+                if isinstance(item, SubTree):
+                    item_path = tree_path + (item.name,)
+                    yield item_path, level, item
+                    stack.append((item_path, level+1, iter(item.tree)))
+                    break
+                else:
+                    yield tree_path, level, item
+            else:
+                stack.pop()
+
+    def iter_leaves(self, subtree=None):
+        """
+        Iterate over all leaves in the tree (or in subtree).
+        As ``walk``, but yields (tree_path, level, leaf) for
+        leaves only.
+        """
+        for tree_path, level, node in self.walk(subtree):
+            if not isinstance(node, SubTree):
+                yield tree_path, level, node
 
     def __str__(self):
         """
@@ -142,22 +181,35 @@ class Tree:
         names of subtrees and leaves with indentation
         visualizing the subtree level.
         """
-        def leaf_printer(tree_path, level, leaf, outlines):
+        outlines = []   # list of strings (to be printed)
+        for tree_path, level, node in self.walk():
             indentation = '    '*level
-            outlines.append('%s%s' % (indentation, leaf.name))
+            if isinstance(node, SubTree):
+                outlines.append('%s%s "%s" (level=%d)' %
+                                (indentation, self.level_name[level],
+                                 tree_path[-1], level))
+            else:
+                outlines.append('%s%s' % (indentation, node.name))
+        return '\n'.join(outlines)
 
-        def subtree_printer(tree_path, level, subtree, outlines):
-            indentation = '    '*level
-            outlines.append('%s%s "%s" (level=%d)' %
-                            (indentation, self.level_name[level],
-                             tree_path[-1], level))
 
-        outlines = []   # list of strings (to be printed)
-        self.traverse(
-            callback_leaf=leaf_printer,
-            callback_subtree_start=subtree_printer,
-            user_data=outlines)
-        return '\n'.join(outlines)
+class LevelNames(dict):
+    """
+    Map integer tree level to name: 'sub tree', 'subsub tree', etc.
+    `kind` is the last word in the name ('tree', 'pool').
+    Names for levels not explicitly set are computed on demand,
+    so there is no limit on the depth.
+    """
+    def __init__(self, kind='tree', levels=6):
+        dict.__init__(self)
+        self.kind = kind
+        for i in range(levels):
+            self[i]  # compute and store
+
+    def __missing__(self, level):
+        name = 'sub'*(level+1) + ' ' + self.kind
+        self[level] = name
+        return name
 
 
 class NonExistingSubtreeError(Exception):
@@ -227,17 +279,29 @@ class TreePath:
     def __str__(self):
         return self.to_str()
 
+def get_tree_path(subtree):
+    """
+    Return list of the names of all subtrees from the root down to
+    (and including) `subtree`. The root itself is not included,
+    which is the convention for the tree_path argument in
+    ``Tree.traverse``.
+    """
+    tree_path = []
+    while subtree.parent is not None:
+        tree_path.append(subtree.name)
+        subtree = subtree.parent
+    tree_path.reverse()
+    return tree_path
+
 def get_all_tree_paths(tree, add_leaf_object=False):
     """Return list of all leaf names in the tree."""
-    def leaf_path(tree_path, level, leaf, paths):
+    paths = []
+    for tree_path, level, leaf in tree.iter_leaves():
         path = '/' + '/'.join(tree_path) + '/' + leaf.name
         if add_leaf_object:
             paths.append((path, leaf))
         else:
             paths.append(path)
-
-    paths = []
-    tree.traverse(callback_leaf=leaf_path, user_data=paths)
     return paths
 
 def hash_all_leaves(tree):
@@ -246,63 +310,101 @@ def hash_all_leaves(tree):
     paths2leaves = {path: leaf for path, leaf in paths}
     return paths2leaves
 
-def unique_short_name(short_path, paths):
+def short_name_index(paths):
+    """
+    Return short_names2paths[short_name] = list of full paths,
+    i.e., a mapping from the last part of a path (the short name
+    of a leaf) to all full paths ending with that name.
+    """
+    short_names2paths = {}
+    for path in paths:
+        short_name = path.split('/')[-1]
+        if short_name in short_names2paths:
+            short_names2paths[short_name].append(path)
+        else:
+            short_names2paths[short_name] = [path]
+    return short_names2paths
+
+def unique_short_name(short_path, paths, short_names2paths=None):
     """
     Check if `short_path` is a unique abbreviation of a full path.
     All full paths are stored in `path`.
     If unique match, return full path, otherwise return None.
+    `short_names2paths` is the index made by ``short_name_index(paths)``,
+    which is computed here if not given.
     """
-    short_paths = [path.split('/')[-1] for path in paths]
-    n = short_paths.count(short_path)
-    if n > 1:  # not unique
+    if short_names2paths is None:
+        short_names2paths = short_name_index(paths)
+    matches = short_names2paths.get(short_path, ())
+    if len(matches) > 1:  # not unique
         return None
-    elif n == 0:  # full path
+    elif len(matches) == 0:  # full path
         return short_path
     else: # unique match n=1
-        index = short_paths.index(short_path)
-        return paths[index]
+        return matches[0]
 
-def get_leaf(short_path, paths2leaves):
+def get_leaf(short_path, paths2leaves, short_names2paths=None):
     """
     Return leaf object if `short_path` is a unique path name.
     `paths2leaves` is a dict with paths as keys and leaf
-    objects as values.
+    objects as values. `short_names2paths` is the corresponding
+    index from ``short_name_index``; give it to avoid rebuilding
+    the index in every call.
     """
-    path = unique_short_name(short_path, list(paths2leaves.keys()))
+    if short_names2paths is None:
+        short_names2paths = short_name_index(paths2leaves)
+    path = unique_short_name(short_path, None, short_names2paths)
     if path is None:
         raise ValueError('%s is not a unique short name' % short_path)
     else:
         return paths2leaves[path]
 
-# Is this one really necessary? Do not think so...
-def get_subtree(short_path, paths2subtrees):
-    # 2DO
-    # Check if hash_all_leaves also creates paths to subtrees - no!
-    return NotImplementedError
+def hash_all_subtrees(tree):
+    """
+    Return paths2subtrees[path] = subtree_object, where path
+    is '/' for the root and '/some/path/to/subtree' otherwise.
+    """
+    paths2subtrees = {'/': tree.root}
+    for tree_path, level, node in tree.walk():
+        if isinstance(node, SubTree):
+            paths2subtrees['/' + '/'.join(tree_path)] = node
+    return paths2subtrees
+
+def get_subtree(short_path, paths2subtrees, short_names2paths=None):
+    """
+    Return SubTree object if `short_path` is a unique path name
+    (full path or just the name of the subtree).
+    `paths2subtrees` is a dict with paths as keys and SubTree
+    objects as values (see ``hash_all_subtrees``), and
+    `short_names2paths` the corresponding ``short_name_index``.
+    """
+    if short_names2paths is None:
+        short_names2paths = short_name_index(paths2subtrees)
+    path = unique_short_name(short_path, None, short_names2paths)
+    if path is None:
+        raise ValueError('%s is not a unique short name' % short_path)
+    elif path not in paths2subtrees:
+        raise NonExistingSubtreeError(
+            'get_subtree: path=%s was not found' % path)
+    else:
+        return paths2subtrees[path]
 
 def dump(tree):
     """Dump tree using str() for subtrees and leaves."""
-    def leaf_dump(tree_path, level, leaf, outlines):
-        indentation = '    '*level
-        outlines.append('%s%s' % (indentation, str(leaf)))
-
-    def subtree_dump(tree_path, level, subtree, outlines):
-        indentation = '    '*level
-        outlines.append('%s%s "%s" (level=%d)' %
-                        (indentation, tree.level_name[level],
-                         tree_path[-1], level))
-
     outlines = []   # list of strings (to be printed)
-    tree.traverse(
-        callback_leaf=leaf_dump,
-        callback_subtree_start=subtree_dump,
-        user_data=outlines)
+    for tree_path, level, node in tree.walk():
+        indentation = '    '*level
+        if isinstance(node, SubTree):
+            outlines.append('%s%s "%s" (level=%d)' %
+                            (indentation, tree.level_name[level],
+                             tree_path[-1], level))
+        else:
+            outlines.append('%s%s' % (indentation, str(node)))
     return '\n'.join(outlines)
 
-import nose.tools as nt
-from parampool.utils import assert_equal_text
-
 def test_Tree_basics():
+    import nose.tools as nt
+    from parampool.utils import assert_equal_text
     t = Tree(root_name='main')
 
     class Leaf:
@@ -388,5 +490,39 @@ sub tree "sub2" (level=0)
         Leaf "item11"'''
     assert_equal_text(dump(t), reference)
 
+    # Callback-based traversal must visit nodes as walk does
+    def record(tree_path, level, node, events):
+        events.append((tuple(tree_path), level, node.name))
+
+    events = []
+    t.traverse(callback_leaf=record, callback_subtree_start=record,
+               user_data=events)
+    nt.assert_equal(events, [(tree_path, level, node.name)
+                             for tree_path, level, node in t.walk()])
+    ends = []
+    t.traverse(callback_subtree_end=record, user_data=ends)
+    nt.assert_equal([name for tree_path, level, name in ends],
+                    ['sub1', 'sub4', 'sub3', 'sub5', 'sub2'])
+    nt.assert_equal([leaf.name for tree_path, level, leaf in
+                     t.iter_leaves(t.root.get_subtree('sub1'))],
+                    ['item3'])
+
+    # Deep trees: no recursion limit, level names for any depth
+    import sys
+    n = sys.getrecursionlimit() + 10
+    for i in range(n):
+        t.subtree('deep')
+    t.add_leaf(Leaf(name='bottom', default=0))
+    tree_path, level, leaf = max(t.iter_leaves(), key=lambda x: x[1])
+    nt.assert_equal((leaf.name, level), ('bottom', len(tree_path)))
+    nt.assert_equal(len(str(t).splitlines()), len(events) + n + 1)
+
+    paths2subtrees = hash_all_subtrees(t)
+    nt.assert_equal(get_subtree('sub4', paths2subtrees).name, 'sub4')
+    nt.assert_equal(get_subtree('/sub2/sub5', paths2subtrees).name, 'sub5')
+    nt.assert_equal(get_subtree('/', paths2subtrees), t.root)
+    nt.assert_raises(NonExistingSubtreeError,
+                     get_subtree, 'sub6', paths2subtrees)
+
 if __name__ == '__main__':
     test_Tree_basics()
@@ -14,6 +14,114 @@ def legal_variable_name(name):
     return var_name
 
 
+class LRUCache(object):
+    """
+    Dict-like cache holding at most `maxsize` entries. When the
+    cache is full, the least recently used entry is dropped.
+    The number of successful and failed look-ups with ``get`` is
+    counted in the attributes ``hits`` and ``misses``.
+    """
+    def __init__(self, maxsize=128):
+        from collections import OrderedDict
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # least recently used first
+        self.hits = self.misses = 0
+
+    def get(self, key, default=None):
+        """Return cached value for `key`, or `default` if not cached."""
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data[key] = value  # mark as most recently used
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self._data:
+            del self._data[key]
+        elif len(self._data) >= self.maxsize:
+            self._data.popitem(last=False)
+        self._data[key] = value
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        """Remove all entries and reset the statistics."""
+        self._data.clear()
+        self.hits = self.misses = 0
+
+    def info(self):
+        """Return dict with hits, misses, current size and maxsize."""
+        return dict(hits=self.hits, misses=self.misses,
+                    size=len(self._data), maxsize=self.maxsize)
+
+
+_plain_types = (float, int, long, complex, bool, str, unicode,
+                type(None))
+
+def stable_repr(value):
+    """
+    Return a string representation of `value` that is the same in
+    all runs (for hashing values): standard Python objects are
+    represented by repr, NumPy arrays by dtype, shape and a hash
+    of the data, code objects by their byte code, names and
+    constants, and functions by their code, default arguments and
+    the contents of their closures. Raise TypeError for objects
+    whose repr contains their address (e.g., instances of classes
+    without ``__repr__``), since it differs between runs.
+    """
+    if type(value) in _plain_types:
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        if type(value) in (list, tuple) and \
+           all([type(v) in _plain_types for v in value]):
+            return repr(value)
+        return '%s(%s)' % (type(value).__name__,
+                           ','.join(map(stable_repr, value)))
+    if isinstance(value, dict):
+        return 'dict(%s)' % ','.join(
+            ['%s:%s' % (stable_repr(key), stable_repr(value[key]))
+             for key in sorted(value)])
+    if isinstance(value, (set, frozenset)):
+        return '%s(%s)' % (type(value).__name__,
+                           ','.join(sorted(map(stable_repr, value))))
+    from hashlib import sha1
+    if hasattr(value, 'dtype') and hasattr(value, 'tostring'):
+        # NumPy array (repr abbreviates large arrays)
+        return 'ndarray%s%s(%s)' % (
+            value.dtype.str, value.shape,
+            sha1(value.tostring()).hexdigest())
+    if hasattr(value, 'co_code'):
+        # Code object (nested functions are constants in the code)
+        return 'code(%s,%s,%s,%s)' % (
+            sha1(value.co_code).hexdigest(),
+            stable_repr(value.co_names), stable_repr(value.co_varnames),
+            stable_repr(value.co_consts))
+    if hasattr(value, 'func_code'):
+        # Python function, closures made by the same function differ
+        # in the contents of their cells only
+        cells = []
+        for cell in value.func_closure or ():
+            try:
+                cells.append(cell.cell_contents)
+            except ValueError:
+                cells.append('<empty cell>')
+        return 'function(%s,%s,%s,%s)' % (
+            value.__name__, stable_repr(value.func_code),
+            stable_repr(value.func_defaults), stable_repr(cells))
+    text = repr(value)
+    if ' at 0x' in text:
+        raise TypeError('%s object has no stable representation: %s' %
+                        (type(value).__name__, text))
+    return '%s:%s' % (type(value).__name__, text)
+
+
 def save_png_to_str(plt, plotwidth=400):
     """
     Given a matplotlib.pyplot object plt, the current figure